@@ -1,166 +1,452 @@
-import serial
-import time
-import joblib
-import pandas as pd
+import asyncio
+import io
 import os
-import requests
+import signal
+import time
+from collections import deque
 from datetime import datetime
 
-try:
-    from dotenv import load_dotenv
-    load_dotenv()
-except Exception:
-    pass
+import numpy as np
+import requests
+import serial
 
-API_URL = os.environ.get("BACKEND_URL", "http://localhost:8000").rstrip("/")
+from decision import DecisionEngine, DecisionTable
+from lights import LightTable, parse_light_ids
+from metrics import Counter, Gauge, Histogram, serve as serve_metrics
+from outbox import Outbox
+from overrides import OverrideSchedule
+from protocol import FRAME_COMMAND, FRAME_SENSOR, FrameReader, decode_sensor_payload, encode_frame
+from uplink import Uplink
 
-override_schedule = []
-active_overrides = set()
-last_schedule_check = 0
+# Overrides are pushed by the backend; polling is only the fallback
 SCHEDULE_CHECK_INTERVAL = 30
+# models/<name>.json (coefficients), falling back to models/<name>.joblib
+MODEL_NAME = "street_light_model"
 
-model_file = "street_light_model.joblib"
-try:
-    luminosity_model = joblib.load(f'models/{model_file}')
-except FileNotFoundError:
-    print(f"Error: Model file '{model_file}' not found in 'models/' directory.")
-    exit()
-
-try:
-    arduino = serial.Serial(port='/dev/ttyACM0', baudrate=115200, timeout=0.1)
-    time.sleep(2)
-    print("Connected to Arduino.")
-except serial.SerialException:
-    print("Error: Could not connect to Arduino. Check port and permissions.")
-    exit()
+SERIAL_READ_SECONDS = Histogram("controller_serial_read_seconds", "Time to read and parse the bytes waiting on the serial port")
+DECISION_SECONDS = Histogram("controller_decision_seconds", "Time to decide the action of every light for one frame")
+SERIAL_WRITE_SECONDS = Histogram("controller_serial_write_seconds", "Time to write one command frame")
+FRAME_LATENCY_SECONDS = Histogram("controller_frame_latency_seconds", "Time from reading a sensor frame to writing its command")
+# Read from the controller's own counters when scraped, so they cost nothing per frame
+FRAMES = Counter("controller_frames_total", "Sensor frames decided")
+DROPPED_FRAMES = Counter("controller_dropped_frames_total", "Sensor frames dropped because the frame queue was full")
+STATUS_CHANGES = Counter("controller_status_changes_total", "Light ON/OFF status changes")
+SUPPRESSED_COMMANDS = Counter("controller_commands_suppressed_total", "Command frames not sent because no action changed")
+SUPPRESSED_LINES = Counter("controller_console_lines_suppressed_total", "Per-frame console lines skipped by rate limiting")
+BAD_FRAMES = Counter("controller_serial_bad_frames_total", "Corrupt serial frames skipped")
+LOST_FRAMES = Counter("controller_serial_lost_frames_total", "Serial frames missing according to sequence numbers")
+FRAME_QUEUE_DEPTH = Gauge("controller_frame_queue_depth", "Sensor frames waiting for a decision")
+UPLINK_QUEUE_DEPTH = Gauge("controller_uplink_queue_depth", "Logs waiting to be sent to the backend")
 
 
-def suggest_action(timestamp, live_lux, live_pir1, live_pir2, active_overrides):
-    """
-    Final decision function combining the ML model's context with live PIR data.
+class Controller:
     """
-    actions = []
-    for i, live_pir in zip([1, 2], [live_pir1, live_pir2]):
-        if i in active_overrides:
-            actions.append('2')
-        else:
-            data = pd.DataFrame([(live_lux, timestamp)], columns=["ambience_lux", "seconds_of_day"])
-            night_mode_active = luminosity_model.predict(data)[0]
-            if night_mode_active == 0:
-                actions.append('0')
-            else:
-                actions.append('2' if live_pir == 1 else '1')
-    return f"{actions[0]},{actions[1]}"
+    asyncio runtime for one Arduino and the lights it drives.
 
-def update_streetlight_status(light_id, status):
-    """
-    Update the status of a streetlight via the API.
-    """
-    try:
-        response = requests.patch(f"{API_URL}/api/streetlights/{light_id}", json={"status": status})
-        response.raise_for_status()
-    except requests.exceptions.RequestException as e:
-        print(f"Error updating streetlight {light_id}: {e}")
+    Separate tasks handle each stage and hand work on through queues:
 
-def log_status_change(light_id, status):
-    """
-    Log a status change event to the database via the API.
-    """
-    try:
-        response = requests.post(
-            f"{API_URL}/api/logs",
-            json={
-                "streetlight_id": light_id,
-                "status": status,
-                "timestamp": datetime.now().isoformat(timespec='seconds')
-            }
-        )
-        response.raise_for_status()
-    except requests.exceptions.RequestException as e:
-        print(f"Error logging status for streetlight {light_id}: {e}")
-
-def register_streetlights():
-    """
-    Register two streetlights if they don't already exist.
+        serial ingest -> frames -> decision -> commands -> actuation
+                                            -> changes  -> uplink
+        schedule -> wakes decision when the active overrides change
+
+    Nothing polls: serial ingest waits for the port to become readable and
+    the schedule task sleeps until the next override boundary or until a
+    new schedule arrives. HTTP stays on the Uplink and OverrideSchedule
+    background threads so it never stalls the loop.
     """
-    for i in range(1, 3):
-        try:
-            response = requests.post(f"{API_URL}/api/streetlights", json={"id": i, "status": "OFF"}) 
-            if response.status_code == 200:
-                print(f"Streetlight {i} registered successfully.")
-            elif response.status_code == 400 and "Streetlight ID already registered" in response.text: 
-                 print(f"Streetlight {i} is already registered.")
-            else:
-                response.raise_for_status()
-        except requests.exceptions.RequestException as e:
-            print(f"Could not register streetlight {i}: {e}")
 
-print("Beginning operation. Press Ctrl+C to exit.")
-register_streetlights()
+    def __init__(self, port, engine, lights, uplink, override_schedule=None,
+                 clock=datetime.now, verbose=True, frame_queue_size=1000,
+                 lux_window=0.0, command_refresh=None, print_interval=0.0):
+        self.port = port
+        self.engine = engine
+        self.lights = lights
+        self.uplink = uplink
+        self.override_schedule = override_schedule
+        self.clock = clock
+        self.verbose = verbose
+        # Decide on the mean lux of the last lux_window seconds of frames (0: latest frame only)
+        self.lux_window = lux_window
+        # Only send a command when some action changed, or command_refresh seconds after
+        # the last one in case the Arduino restarted (None: send one per frame)
+        self.command_refresh = command_refresh
+        # At most one per-frame console line every print_interval seconds, plus one per change
+        self.print_interval = print_interval
 
-last_status1 = "OFF"
-last_status2 = "OFF"
+        # Anything longer than a sensor frame is a corrupt length field; resync instead of waiting on it
+        self.reader = FrameReader(max_payload=4 + (lights.num_channels + 7) // 8)
+        self.command_seq = 0
+        self.active_overrides = frozenset()
+        self._last_frame = None
+        self._lux_samples = deque()
+        self._lux_sum = 0.0
+        self._last_command = None
+        self._last_command_at = 0.0
+        self._last_print = float("-inf")
 
-while True:
-    try:
-        current_time = time.time()
-        if current_time - last_schedule_check > SCHEDULE_CHECK_INTERVAL:
+        self._frames = asyncio.Queue(maxsize=frame_queue_size)
+        self._commands = asyncio.Queue(maxsize=1)
+        self._changes = asyncio.Queue()
+        self._stopped = None
+
+        self.frames = 0
+        self.dropped_frames = 0
+        self.commands = 0
+        self.status_changes = 0
+        self.suppressed_commands = 0
+        self.suppressed_lines = 0
+        # Seconds from reading a sensor frame to writing its command
+        self.latencies = deque(maxlen=10000)
+
+        FRAMES.set_function(lambda: self.frames)
+        DROPPED_FRAMES.set_function(lambda: self.dropped_frames)
+        STATUS_CHANGES.set_function(lambda: self.status_changes)
+        SUPPRESSED_COMMANDS.set_function(lambda: self.suppressed_commands)
+        SUPPRESSED_LINES.set_function(lambda: self.suppressed_lines)
+        BAD_FRAMES.set_function(lambda: self.reader.bad_frames)
+        LOST_FRAMES.set_function(lambda: self.reader.lost_frames)
+        FRAME_QUEUE_DEPTH.set_function(self._frames.qsize)
+        UPLINK_QUEUE_DEPTH.set_function(uplink.queue_depth)
+
+    @classmethod
+    def from_env(cls, **kwargs):
+        """
+        Builds a controller from the environment (.env). Raises
+        FileNotFoundError if the model is missing and serial.SerialException
+        if the Arduino can't be opened.
+        """
+        api_url = os.environ.get("BACKEND_URL", "http://localhost:8000").rstrip("/")
+
+        # Lights driven by this host and the PIR channel (position in the sensor frame) each one reads.
+        light_ids = parse_light_ids(os.environ.get("LIGHT_IDS", "1,2"))
+        pir_channels = os.environ.get("PIR_CHANNELS")
+        if pir_channels:
+            pir_channels = [int(c) for c in pir_channels.split(',')]
+        lights = LightTable(light_ids, pir_channels)
+
+        http_timeout = float(os.environ.get("HTTP_TIMEOUT", "2"))
+        # Local database every status change goes through until the backend has it ("" keeps them in memory)
+        outbox_path = os.environ.get("UPLINK_OUTBOX", "uplink_outbox.db")
+        outbox = None
+        if outbox_path:
+            outbox = Outbox(outbox_path, max_entries=int(os.environ.get("UPLINK_OUTBOX_MAX_ENTRIES", "1000000")))
+        uplink = Uplink(api_url, timeout=http_timeout, outbox=outbox)
+        override_schedule = OverrideSchedule(api_url, light_ids, timeout=http_timeout,
+                                             poll_interval=SCHEDULE_CHECK_INTERVAL)
+
+        # Lux the reading must move past the threshold to switch night mode back (0 disables)
+        hysteresis = float(os.environ.get("NIGHT_HYSTERESIS_LUX", "5"))
+        engine = DecisionTable(DecisionEngine.load(f'models/{MODEL_NAME}'), hysteresis=hysteresis)
+
+        options = {
+            "lux_window": float(os.environ.get("LUX_WINDOW", "2")),
+            "command_refresh": float(os.environ.get("COMMAND_REFRESH", "5")) or None,
+            "print_interval": float(os.environ.get("PRINT_INTERVAL", "1")),
+        }
+        options.update(kwargs)
+
+        port = serial.Serial(port=os.environ.get("SERIAL_PORT", "/dev/ttyACM0"), baudrate=115200, timeout=0.1)
+        time.sleep(2)
+        print("Connected to Arduino.")
+        return cls(port, engine, lights, uplink, override_schedule, **options)
+
+    def suggest_action(self, timestamp, live_lux, live_pirs, active_overrides):
+        """
+        Final decision function combining the ML model's context with live PIR data.
+        Returns the command frame payload for every light in the table.
+        """
+        # Every light shares the same (lux, time) input, so predict once per frame.
+        night_mode_active = self.engine.night_mode(live_lux, timestamp)
+        if active_overrides is not self.lights.active_overrides:
+            self.lights.set_overrides(active_overrides)
+        self.lights.decide(night_mode_active, live_pirs)
+        return self.lights.command()
+
+    def register_streetlights(self):
+        """
+        Register the configured streetlights if they don't already exist.
+        """
+        api_url = self.uplink.api_url
+        for i in self.lights.ids.tolist():
             try:
-                response = requests.get(f"{API_URL}/api/overrides/schedule")
-                response.raise_for_status()
-                override_schedule = response.json()
-                last_schedule_check = current_time
+                response = requests.post(f"{api_url}/api/streetlights", json={"id": i, "status": "OFF"},
+                                         timeout=self.uplink.timeout)
+                if response.status_code == 200:
+                    print(f"Streetlight {i} registered successfully.")
+                elif response.status_code == 400 and "Streetlight ID already registered" in response.text:
+                    print(f"Streetlight {i} is already registered.")
+                else:
+                    response.raise_for_status()
             except requests.exceptions.RequestException as e:
-                print(f"Error fetching override schedule: {e}")
-
-        now = datetime.now()
-        active_overrides.clear()
-        for override in override_schedule:
-            start_time = datetime.fromisoformat(override['override_start_time'])
-            end_time = datetime.fromisoformat(override['override_end_time'])
-            if start_time <= now <= end_time:
-                active_overrides.add(override['light_id'])
-
-        if arduino.in_waiting > 0:
-            line = arduino.readline().decode('utf-8').rstrip()
-            parts = line.split(',')
-            if len(parts) == 3:
-                current_lux = float(parts[0])
-                pir1_status = int(parts[1])
-                pir2_status = int(parts[2])
-
-                now = time.localtime()
-                now_seconds = now.tm_hour * 3600 + now.tm_min * 60 + now.tm_sec
-                action = suggest_action(now_seconds, current_lux, pir1_status, pir2_status, active_overrides)
-
-                arduino.write(action.encode())
-
-                led1_action, led2_action = action.split(',')
-                status1 = "ON" if led1_action in ['1', '2'] else "OFF"
-                status2 = "ON" if led2_action in ['1', '2'] else "OFF"
-
-                if status1 != last_status1:
-                    update_streetlight_status(1, status1)
-                    log_status_change(1, status1)
-                    last_status1 = status1
-
-                if status2 != last_status2:
-                    update_streetlight_status(2, status2)
-                    log_status_change(2, status2)
-                    last_status2 = status2
-
-                print(f"{time.strftime('%H:%M:%S', now)} Lux: {current_lux}, PIRs: [{pir1_status},{pir2_status}], Action: {action}, Overrides: {active_overrides}")
-
-    except (KeyboardInterrupt, SystemExit):
+                print(f"Could not register streetlight {i}: {e}")
+
+    def stop(self):
+        """
+        Ask run() to shut down. Safe to call from the loop or a signal handler.
+        """
+        if self._stopped is not None:
+            self._stopped.set()
+
+    async def run(self, register=True):
+        """
+        Runs until stop() is called or the task is cancelled (Ctrl+C), then
+        reports every light that is still on as OFF and closes everything.
+        """
+        loop = asyncio.get_running_loop()
+        self._stopped = asyncio.Event()
+        signals = []
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, self.stop)
+                signals.append(sig)
+            except (NotImplementedError, RuntimeError, ValueError):
+                # Not supported here (e.g. Windows or not the main thread); Ctrl+C still cancels run()
+                pass
+
+        if register:
+            await loop.run_in_executor(None, self.register_streetlights)
+        self.uplink.start()
+        schedule_changed = asyncio.Event()
+        if self.override_schedule is not None:
+            def on_change():
+                try:
+                    loop.call_soon_threadsafe(schedule_changed.set)
+                except RuntimeError:
+                    # Loop already closed (shutdown)
+                    pass
+            self.override_schedule.on_change = on_change
+            self.override_schedule.start()
+
+        tasks = [
+            asyncio.create_task(self._ingest(), name="serial-ingest"),
+            asyncio.create_task(self._decide(), name="decision"),
+            asyncio.create_task(self._actuate(), name="actuation"),
+            asyncio.create_task(self._report(), name="uplink"),
+        ]
+        if self.override_schedule is not None:
+            tasks.append(asyncio.create_task(self._schedule(schedule_changed), name="schedule"))
+
+        stopped = asyncio.create_task(self._stopped.wait())
+        try:
+            done, _ = await asyncio.wait(tasks + [stopped], return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task is not stopped and task.exception() is not None:
+                    print(f"An error occurred in {task.get_name()}: {task.exception()!r}")
+        finally:
+            stopped.cancel()
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            for sig in signals:
+                loop.remove_signal_handler(sig)
+            self._shutdown()
+
+    def _shutdown(self):
         print("\nExiting program.")
-        if last_status1 != "OFF":
-            update_streetlight_status(1, "OFF")
-            log_status_change(1, "OFF")
-        if last_status2 != "OFF":
-            update_streetlight_status(2, "OFF")
-            log_status_change(2, "OFF")
-        arduino.close()
-        break
-    except Exception as e:
-        print(f"An error occurred: {e}")
-        time.sleep(2)
+        if self.suppressed_commands or self.suppressed_lines:
+            print(f"Skipped {self.suppressed_commands} unchanged commands "
+                  f"and {self.suppressed_lines} console lines over {self.frames} frames.")
+        while not self._changes.empty():
+            self._send_changes(*self._changes.get_nowait())
+        now = self.clock().isoformat(timespec='seconds')
+        for light_id in self.lights.lights_on():
+            self.uplink.update_status(light_id, "OFF")
+            self.uplink.log(light_id, "OFF", now)
+        if self.override_schedule is not None:
+            self.override_schedule.stop()
+        self.uplink.close()
+        self.port.close()
+
+    # --- tasks ---
+
+    async def _ingest(self):
+        loop = asyncio.get_running_loop()
+        failed = loop.create_future()
+
+        def on_readable():
+            # Runs as soon as the port has data. Readable with nothing
+            # waiting means the port went away; the read then raises.
+            try:
+                start = time.perf_counter()
+                self.reader.readinto(self.port, max(self.port.in_waiting, 1))
+                self._queue_frames()
+                SERIAL_READ_SECONDS.observe(time.perf_counter() - start)
+            except Exception as e:
+                loop.remove_reader(fd)
+                if not failed.done():
+                    failed.set_exception(e)
+
+        try:
+            fd = self.port.fileno()
+            loop.add_reader(fd, on_readable)
+        except (AttributeError, OSError, io.UnsupportedOperation, NotImplementedError):
+            # No selectable file descriptor: block on the port in a worker thread (bounded by its timeout)
+            while True:
+                waiting = self.port.in_waiting
+                await loop.run_in_executor(None, self.reader.readinto, self.port, max(waiting, 1))
+                self._queue_frames()
+
+        try:
+            await failed
+        finally:
+            loop.remove_reader(fd)
+
+    def _queue_frames(self):
+        received = time.perf_counter()
+        while (frame := self.reader.next_frame()) is not None:
+            frame_type, _, payload = frame
+            if frame_type != FRAME_SENSOR:
+                continue
+            sensor = decode_sensor_payload(payload, self.lights.num_channels)
+            if sensor is None:
+                continue
+            if self._frames.full():
+                self._frames.get_nowait()
+                self.dropped_frames += 1
+            self._frames.put_nowait((received, *sensor))
+
+    async def _decide(self):
+        while True:
+            item = await self._frames.get()
+            if item is not None:
+                received, lux, pirs = item
+                lux = self._smoothed_lux(received, lux)
+                # Catch up on a backlog in one decision: latest lux, any motion since the last one
+                while not self._frames.empty():
+                    queued = self._frames.get_nowait()
+                    if queued is None:
+                        continue
+                    received, lux, newer_pirs = queued
+                    lux = self._smoothed_lux(received, lux)
+                    pirs = np.maximum(pirs, newer_pirs)
+                    self.frames += 1
+                self.frames += 1
+                self._last_frame = (lux, pirs)
+            elif self._last_frame is None:
+                # Overrides changed before the first frame
+                continue
+            else:
+                # Overrides changed: re-decide on the last reading
+                received = time.perf_counter()
+                lux, pirs = self._last_frame
+
+            try:
+                start = time.perf_counter()
+                now = self.clock()
+                now_seconds = now.hour * 3600 + now.minute * 60 + now.second
+                action = self.suggest_action(now_seconds, lux, pirs, self.active_overrides)
+                DECISION_SECONDS.observe(time.perf_counter() - start)
+            except Exception as e:
+                print(f"An error occurred: {e}")
+                continue
+
+            changed = action != self._last_command
+            if (changed or self.command_refresh is None
+                    or start - self._last_command_at >= self.command_refresh):
+                if self._commands.full():
+                    # The previous command hasn't gone out yet; only the newest state matters
+                    self._commands.get_nowait()
+                self._commands.put_nowait((received, action))
+                self._last_command = action
+                self._last_command_at = start
+            else:
+                self.suppressed_commands += 1
+
+            changes = self.lights.status_changes()
+            if changes:
+                self.status_changes += len(changes)
+                self._changes.put_nowait((changes, now.isoformat(timespec='seconds')))
+
+            if self.verbose:
+                if changed or start - self._last_print >= self.print_interval:
+                    self._last_print = start
+                    print(f"{now:%H:%M:%S} Lux: {lux:.2f}, PIRs: {pirs.tolist()}, "
+                          f"Action: {self.lights.actions.tolist()}, Overrides: {self.active_overrides}")
+                else:
+                    self.suppressed_lines += 1
+
+    def _smoothed_lux(self, received, lux):
+        """
+        Adds a reading to the rolling lux window and returns the window's mean.
+        """
+        if not self.lux_window:
+            return lux
+        samples = self._lux_samples
+        samples.append((received, lux))
+        self._lux_sum += lux
+        while received - samples[0][0] > self.lux_window:
+            self._lux_sum -= samples.popleft()[1]
+        return self._lux_sum / len(samples)
+
+    async def _actuate(self):
+        while True:
+            received, action = await self._commands.get()
+            start = time.perf_counter()
+            self.port.write(encode_frame(FRAME_COMMAND, self.command_seq, action))
+            done = time.perf_counter()
+            self.command_seq = (self.command_seq + 1) & 0xFF
+            self.commands += 1
+            self.latencies.append(done - received)
+            SERIAL_WRITE_SECONDS.observe(done - start)
+            FRAME_LATENCY_SECONDS.observe(done - received)
+
+    async def _report(self):
+        while True:
+            self._send_changes(*await self._changes.get())
+
+    def _send_changes(self, changes, timestamp):
+        # Uplink only queues; its worker thread does the HTTP
+        for light_id, status in changes:
+            self.uplink.update_status(light_id, status)
+            self.uplink.log(light_id, status, timestamp)
+
+    async def _schedule(self, changed):
+        while True:
+            changed.clear()
+            now = self.clock()
+            active = self.override_schedule.active_at(now)
+            if active is not self.active_overrides:
+                self.active_overrides = active
+                await self._frames.put(None)
+
+            # An override ends just after its end time (start <= now <= end)
+            boundary = self.override_schedule.next_boundary()
+            timeout = SCHEDULE_CHECK_INTERVAL
+            if boundary is not None:
+                timeout = min(timeout, max((boundary - now).total_seconds() + 0.001, 0))
+            try:
+                await asyncio.wait_for(changed.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+
+def main():
+    try:
+        from dotenv import load_dotenv
+        load_dotenv()
+    except Exception:
+        pass
+
+    try:
+        controller = Controller.from_env()
+    except FileNotFoundError:
+        print(f"Error: Model file '{MODEL_NAME}.joblib' not found in 'models/' directory.")
+        return
+    except serial.SerialException:
+        print("Error: Could not connect to Arduino. Check port and permissions.")
+        return
+
+    metrics_port = int(os.environ.get("METRICS_PORT", "9108"))
+    if metrics_port:
+        serve_metrics(metrics_port, os.environ.get("METRICS_HOST", "127.0.0.1"))
+        print(f"Serving metrics on port {metrics_port}.")
+
+    print("Beginning operation. Press Ctrl+C to exit.")
+    try:
+        asyncio.run(controller.run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Change-only actuation, lux smoothing and console rate limiting.
+
+Runs the Controller against a SimulatedArduino at night (lights on, PIRs
+firing now and then) at increasing sensor rates, once sending a command and
+printing a line for every frame and once with the options from_env()
+enables by default. Reports what each mode costs per second of operation:
+
+    commands    command frames written to the serial port
+    serial      bytes written to the serial port
+    console     bytes printed
+    CPU         process CPU time (simulator threads included)
+
+Run from the project root (Linux/macOS):
+    python -m benchmarks.bench_actuation [--lights 64] [--seconds 5] [--rates 4 50 200]
+"""
+import argparse
+import asyncio
+import contextlib
+import time
+from datetime import datetime
+
+import serial
+
+from automation import Controller
+from benchmarks.bench_end_to_end import run_controller
+from decision import DecisionEngine, DecisionTable
+from lights import LightTable
+from protocol import FRAME_COMMAND, encode_frame, pack_actions
+from simulator import SimClock, SimulatedArduino
+
+MODES = {
+    "every frame": {},
+    "change-only": {"lux_window": 2.0, "command_refresh": 5.0, "print_interval": 1.0},
+}
+# Chance per light per second that its PIR sees motion
+MOTION_PER_SECOND = 0.05
+
+
+class NullUplink:
+    """
+    Accepts status updates and logs without sending them anywhere.
+    """
+    api_url = "http://localhost"
+    timeout = 1.0
+
+    def __init__(self):
+        self.calls = 0
+
+    def start(self):
+        pass
+
+    def update_status(self, light_id, status):
+        self.calls += 1
+
+    def log(self, light_id, status, timestamp):
+        self.calls += 1
+
+    def queue_depth(self):
+        return 0
+
+    def close(self):
+        pass
+
+
+class ByteCounter:
+    def __init__(self):
+        self.bytes = 0
+
+    def write(self, text):
+        self.bytes += len(text)
+
+    def flush(self):
+        pass
+
+
+def run(num_lights, rate, seconds, options):
+    clock = SimClock(start=datetime.now().replace(hour=22, minute=0, second=0))
+    simulator = SimulatedArduino(num_lights, rate, "diurnal", clock, MOTION_PER_SECOND / rate, seed=rate)
+    controller = Controller(
+        serial.Serial(simulator.port_name, baudrate=115200, timeout=0.1),
+        DecisionTable(DecisionEngine.load("models/street_light_model"), hysteresis=5.0),
+        LightTable(range(1, num_lights + 1)),
+        NullUplink(),
+        clock=clock.now,
+        **options,
+    )
+    console = ByteCounter()
+    simulator.start()
+    cpu = time.process_time()
+    with contextlib.redirect_stdout(console):
+        elapsed = asyncio.run(run_controller(controller, seconds))
+    cpu = time.process_time() - cpu
+    simulator.stop()
+
+    frame_size = len(encode_frame(FRAME_COMMAND, 0, pack_actions(controller.lights.actions)))
+    return {
+        "frames": controller.frames / elapsed,
+        "commands": controller.commands / elapsed,
+        "serial": controller.commands * frame_size / elapsed,
+        "console": console.bytes / elapsed,
+        "cpu": cpu / elapsed * 100,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lights", type=int, default=64)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--rates", type=float, nargs="+", default=[4, 50, 200])
+    args = parser.parse_args()
+
+    print(f"{args.lights} lights, per second of operation")
+    print(f"{'rate':>5} | {'mode':<11} | {'frames':>7} | {'commands':>8} | {'serial':>9} | "
+          f"{'console':>10} | {'CPU':>5}")
+    for rate in args.rates:
+        for mode, options in MODES.items():
+            result = run(args.lights, rate, args.seconds, options)
+            print(f"{rate:5.0f} | {mode:<11} | {result['frames']:7.1f} | {result['commands']:8.1f} | "
+                  f"{result['serial']:7.0f} B | {result['console']:8.0f} B | {result['cpu']:4.1f}%")
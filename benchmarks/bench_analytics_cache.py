@@ -0,0 +1,147 @@
+"""
+Analytics endpoints under dashboard refresh load, with and without the
+response cache (dashboard/backend/cache.py).
+
+Starts the backend with uvicorn on a scratch database holding 30 days of
+seed_logs.py-style history for every light. Dashboard threads then reload
+the timeline and traffic of one light at a time (24h, 7d or 30d) with a
+short pause between refreshes, while a controller thread posts a log for
+a random light to /api/logs a few times a second, which invalidates that
+light's cached responses. Reports p50/p99 latency per endpoint, and from
+/metrics the hit ratio and the mean time spent in the server, then checks
+that a timeline read right after a write includes the new log.
+
+Run from the project root:
+    python -m benchmarks.bench_analytics_cache [--lights 20] [--dashboards 8] [--seconds 15]
+"""
+import argparse
+import random
+import re
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+
+import requests
+
+from benchmarks.common import percentile, start_backend, stop_backend
+
+DURATIONS = ["24h", "7d", "30d"]
+DAYS = 30
+
+
+def seed(url, num_lights, newest):
+    logs = []
+    for light_id in range(1, num_lights + 1):
+        status, patch_end = "OFF", newest - timedelta(days=DAYS)
+        for step in range(DAYS * 96, -1, -1):
+            timestamp = newest - timedelta(minutes=15 * step)
+            if 6 <= timestamp.hour < 18:
+                status = "OFF"
+            elif timestamp >= patch_end:
+                status = "DIM" if random.random() < 0.4 else "ON"
+                patch_end = timestamp + timedelta(minutes=random.randint(30, 150))
+            logs.append({"streetlight_id": light_id, "status": status, "timestamp": timestamp.isoformat()})
+    with requests.Session() as session:
+        for light_id in range(1, num_lights + 1):
+            session.post(f"{url}/api/streetlights", json={"id": light_id, "status": "OFF"})
+        for i in range(0, len(logs), 5000):
+            session.post(f"{url}/api/logs/bulk", json=logs[i:i + 5000]).raise_for_status()
+    return len(logs)
+
+
+def dashboard(url, num_lights, pause, stop, results):
+    with requests.Session() as session:
+        while not stop.is_set():
+            light_id, duration = random.randint(1, num_lights), random.choice(DURATIONS)
+            for endpoint in ("timeline", "traffic"):
+                start = time.perf_counter()
+                session.get(f"{url}/api/analytics/{light_id}/{endpoint}?duration={duration}").raise_for_status()
+                results.append((endpoint, time.perf_counter() - start))
+            stop.wait(pause)
+
+
+def controller(url, num_lights, rate, stop, written):
+    with requests.Session() as session:
+        while not stop.wait(1 / rate):
+            log = {"streetlight_id": random.randint(1, num_lights), "status": random.choice(("ON", "DIM", "OFF")),
+                   "timestamp": datetime.now().isoformat()}
+            session.post(f"{url}/api/logs", json=log).raise_for_status()
+            written.append(log)
+
+
+def scrape(url):
+    """
+    Cache hits and misses, and server-side request time per analytics endpoint.
+    """
+    text = requests.get(f"{url}/metrics").text
+    counts = {"hit": 0, "miss": 0}
+    for result, value in re.findall(r'analytics_cache_requests_total\{[^}]*result="(\w+)"\} (\S+)', text):
+        counts[result] += float(value)
+    for endpoint in ("timeline", "traffic"):
+        for suffix in ("sum", "count"):
+            pattern = rf'http_request_duration_seconds_{suffix}\{{method="GET",route="[^"]*/{endpoint}",[^ ]*\}} (\S+)'
+            counts[f"{endpoint}_{suffix}"] = sum(float(value) for value in re.findall(pattern, text))
+    return counts
+
+
+def sees_new_log(url):
+    """
+    Loads a timeline into the cache, writes a log with a different status
+    and checks the next read ends with it.
+    """
+    timeline = requests.get(f"{url}/api/analytics/1/timeline?duration=24h").json()
+    requests.get(f"{url}/api/analytics/1/timeline?duration=24h").raise_for_status()
+    status = "DIM" if timeline[-1]["status"] != "DIM" else "ON"
+    timestamp = datetime.now().isoformat()
+    requests.post(f"{url}/api/logs", json={"streetlight_id": 1, "status": status, "timestamp": timestamp})
+    last = requests.get(f"{url}/api/analytics/1/timeline?duration=24h").json()[-1]
+    return last["status"] == status and last["start_time"] == timestamp
+
+
+def run(label, cache_size, args):
+    server, url = start_backend(ANALYTICS_CACHE_SIZE=str(cache_size))
+    try:
+        seeded = seed(url, args.lights, datetime.now() - timedelta(seconds=30))
+        before = scrape(url)
+        stop = threading.Event()
+        results, written = [], []
+        threads = [threading.Thread(target=dashboard, args=(url, args.lights, args.pause, stop, results))
+                   for _ in range(args.dashboards)]
+        threads.append(threading.Thread(target=controller, args=(url, args.lights, args.write_rate, stop, written)))
+        for thread in threads:
+            thread.start()
+        time.sleep(args.seconds)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        after = scrape(url)
+        fresh = sees_new_log(url)
+    finally:
+        stop_backend(server)
+
+    hits, misses = after["hit"] - before["hit"], after["miss"] - before["miss"]
+    ratio = f"{100 * hits / (hits + misses):.0f}% hits" if hits + misses else "no cache"
+    print(f"{label} ({seeded} logs seeded, {len(written)} written during the run, {ratio}, "
+          f"new log {'visible' if fresh else 'NOT VISIBLE'} on the next read)")
+    for endpoint in ("timeline", "traffic"):
+        latencies = sorted(elapsed for e, elapsed in results if e == endpoint)
+        server_ms = (after[f"{endpoint}_sum"] - before[f"{endpoint}_sum"]) * 1000 / \
+            max(after[f"{endpoint}_count"] - before[f"{endpoint}_count"], 1)
+        print(f"  {endpoint:<8} | {len(latencies) / args.seconds:6.1f} req/s | "
+              f"p50 {percentile(latencies, 0.5):6.2f} ms | p99 {percentile(latencies, 0.99):6.2f} ms | "
+              f"in the server {server_ms:5.2f} ms mean")
+    return fresh
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lights", type=int, default=20)
+    parser.add_argument("--dashboards", type=int, default=8)
+    parser.add_argument("--pause", type=float, default=0.2, help="seconds between a dashboard's refreshes")
+    parser.add_argument("--write-rate", type=float, default=2, help="logs written per second")
+    parser.add_argument("--seconds", type=float, default=15)
+    args = parser.parse_args()
+    ok = run("no cache", 0, args) & run("LRU cache", 1024, args)
+    if not ok:
+        sys.exit(1)
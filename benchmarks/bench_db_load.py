@@ -0,0 +1,119 @@
+"""
+Concurrent log ingestion and dashboard reads against the backend.
+
+Starts the backend with uvicorn on a scratch SQLite database seeded with a
+day of logs, then for a fixed time runs writer threads (controllers
+posting batches to /api/logs/bulk, each with its own lights and outbox ID)
+next to reader threads (timeline, traffic and log history of random
+lights). Compares SQLite's default rollback journal with the WAL profile
+database.py applies, reporting throughput, latency percentiles and failed
+requests for each side.
+
+Run from the project root:
+    python -m benchmarks.bench_db_load [--writers 8] [--readers 8] [--seconds 10] [--workers 1]
+"""
+import argparse
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+
+import requests
+
+from benchmarks.common import percentile, start_backend, stop_backend
+
+PROFILES = {
+    "rollback journal": {"SQLITE_JOURNAL_MODE": "DELETE", "SQLITE_SYNCHRONOUS": "FULL"},
+    "WAL (default)": {},
+}
+LIGHTS_PER_WRITER = 8
+BATCH = 100
+
+
+def seed(url, num_lights, start):
+    with requests.Session() as session:
+        for light_id in range(1, num_lights + 1):
+            session.post(f"{url}/api/streetlights", json={"id": light_id, "status": "OFF"})
+        # One log per light every 2 minutes for the past day
+        logs = [{"streetlight_id": light_id, "status": random.choice(("ON", "DIM", "OFF")),
+                 "timestamp": (start + timedelta(minutes=2 * i)).isoformat()}
+                for i in range(720) for light_id in range(1, num_lights + 1)]
+        for i in range(0, len(logs), 5000):
+            session.post(f"{url}/api/logs/bulk", json=logs[i:i + 5000]).raise_for_status()
+    return len(logs)
+
+
+def writer(url, index, stop, results):
+    lights = range(index * LIGHTS_PER_WRITER + 1, (index + 1) * LIGHTS_PER_WRITER + 1)
+    timestamp = datetime.now()
+    seq = 0
+    with requests.Session() as session:
+        while not stop.is_set():
+            batch = []
+            for _ in range(BATCH):
+                seq += 1
+                timestamp += timedelta(seconds=1)
+                batch.append({"streetlight_id": random.choice(lights), "status": random.choice(("ON", "DIM", "OFF")),
+                              "timestamp": timestamp.isoformat(), "source": f"writer-{index}", "seq": seq})
+            start = time.perf_counter()
+            try:
+                ok = session.post(f"{url}/api/logs/bulk", json=batch, timeout=30).status_code == 200
+            except requests.exceptions.RequestException:
+                ok = False
+            results.append(("write", time.perf_counter() - start, ok))
+
+
+def reader(url, num_lights, stop, results):
+    paths = ["/api/analytics/{}/timeline?duration=24h", "/api/analytics/{}/traffic?duration=24h",
+             "/api/logs/{}?limit=100"]
+    with requests.Session() as session:
+        while not stop.is_set():
+            path = random.choice(paths).format(random.randint(1, num_lights))
+            start = time.perf_counter()
+            try:
+                ok = session.get(url + path, timeout=30).status_code == 200
+            except requests.exceptions.RequestException:
+                ok = False
+            results.append(("read", time.perf_counter() - start, ok))
+
+
+def run(profile, args):
+    server, url = start_backend(workers=args.workers, **PROFILES[profile])
+    try:
+        num_lights = args.writers * LIGHTS_PER_WRITER
+        seeded = seed(url, num_lights, datetime.now() - timedelta(days=1))
+        stop = threading.Event()
+        results = []
+        threads = [threading.Thread(target=writer, args=(url, i, stop, results)) for i in range(args.writers)]
+        threads += [threading.Thread(target=reader, args=(url, num_lights, stop, results)) for _ in range(args.readers)]
+        for thread in threads:
+            thread.start()
+        time.sleep(args.seconds)
+        stop.set()
+        for thread in threads:
+            thread.join()
+    finally:
+        stop_backend(server)
+
+    print(f"{profile} ({seeded} logs seeded)")
+    for kind in ("write", "read"):
+        latencies = sorted(elapsed for k, elapsed, ok in results if k == kind)
+        if not latencies:
+            continue
+        failed = sum(1 for k, _, ok in results if k == kind and not ok)
+        unit = f"{len(latencies) * BATCH / args.seconds:7.0f} logs/s" if kind == "write" \
+            else f"{len(latencies) / args.seconds:7.0f} req/s "
+        print(f"  {kind:<5} | {len(latencies) / args.seconds:6.1f} req/s | {unit} | "
+              f"p50 {percentile(latencies, 0.5):7.1f} ms | p99 {percentile(latencies, 0.99):7.1f} ms | "
+              f"max {latencies[-1] * 1000:7.1f} ms | failed {failed}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    args = parser.parse_args()
+    for profile in PROFILES:
+        run(profile, args)
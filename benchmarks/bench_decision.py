@@ -0,0 +1,103 @@
+"""
+Day/night decision: model evaluation vs the precomputed threshold table.
+
+1. Accuracy: disagreements between DecisionTable (no hysteresis) and the
+   raw model on every training row (also at half-second times, as floats)
+   and on a dense band of lux values around the threshold for every second
+   of the day.
+2. Flapping: one day at 4 frames per second, from the simulator's
+   diurnal curve (smooth, a few lux of sensor noise) and from the training
+   data (real readings, much noisier). Counts night-mode switches for each
+   hysteresis band, and for how long the result differs from the model.
+3. Latency per decision, for frames in time order.
+
+Run from the project root:
+    python -m benchmarks.bench_decision
+"""
+import time
+
+import numpy as np
+
+from decision import DecisionEngine, DecisionTable
+from simulator import CSV_PATH, diurnal_lux, load_csv_lux
+
+FRAMES_PER_SECOND = 4
+BANDS = (0.0, 1.0, 2.0, 5.0, 10.0)
+
+
+def accuracy(engine, resolution):
+    lux_by_second = load_csv_lux(CSV_PATH)
+    rng = np.random.default_rng(1)
+    table = DecisionTable(engine, resolution=resolution)
+
+    seconds = np.arange(86400)
+    thresholds = np.array([table.threshold(s) for s in seconds])
+    cases = [("training rows", seconds, lux_by_second)]
+    # Within +-0.01 lux of the exact threshold, the worst case for rounding
+    cases.append(("near threshold", seconds, thresholds + rng.uniform(-0.01, 0.01, 86400)))
+    # Controllers pass seconds_of_day as a float
+    cases.append(("float seconds", seconds + 0.5, lux_by_second))
+
+    for name, secs, lux in cases:
+        mismatches = sum(table.night_mode(l, s) != engine.night_mode(l, s)
+                         for s, l in zip(secs.tolist(), lux.tolist()))
+        print(f"  resolution {resolution:>2} s | {name:<14} | {mismatches} / {len(secs)} differ")
+
+
+def day_frames(source, seed=2):
+    """
+    (seconds, lux) for every frame of one day, as float32 like the Arduino sends.
+    """
+    rng = np.random.default_rng(seed)
+    seconds = np.repeat(np.arange(86400), FRAMES_PER_SECOND)
+    if source == "diurnal":
+        lux = np.array([diurnal_lux(s, rng) for s in seconds.tolist()])
+    else:
+        lux = np.repeat(load_csv_lux(CSV_PATH), FRAMES_PER_SECOND)
+    return seconds.tolist(), lux.astype(np.float32).astype(float).tolist()
+
+
+def switches(decisions):
+    return sum(a != b for a, b in zip(decisions, decisions[1:]))
+
+
+def flapping(engine, source):
+    seconds, lux = day_frames(source)
+    raw = [engine.night_mode(l, s) for s, l in zip(seconds, lux)]
+    print(f"  {source:<7} | raw model        | {switches(raw):5} switches")
+    for band in BANDS:
+        table = DecisionTable(engine, hysteresis=band)
+        decided = [table.night_mode(l, s) for s, l in zip(seconds, lux)]
+        differ = sum(a != b for a, b in zip(raw, decided))
+        print(f"  {source:<7} | hysteresis {band:4.1f} | {switches(decided):5} switches | "
+              f"{differ / FRAMES_PER_SECOND:6.0f} s differ from raw")
+
+
+def latency(engine):
+    n = 200000
+    rng = np.random.default_rng(3)
+    # Frames arrive in time order
+    seconds = (np.arange(n) // FRAMES_PER_SECOND % 86400).tolist()
+    lux = rng.uniform(0, 100, n).tolist()
+    tables = [(f"table ({resolution} s)", DecisionTable(engine, resolution=resolution, hysteresis=2.0).night_mode)
+              for resolution in (60, 1)]
+    for name, decide in [("model", engine.night_mode)] + tables:
+        best = float("inf")
+        for _ in range(5):
+            start = time.perf_counter()
+            for s, l in zip(seconds, lux):
+                decide(l, s)
+            best = min(best, time.perf_counter() - start)
+        print(f"  {name:<14} | {best / n * 1e9:6.0f} ns per decision")
+
+
+if __name__ == "__main__":
+    engine = DecisionEngine.load("models/street_light_model")
+    print("Accuracy vs raw model (no hysteresis)")
+    for resolution in (1, 60):
+        accuracy(engine, resolution)
+    print(f"Night-mode switches over one day at {FRAMES_PER_SECOND} frames/s")
+    for source in ("diurnal", "csv"):
+        flapping(engine, source)
+    print("Latency")
+    latency(engine)
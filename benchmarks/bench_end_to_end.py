@@ -0,0 +1,116 @@
+"""
+End-to-end throughput benchmark: simulator -> controller -> backend.
+
+Starts the backend with uvicorn on a scratch database and, for each light
+count, runs the real Controller (uplink and override schedule included)
+against a SimulatedArduino on a pty. Simulated time runs fast from dusk so
+lights actually switch. Reports:
+
+    frames/s            sensor frames decided per second
+    decision latency    frame read -> command written, inside the controller
+    round trip          frame sent -> command received, at the simulator
+    HTTP/change         uplink requests per light status change
+    DB rows             rows added to logs, status_intervals and rollups
+    CPU                 process CPU time (simulator threads and shutdown included)
+
+Run from the project root (Linux/macOS):
+    python -m benchmarks.bench_end_to_end [--lights 2 64 256] [--seconds 10] [--rate 50]
+"""
+import argparse
+import asyncio
+import sqlite3
+import time
+from datetime import datetime
+
+import serial
+
+from automation import Controller
+from benchmarks.common import percentile, scratch_path, start_backend, stop_backend
+from decision import DecisionEngine
+from lights import LightTable
+from overrides import OverrideSchedule
+from simulator import SimClock, SimulatedArduino
+from uplink import Uplink
+
+TABLES = ["logs", "status_intervals", "log_rollups_hourly", "log_rollups_daily"]
+
+
+def count_rows(db_path):
+    with sqlite3.connect(db_path) as conn:
+        return {table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] for table in TABLES}
+
+
+async def run_controller(controller, seconds):
+    """
+    Returns how long the controller was running, excluding the shutdown flush.
+    """
+    task = asyncio.create_task(controller.run(register=False))
+    start = time.perf_counter()
+    await asyncio.sleep(seconds)
+    controller.stop()
+    elapsed = time.perf_counter() - start
+    await task
+    return elapsed
+
+
+def run(url, db_path, engine, num_lights, args):
+    clock = SimClock(start=datetime.now().replace(hour=19, minute=0, second=0), speed=args.speed)
+    simulator = SimulatedArduino(num_lights, args.rate, args.source, clock, args.motion, seed=num_lights)
+    light_ids = list(range(1, num_lights + 1))
+
+    uplink = Uplink(url)
+    http_calls = [0]
+    uplink.session.hooks["response"].append(lambda response, *a, **kw: http_calls.__setitem__(0, http_calls[0] + 1))
+    controller = Controller(
+        serial.Serial(simulator.port_name, baudrate=115200, timeout=0.1),
+        engine,
+        LightTable(light_ids),
+        uplink,
+        OverrideSchedule(url, light_ids),
+        clock=clock.now,
+        verbose=False,
+    )
+
+    controller.register_streetlights()
+    before = count_rows(db_path)
+    simulator.start()
+    cpu = time.process_time()
+    # Returns after the shutdown flush, so everything the uplink managed to send is in the database
+    elapsed = asyncio.run(run_controller(controller, args.seconds))
+    cpu = time.process_time() - cpu
+    simulator.stop()
+    after = count_rows(db_path)
+
+    rows = {table: after[table] - before[table] for table in TABLES}
+    changes = controller.status_changes
+    print(f"{num_lights:>5} lights | {controller.frames / elapsed:7.0f} frames/s | "
+          f"decision p50 {percentile(controller.latencies, 0.5):6.2f} ms p99 {percentile(controller.latencies, 0.99):6.2f} ms | "
+          f"round trip p50 {percentile(simulator.round_trips, 0.5):6.2f} ms p99 {percentile(simulator.round_trips, 0.99):6.2f} ms | "
+          f"{changes} changes, {http_calls[0] / max(changes, 1):.2f} HTTP/change, "
+          f"{uplink.queue_depth()} logs unsent at exit | "
+          f"DB rows {sum(rows.values())} ({', '.join(f'{t} {n}' for t, n in rows.items())}) | "
+          f"CPU {100 * cpu / elapsed:.0f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lights", type=int, nargs="+", default=[2, 64, 256])
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--rate", type=float, default=50, help="sensor frames per second (0 = lockstep)")
+    parser.add_argument("--source", choices=["diurnal", "csv"], default="csv")
+    parser.add_argument("--speed", type=float, default=600, help="simulated seconds per real second")
+    parser.add_argument("--motion", type=float, default=0.05)
+    args = parser.parse_args()
+
+    db_path = scratch_path()
+    server, url = start_backend(db_path)
+    try:
+        engine = DecisionEngine.from_joblib('models/street_light_model.joblib')
+        for num_lights in args.lights:
+            run(url, db_path, engine, num_lights, args)
+    finally:
+        stop_backend(server)
+
+
+if __name__ == "__main__":
+    main()
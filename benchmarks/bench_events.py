@@ -0,0 +1,94 @@
+"""
+Load test for the /api/events Server-Sent Events stream.
+
+Starts the backend with uvicorn on a scratch database, connects a few
+thousand concurrent SSE subscribers (each filtered to one light or to all
+lights), then PATCHes streetlight statuses and measures how long each
+change takes to reach the subscribers.
+
+Run from the project root:
+    python -m benchmarks.bench_events [--subscribers 2000] [--updates 50]
+"""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+from urllib.parse import urlsplit
+
+import requests
+
+from benchmarks.common import start_backend, stop_backend
+
+LIGHTS = 10
+
+
+async def subscribe(port, light_id, received, ready):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port, limit=1 << 20)
+    query = f"?light_id={light_id}" if light_id else ""
+    writer.write(f"GET /api/events{query} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode())
+    await writer.drain()
+    while (await reader.readline()) not in (b"\r\n", b""):
+        pass
+    ready.release()
+    try:
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            if line.startswith(b"data: {"):
+                data = json.loads(line[6:])
+                received.append((time.perf_counter(), data["status"]))
+    finally:
+        writer.close()
+
+
+def send_updates(url, count, sent):
+    session = requests.Session()
+    for k in range(count):
+        light_id = k % LIGHTS + 1
+        sent[f"ON-{k}"] = time.perf_counter()
+        session.patch(f"{url}/api/streetlights/{light_id}", json={"status": f"ON-{k}"}).raise_for_status()
+        time.sleep(0.02)
+
+
+async def main(args):
+    server, url = start_backend()
+    port = urlsplit(url).port
+    try:
+        for light_id in range(1, LIGHTS + 1):
+            requests.post(f"{url}/api/streetlights", json={"id": light_id, "status": "OFF"})
+
+        received = []
+        ready = asyncio.Semaphore(0)
+        filters = [random.choice([None] + list(range(1, LIGHTS + 1))) for _ in range(args.subscribers)]
+        start = time.perf_counter()
+        tasks = [asyncio.create_task(subscribe(port, light_id, received, ready)) for light_id in filters]
+        for _ in tasks:
+            await ready.acquire()
+        print(f"{args.subscribers} subscribers connected in {time.perf_counter() - start:.1f} s")
+
+        sent = {}
+        await asyncio.get_running_loop().run_in_executor(None, send_updates, url, args.updates, sent)
+        await asyncio.sleep(2)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+        expected = sum(
+            1 for k in range(args.updates) for light_id in filters if light_id in (None, k % LIGHTS + 1)
+        )
+        latencies = sorted((t - sent[status]) * 1000 for t, status in received if status in sent)
+        print(f"{args.updates} updates | {len(received)}/{expected} events delivered")
+        print(f"delivery latency p50 {statistics.median(latencies):.1f} ms | "
+              f"p99 {latencies[int(len(latencies) * 0.99)]:.1f} ms | max {latencies[-1]:.1f} ms")
+    finally:
+        stop_backend(server)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--subscribers", type=int, default=2000)
+    parser.add_argument("--updates", type=int, default=50)
+    asyncio.run(main(parser.parse_args()))
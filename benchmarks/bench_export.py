@@ -0,0 +1,146 @@
+"""
+Streaming log export (GET /api/export/logs) up to 10M rows.
+
+Fills a scratch SQLite database with --rows logs over 1000 lights, starts
+the backend on it with uvicorn and downloads exports of 1%, 10% and 100%
+of the rows (by light) in each format. Reports rows/s, MB/s and the
+server's peak RSS (anonymous memory) during each export: with a streaming
+export it stays at the same level whatever the row count. For comparison,
+a child process builds the same response the way /api/logs used to (every
+ORM row and schemas.Log object in one JSON array) for the smaller exports.
+
+Run from the project root:
+    python -m benchmarks.bench_export [--rows 10000000] [--formats ndjson csv parquet]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+import requests
+
+from benchmarks.common import start_backend, stop_backend
+
+LIGHTS = 1000
+STEP = timedelta(minutes=15)
+INSERT_BATCH = 100000
+
+LEGACY = """
+import json, resource, sys
+from fastapi.encoders import jsonable_encoder
+from dashboard.backend import models, schemas
+from dashboard.backend.database import SessionLocal
+light_ids = list(range(1, int(sys.argv[1]) + 1))
+with SessionLocal() as db:
+    rows = db.query(models.Log).filter(models.Log.streetlight_id.in_(light_ids))\\
+             .order_by(models.Log.streetlight_id, models.Log.timestamp).all()
+    body = json.dumps(jsonable_encoder([schemas.Log.model_validate(row) for row in rows])).encode()
+print(len(rows), len(body), resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+"""
+
+
+def fill(db_path, rows):
+    import sqlite3
+    now = datetime.now().replace(microsecond=0)
+    statuses = ("ON", "DIM", "OFF")
+    with sqlite3.connect(db_path) as connection:
+        for batch_start in range(0, rows, INSERT_BATCH):
+            connection.executemany(
+                "INSERT INTO logs (streetlight_id, status, timestamp) VALUES (?, ?, ?)",
+                [(k % LIGHTS + 1, statuses[(k // LIGHTS) % 3], (now - STEP * (k // LIGHTS)).isoformat(sep=" "))
+                 for k in range(batch_start, min(batch_start + INSERT_BATCH, rows))],
+            )
+        # Keep the backend from building rollups and intervals for all of
+        # this at startup; the export doesn't read them
+        connection.execute("INSERT INTO log_rollups_hourly (streetlight_id, bucket_start) VALUES (0, '2000-01-01')")
+        connection.execute("INSERT INTO status_intervals (streetlight_id, status, start_time) "
+                           "VALUES (0, 'OFF', '2000-01-01')")
+
+
+def anon_rss_mb(pid):
+    # Anonymous memory only: pages of the memory-mapped database file are
+    # cache the kernel can drop, not memory the export holds
+    with open(f"/proc/{pid}/status") as status:
+        for line in status:
+            if line.startswith("RssAnon:"):
+                return int(line.split()[1]) / 1024
+    return float("nan")
+
+
+class PeakSampler(threading.Thread):
+    def __init__(self, pid):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.peak = anon_rss_mb(pid)
+        self.stop = threading.Event()
+
+    def run(self):
+        while not self.stop.wait(0.02):
+            self.peak = max(self.peak, anon_rss_mb(self.pid))
+
+
+def export(url, fmt, num_lights):
+    params = [("format", fmt)] + [("light_id", i) for i in range(1, num_lights + 1)] if num_lights < LIGHTS \
+        else [("format", fmt)]
+    size = lines = 0
+    start = time.perf_counter()
+    with requests.get(f"{url}/api/export/logs", params=params, stream=True) as response:
+        response.raise_for_status()
+        for chunk in response.iter_content(1 << 20):
+            size += len(chunk)
+            lines += chunk.count(b"\n")
+    return time.perf_counter() - start, size, lines
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--formats", nargs="+", choices=["ndjson", "csv", "parquet"],
+                        default=["ndjson", "csv", "parquet"])
+    args = parser.parse_args()
+
+    db_path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    server, _ = start_backend(db_path)
+    stop_backend(server)
+    start = time.perf_counter()
+    fill(db_path, args.rows)
+    print(f"{args.rows} logs over {LIGHTS} lights inserted in {time.perf_counter() - start:.0f} s "
+          f"({os.path.getsize(db_path) / 1e9:.2f} GB)")
+
+    for fmt in args.formats:
+        server, url = start_backend(db_path)
+        try:
+            print(f"{fmt}: server RSS {anon_rss_mb(server.pid):.0f} MB after startup")
+            for num_lights in (LIGHTS // 100, LIGHTS // 10, LIGHTS):
+                rows = args.rows * num_lights // LIGHTS
+                sampler = PeakSampler(server.pid)
+                sampler.start()
+                elapsed, size, lines = export(url, fmt, num_lights)
+                sampler.stop.set()
+                sampler.join()
+                checked = ""
+                if fmt != "parquet":
+                    checked = f" ({'all rows' if lines == rows + (fmt == 'csv') else 'ROWS MISSING'})"
+                print(f"  {rows:>10} rows{checked} | {elapsed:6.1f} s | {rows / elapsed:8.0f} rows/s | "
+                      f"{size / 1e6:7.1f} MB, {size / 1e6 / elapsed:5.1f} MB/s | "
+                      f"server peak RSS {sampler.peak:.0f} MB")
+        finally:
+            stop_backend(server)
+
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{db_path}")
+    print("materialized JSON array (old /api/logs):")
+    for num_lights in (LIGHTS // 100, LIGHTS // 10):
+        start = time.perf_counter()
+        output = subprocess.run([sys.executable, "-c", LEGACY, str(num_lights)], env=env,
+                                capture_output=True, text=True, check=True).stdout.split()
+        rows, size, rss_kb = map(int, output)
+        print(f"  {rows:>10} rows | {time.perf_counter() - start:6.1f} s | {size / 1e6:7.1f} MB | "
+              f"peak RSS {rss_kb / 1024:.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
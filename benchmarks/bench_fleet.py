@@ -0,0 +1,141 @@
+"""
+Fleet analytics (GET /api/analytics/fleet) against one timeline and one
+traffic request per light, at 100, 1k and 10k lights.
+
+For each size, fills a scratch SQLite database with --days of
+seed_logs.py-style history (a log every 15 minutes, with every tenth light
+silent from 30 to 12 hours ago) for every light and starts the backend
+with uvicorn, which builds the rollups and intervals.
+It then times the single-light endpoints for every light in turn, the way
+a city-wide dashboard has to use them, and the fleet endpoint for all
+lights at once. The analytics cache is off, so both compute every answer.
+Finally, for --check random lights, it compares the fleet summary of the
+light (?light_id=) with its single-light answers read right after it:
+traffic counts, current status and number of changes exactly, minutes per
+status to within 0.1 minute. (Comparing against the timed sweep doesn't
+work at 10k lights: the windows move by minutes while it runs.)
+
+Run from the project root:
+    python -m benchmarks.bench_fleet [--sizes 100 1000 10000] [--duration 24h] [--workers 1]
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import requests
+
+from benchmarks.common import start_backend, stop_backend
+
+STEP = timedelta(minutes=15)
+
+
+def fill(db_path, num_lights, days, now):
+    random.seed(1)
+    steps = days * 24 * 4
+    total = 0
+    with sqlite3.connect(db_path) as connection:
+        connection.executemany("INSERT INTO streetlights (id, status) VALUES (?, 'OFF')",
+                               [(light_id,) for light_id in range(1, num_lights + 1)])
+        for light_id in range(1, num_lights + 1):
+            rows = []
+            # Lights report at different minutes, so their windows start at different logs
+            offset = timedelta(minutes=light_id % 15)
+            status, patch_end = "OFF", now - STEP * steps
+            silent = light_id % 10 == 0
+            for step in range(steps, -1, -1):
+                timestamp = now - STEP * step - offset
+                if silent and timestamp >= now - timedelta(hours=30):
+                    if timestamp < now - timedelta(hours=12):
+                        continue
+                    # Back with another status, well after the 24h window starts
+                    silent, status = False, "DIM" if status != "DIM" else "ON"
+                elif 6 <= timestamp.hour < 18:
+                    status = "OFF"
+                elif timestamp >= patch_end:
+                    status = "DIM" if random.random() < 0.4 else "ON"
+                    patch_end = timestamp + timedelta(minutes=random.randint(30, 150))
+                rows.append((light_id, status, timestamp.isoformat(sep=" ", timespec="microseconds")))
+            connection.executemany("INSERT INTO logs (streetlight_id, status, timestamp) VALUES (?, ?, ?)", rows)
+            total += len(rows)
+    return total
+
+
+def single_light(url, num_lights, duration):
+    with requests.Session() as session:
+        for light_id in range(1, num_lights + 1):
+            session.get(f"{url}/api/analytics/{light_id}/timeline", params={"duration": duration}).raise_for_status()
+            session.get(f"{url}/api/analytics/{light_id}/traffic", params={"duration": duration}).raise_for_status()
+
+
+def matches(url, light_id, duration):
+    """
+    Fleet summary of one light against its single-light answers, read
+    right after each other so the windows have barely moved.
+    """
+    params = {"duration": duration}
+    light, = requests.get(f"{url}/api/analytics/fleet", params={**params, "light_id": light_id}).json()["lights"]
+    timeline = requests.get(f"{url}/api/analytics/{light_id}/timeline", params=params).json()
+    traffic = requests.get(f"{url}/api/analytics/{light_id}/traffic", params=params).json()
+    for status in ("ON", "DIM", "OFF"):
+        if light["traffic"][status] != sum(bucket["raw_counts"][status] for bucket in traffic):
+            return False
+    if not timeline:
+        return light["status"] is None
+    if light["status"] != timeline[-1]["status"] or light["changes"] != len(timeline) - 1:
+        return False
+    return all(abs(light["minutes"][status] - sum(entry["duration_minutes"] for entry in timeline
+                                                  if entry["status"] == status)) < 0.1
+               for status in ("ON", "DIM", "OFF"))
+
+
+def run(num_lights, args):
+    db_path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    server, _ = start_backend(db_path)
+    stop_backend(server)
+    now = datetime.now().replace(microsecond=0) - timedelta(minutes=1)
+    start = time.perf_counter()
+    rows = fill(db_path, num_lights, args.days, now)
+    server, url = start_backend(db_path, wait=3600,
+                                FLEET_ANALYTICS_WORKERS=str(args.workers))
+    setup = time.perf_counter() - start
+    try:
+        start = time.perf_counter()
+        single_light(url, num_lights, args.duration)
+        single = time.perf_counter() - start
+
+        fleet_times = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            response = requests.get(f"{url}/api/analytics/fleet", params={"duration": args.duration})
+            response.raise_for_status()
+            fleet_times.append(time.perf_counter() - start)
+        fleet_time = sorted(fleet_times)[len(fleet_times) // 2]
+        checked = sorted(random.sample(range(1, num_lights + 1), min(num_lights, args.check)))
+        ok = len(response.json()["lights"]) == num_lights and \
+            all([matches(url, light_id, args.duration) for light_id in checked])
+    finally:
+        stop_backend(server)
+
+    print(f"{num_lights:>6} lights ({rows} logs, set up in {setup:.0f} s) | "
+          f"{2 * num_lights} single-light requests {single:7.2f} s | fleet request {fleet_time * 1000:8.1f} ms | "
+          f"{single / fleet_time:6.0f}x | {len(checked)} lights checked: {'match' if ok else 'DIFFERENT'}")
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--duration", default="24h", choices=["1h", "6h", "12h", "24h", "7d", "30d"])
+    parser.add_argument("--days", type=int, default=2, help="days of history per light")
+    parser.add_argument("--workers", type=int, default=1, help="FLEET_ANALYTICS_WORKERS for the backend")
+    parser.add_argument("--repeat", type=int, default=3, help="fleet requests timed (the median is shown)")
+    parser.add_argument("--check", type=int, default=500, help="lights compared with the single-light answers")
+    args = parser.parse_args()
+    ok = all([run(num_lights, args) for num_lights in args.sizes])
+    if not ok:
+        sys.exit(1)
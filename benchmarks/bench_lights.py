@@ -0,0 +1,87 @@
+"""
+Per-frame controller latency for different numbers of lights.
+
+Feeds synthetic sensor frames through a fake serial port and runs the same
+parse -> decide -> write -> diff steps as automation.py.
+
+Run from the project root:
+    python -m benchmarks.bench_lights
+"""
+import random
+import time
+
+from decision import DecisionEngine
+from lights import LightTable
+from protocol import (FRAME_COMMAND, FRAME_SENSOR, FrameReader, decode_sensor_payload, encode_frame,
+                      encode_sensor_payload)
+
+FRAMES = 2000
+
+
+class FakeSerial:
+    """
+    Minimal stand-in for serial.Serial that replays pre-generated frames.
+    """
+
+    def __init__(self, frames):
+        self.frames = frames
+        self.position = 0
+        self.bytes_written = 0
+
+    @property
+    def in_waiting(self):
+        if self.position == len(self.frames):
+            return 0
+        return len(self.frames[self.position])
+
+    def readinto(self, buffer):
+        frame = self.frames[self.position]
+        buffer[:len(frame)] = frame
+        self.position += 1
+        return len(frame)
+
+    def write(self, data):
+        self.bytes_written += len(data)
+        return len(data)
+
+
+def make_frames(num_lights, count):
+    frames = []
+    for seq in range(count):
+        lux = random.uniform(0, 40)
+        pirs = [random.random() < 0.2 for _ in range(num_lights)]
+        frames.append(encode_frame(FRAME_SENSOR, seq, encode_sensor_payload(lux, pirs)))
+    return frames
+
+
+def run(engine, num_lights):
+    lights = LightTable(range(1, num_lights + 1))
+    port = FakeSerial(make_frames(num_lights, FRAMES))
+    reader = FrameReader()
+    overrides = set(range(1, num_lights + 1, 10))
+    timings = []
+    changes = 0
+
+    while port.in_waiting > 0:
+        start = time.perf_counter()
+        reader.readinto(port, port.in_waiting)
+        _, seq, payload = reader.next_frame()
+        lux, pirs = decode_sensor_payload(payload, lights.num_channels)
+        night_mode_active = engine.night_mode(lux, 3600)
+        lights.set_overrides(overrides)
+        lights.decide(night_mode_active, pirs)
+        port.write(encode_frame(FRAME_COMMAND, seq, lights.command()))
+        changes += len(lights.status_changes())
+        timings.append(time.perf_counter() - start)
+
+    timings.sort()
+    p50 = timings[len(timings) // 2] * 1e6
+    p99 = timings[int(len(timings) * 0.99)] * 1e6
+    print(f"{num_lights:>5} lights | p50 {p50:8.1f} us | p99 {p99:8.1f} us | "
+          f"{changes} status changes | {port.bytes_written} bytes written")
+
+
+if __name__ == "__main__":
+    engine = DecisionEngine.from_joblib('models/street_light_model.joblib')
+    for num_lights in (2, 64, 1024):
+        run(engine, num_lights)
@@ -0,0 +1,126 @@
+"""
+Status updates and fleet reads at 10k lights.
+
+Starts the backend with uvicorn on a scratch database holding --lights
+streetlights, then for a fixed time runs writer threads changing random
+lights' statuses next to reader threads loading GET /api/streetlights (the
+whole fleet, as the dashboards do). Writers either PATCH one light per
+request or send batches to PATCH /api/streetlights. Reports status updates
+applied per second, read latency percentiles, and whether the database
+holds the final statuses once the backend has shut down. Before that it
+registers a few lights out of ID order through POST /api/streetlights and
+checks that GET /api/streetlights still lists them by ID.
+
+--backend-dir runs the backend from another checkout, e.g. a git worktree
+of an older commit, for a before/after comparison (use --modes per-light
+if that checkout has no batch endpoint).
+
+Run from the project root:
+    python -m benchmarks.bench_live_status [--lights 10000] [--modes per-light batch]
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+from benchmarks.common import percentile, start_backend, stop_backend
+
+STATUSES = ("ON", "DIM", "OFF")
+
+
+def writer(url, num_lights, batch_size, stop, applied):
+    with requests.Session() as session:
+        while not stop.is_set():
+            if batch_size:
+                batch = [{"id": random.randint(1, num_lights), "status": random.choice(STATUSES)}
+                         for _ in range(batch_size)]
+                session.patch(f"{url}/api/streetlights", json=batch).raise_for_status()
+                applied.append(len(batch))
+            else:
+                light_id = random.randint(1, num_lights)
+                session.patch(f"{url}/api/streetlights/{light_id}",
+                              json={"status": random.choice(STATUSES)}).raise_for_status()
+                applied.append(1)
+
+
+def reader(url, stop, latencies):
+    with requests.Session() as session:
+        while not stop.is_set():
+            start = time.perf_counter()
+            session.get(f"{url}/api/streetlights").raise_for_status()
+            latencies.append(time.perf_counter() - start)
+
+
+def registration_order(args):
+    db_path = os.path.join(tempfile.mkdtemp(), "order.db")
+    registered = [5, 3, 9, 1]
+    server, url = start_backend(db_path, backend_dir=args.backend_dir)
+    try:
+        for light_id in registered:
+            requests.post(f"{url}/api/streetlights", json={"id": light_id, "status": "OFF"}).raise_for_status()
+        listed = [light["id"] for light in requests.get(f"{url}/api/streetlights").json()]
+    finally:
+        stop_backend(server)
+    ok = listed == sorted(registered)
+    print(f"lights registered as {registered}: listed as {listed}, {'in ID order' if ok else 'NOT IN ID ORDER'}")
+    return ok
+
+
+def run(mode, args):
+    db_path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    # First start creates the schema; the lights are inserted directly
+    server, _ = start_backend(db_path, backend_dir=args.backend_dir)
+    stop_backend(server)
+    with sqlite3.connect(db_path) as connection:
+        connection.executemany("INSERT INTO streetlights (id, status) VALUES (?, 'OFF')",
+                               [(i,) for i in range(1, args.lights + 1)])
+
+    server, url = start_backend(db_path, backend_dir=args.backend_dir)
+    try:
+        stop = threading.Event()
+        applied, latencies = [], []
+        batch_size = args.batch if mode == "batch" else 0
+        threads = [threading.Thread(target=writer, args=(url, args.lights, batch_size, stop, applied))
+                   for _ in range(args.writers)]
+        threads += [threading.Thread(target=reader, args=(url, stop, latencies)) for _ in range(args.readers)]
+        for thread in threads:
+            thread.start()
+        time.sleep(args.seconds)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        final = {light["id"]: light["status"] for light in requests.get(f"{url}/api/streetlights").json()}
+    finally:
+        stop_backend(server)
+
+    with sqlite3.connect(db_path) as connection:
+        stored = dict(connection.execute("SELECT id, status FROM streetlights").fetchall())
+    latencies.sort()
+    reads = "no reads"
+    if latencies:
+        reads = f"GET /api/streetlights {len(latencies) / args.seconds:5.1f} req/s, " \
+                f"p50 {percentile(latencies, 0.5):6.1f} ms, p99 {percentile(latencies, 0.99):6.1f} ms"
+    print(f"{mode:<9} | {sum(applied) / args.seconds:8.0f} updates/s | {reads} | "
+          f"database {'matches' if stored == final else 'DIFFERS FROM'} the final statuses")
+    return stored == final
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lights", type=int, default=10000)
+    parser.add_argument("--modes", nargs="+", choices=["per-light", "batch"], default=["per-light", "batch"])
+    parser.add_argument("--batch", type=int, default=500, help="statuses per batch request")
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--readers", type=int, default=2)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--backend-dir", default=".", help="checkout to run the backend from")
+    args = parser.parse_args()
+    ok = all([registration_order(args)] + [run(mode, args) for mode in args.modes])
+    if not ok:
+        sys.exit(1)
@@ -0,0 +1,57 @@
+"""
+Rows/second for POST /api/logs (one row per request) versus
+POST /api/logs/bulk (JSON array and NDJSON) on a scratch SQLite database.
+
+Run from the project root:
+    python -m benchmarks.bench_log_ingest
+"""
+import json
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.common import scratch_database
+
+scratch_database()
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from dashboard.backend.main import app  # noqa: E402
+
+SINGLE_ROWS = 2000
+BULK_ROWS = 200000
+
+
+def make_logs(count):
+    start = datetime(2025, 1, 1)
+    return [
+        {
+            "streetlight_id": i % 100 + 1,
+            "status": ("ON", "DIM", "OFF")[i % 3],
+            "timestamp": (start + timedelta(seconds=15 * i)).isoformat(timespec='seconds'),
+        }
+        for i in range(count)
+    ]
+
+
+def report(name, rows, elapsed):
+    print(f"{name:<12} {rows:>8} rows in {elapsed:7.2f} s | {rows / elapsed:>10.0f} rows/s")
+
+
+if __name__ == "__main__":
+    client = TestClient(app)
+
+    logs = make_logs(SINGLE_ROWS)
+    start = time.perf_counter()
+    for log in logs:
+        client.post("/api/logs", json=log).raise_for_status()
+    report("single", SINGLE_ROWS, time.perf_counter() - start)
+
+    logs = make_logs(BULK_ROWS)
+    start = time.perf_counter()
+    client.post("/api/logs/bulk", json=logs).raise_for_status()
+    report("bulk json", BULK_ROWS, time.perf_counter() - start)
+
+    body = "".join(json.dumps(log) + "\n" for log in logs)
+    start = time.perf_counter()
+    client.post("/api/logs/bulk", content=body, headers={"Content-Type": "application/x-ndjson"}).raise_for_status()
+    report("bulk ndjson", BULK_ROWS, time.perf_counter() - start)
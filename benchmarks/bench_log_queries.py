@@ -0,0 +1,104 @@
+"""
+Latency of the per-light log queries as the logs table grows.
+
+Fills a scratch SQLite database in stages up to --rows (default 10M), adding
+older history at each stage, and times the log listing and analytics
+queries for one light. With the (streetlight_id, timestamp) index their cost
+depends on the rows in the requested window, not on the table size.
+
+Run from the project root:
+    python -m benchmarks.bench_log_queries [--rows 10000000]
+"""
+import argparse
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.common import scratch_database
+
+scratch_database()
+
+from fastapi import Response  # noqa: E402
+
+from dashboard.backend import intervals, main, rollups  # noqa: E402
+from dashboard.backend.database import SessionLocal, engine  # noqa: E402
+
+LIGHTS = 1000
+STEP = timedelta(minutes=15)
+INSERT_BATCH = 100000
+NOW = datetime.now().replace(microsecond=0)
+
+
+def fill(connection, start, stop):
+    """
+    Row k belongs to light k % LIGHTS and lies (k // LIGHTS) steps before now,
+    so each stage only adds history older than what is already there.
+    """
+    statuses = ("ON", "DIM", "OFF")
+    for batch_start in range(start, stop, INSERT_BATCH):
+        rows = [
+            (k % LIGHTS + 1, statuses[(k // LIGHTS) % 3], (NOW - STEP * (k // LIGHTS)).isoformat(sep=' '))
+            for k in range(batch_start, min(batch_start + INSERT_BATCH, stop))
+        ]
+        connection.executemany("INSERT INTO logs (streetlight_id, status, timestamp) VALUES (?, ?, ?)", rows)
+    connection.commit()
+
+
+def timed(fn, repeat=20):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+
+def run_queries(size):
+    db = SessionLocal()
+    light_id = LIGHTS // 2
+    since = NOW - timedelta(days=1)
+    first_page = Response()
+    main.get_logs_for_streetlight(light_id, first_page, since=since, limit=50, db=db)
+    cursor = first_page.headers["X-Next-Cursor"]
+
+    results = {
+        "logs page": timed(lambda: main.get_logs_for_streetlight(light_id, Response(), since=since, limit=50, db=db)),
+        "logs next page": timed(lambda: main.get_logs_for_streetlight(light_id, Response(), since=since, limit=50, cursor=cursor, db=db)),
+        "timeline 24h": timed(lambda: main.get_light_timeline(light_id, "24h", db=db)),
+        "traffic 24h": timed(lambda: main.get_traffic_analysis(light_id, "24h", db=db)),
+    }
+    db.close()
+    print(f"{size:>10} rows | " + " | ".join(f"{name} {ms:7.2f} ms" for name, ms in results.items()))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    args = parser.parse_args()
+
+    stages = [size for size in (100_000, 1_000_000, 10_000_000) if size < args.rows] + [args.rows]
+    connection = engine.raw_connection()
+    inserted = 0
+    for size in stages:
+        start = time.perf_counter()
+        fill(connection, inserted, size)
+        filled = time.perf_counter() - start
+
+        # Bring the analytics rollups and intervals up to date for the history just added
+        db = SessionLocal()
+        oldest, newest = NOW - STEP * ((size - 1) // LIGHTS), NOW - STEP * (inserted // LIGHTS)
+        ranges = {light_id: (oldest, newest) for light_id in range(1, LIGHTS + 1)}
+        rollups.update_for_new_logs(db, ranges)
+        intervals.update_for_new_logs(db, ranges)
+        db.commit()
+        db.close()
+        inserted = size
+        print(f"-- filled to {size} rows in {filled:.1f} s, rollups and intervals updated in {time.perf_counter() - start - filled:.1f} s")
+        run_queries(size)
+
+    plan = connection.execute(
+        "EXPLAIN QUERY PLAN SELECT * FROM logs WHERE streetlight_id = ? AND timestamp >= ? ORDER BY timestamp",
+        (1, NOW.isoformat(sep=' ')),
+    ).fetchall()
+    print("query plan:", "; ".join(row[-1] for row in plan))
+    connection.close()
@@ -0,0 +1,124 @@
+"""
+Cost of the metrics instrumentation.
+
+Measures the primitives (histogram observe, counter inc), the extra work
+the controller does per frame (four timed sections), the backend request
+middleware on a trivial ASGI app and the SQL timing hooks on SELECT 1,
+each with and without instrumentation. The per-frame figure is the one
+that has to stay within a few microseconds.
+
+Run from the project root:
+    python -m benchmarks.bench_metrics
+"""
+import asyncio
+import time
+
+from sqlalchemy import create_engine, text
+
+from dashboard.backend import telemetry
+from metrics import Counter, Histogram, Registry
+
+N = 200000
+
+
+def per_call_ns(fn, n=N):
+    best = float("inf")
+    for _ in range(5):
+        start = time.perf_counter()
+        fn(n)
+        best = min(best, time.perf_counter() - start)
+    return best / n * 1e9
+
+
+def primitives():
+    registry = Registry()
+    histogram = Histogram("bench_seconds", "bench", registry=registry)
+    counter = Counter("bench_total", "bench", registry=registry)
+    observe, inc = histogram.observe, counter.inc
+
+    def empty(n):
+        for _ in range(n):
+            pass
+
+    def observing(n):
+        for _ in range(n):
+            observe(0.0002)
+
+    def counting(n):
+        for _ in range(n):
+            inc()
+
+    def timing(n):
+        now = time.perf_counter
+        for _ in range(n):
+            start = now()
+            observe(now() - start)
+
+    loop = per_call_ns(empty)
+    print(f"histogram observe      {per_call_ns(observing) - loop:7.0f} ns")
+    print(f"counter inc            {per_call_ns(counting) - loop:7.0f} ns")
+    print(f"timed section          {per_call_ns(timing) - loop:7.0f} ns (2x perf_counter + observe)")
+
+    def frame(n):
+        # What Controller adds per frame: read, decision, write and frame latency
+        now = time.perf_counter
+        for _ in range(n):
+            received = now()
+            observe(now() - received)
+            start = now()
+            observe(now() - start)
+            start = now()
+            done = now()
+            observe(done - start)
+            observe(done - received)
+
+    print(f"controller per frame   {(per_call_ns(frame) - loop) / 1000:7.2f} us")
+
+
+async def call_asgi(app, n):
+    scope = {"type": "http", "method": "GET", "path": "/", "headers": []}
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        pass
+
+    for _ in range(n):
+        await app(scope, receive, send)
+
+
+def middleware():
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    n = N // 4
+    plain = per_call_ns(lambda n: asyncio.run(call_asgi(app, n)), n)
+    wrapped = per_call_ns(lambda n: asyncio.run(call_asgi(telemetry.MetricsMiddleware(app), n)), n)
+    print(f"request middleware     {(wrapped - plain) / 1000:7.2f} us per request")
+
+
+def sql_hooks():
+    n = N // 10
+    timings = []
+    for instrumented in (False, True):
+        engine = create_engine("sqlite://")
+        if instrumented:
+            telemetry.instrument_engine(engine)
+        with engine.connect() as conn:
+            statement = text("SELECT 1")
+
+            def query(n):
+                for _ in range(n):
+                    conn.execute(statement).scalar()
+
+            timings.append(per_call_ns(query, n))
+    print(f"SQL timing hooks       {(timings[1] - timings[0]) / 1000:7.2f} us per statement "
+          f"({timings[0] / 1000:.1f} us -> {timings[1] / 1000:.1f} us for SELECT 1)")
+
+
+if __name__ == "__main__":
+    primitives()
+    middleware()
+    sql_hooks()
@@ -0,0 +1,229 @@
+"""
+Uplink outbox: write throughput, bounded disk use and outages.
+
+1. Throughput: status changes appended per second with the uplink's
+   batched commits (one fsync per commit), and the cost of each commit.
+2. Disk use: a long outage appending far more changes than max_entries.
+3. Outages against a local stub backend that, like the real one, skips
+   logs at or below the highest seq it stored for their source:
+     down      backend refuses everything for a while, then comes back
+     lossy     30% of responses are lost after the logs were stored
+     crash     the controller process is killed with SIGKILL mid-stream
+               and restarted on the same outbox file
+   Each checks that every delivered log is stored exactly once and, after
+   the crash, that what was stored is a gap-free prefix of what was sent.
+
+Run from the project root (uses a scratch directory next to it unless
+--dir is given, e.g. a path on the SD card):
+    python -m benchmarks.bench_outbox [--dir /mnt/sd/tmp]
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from outbox import Outbox
+from uplink import Uplink
+
+
+class StubBackend(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    mode = "up"
+    lose_responses = 0.0
+    lock = threading.Lock()
+    marks = {}
+    stored = []
+    duplicates = 0
+
+    @classmethod
+    def reset(cls):
+        cls.mode, cls.lose_responses = "up", 0.0
+        cls.marks, cls.stored, cls.duplicates = {}, [], 0
+
+    def _reply(self, body=b"{}"):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_PATCH(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.mode == "down":
+            self.send_error(503)
+            return
+        self._reply()
+
+    def do_POST(self):
+        batch = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        if self.mode == "down":
+            self.send_error(503)
+            return
+        inserted = 0
+        with self.lock:
+            for log in batch:
+                if log["seq"] <= self.marks.get(log["source"], 0):
+                    StubBackend.duplicates += 1
+                    continue
+                self.marks[log["source"]] = log["seq"]
+                self.stored.append((log["streetlight_id"], log["timestamp"]))
+                inserted += 1
+        if random.random() < self.lose_responses:
+            # Stored, but the controller never hears about it
+            self.close_connection = True
+            return
+        self._reply(json.dumps({"inserted": inserted, "duplicates": len(batch) - inserted}).encode())
+
+    def log_message(self, format, *args):
+        pass
+
+
+def wait_for(condition, timeout=60):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.05)
+    return condition()
+
+
+def disk_usage(path):
+    return sum(os.path.getsize(path + suffix) for suffix in ("", "-wal", "-shm") if os.path.exists(path + suffix))
+
+
+def throughput(directory):
+    path = os.path.join(directory, "throughput.db")
+    outbox = Outbox(path)
+    n, batch = 200000, 2000
+    append_time = commit_time = 0.0
+    commits = []
+    for start in range(0, n, batch):
+        t0 = time.perf_counter()
+        for i in range(start, start + batch):
+            outbox.append(i % 64, "ON" if i % 2 else "OFF", "2025-01-01T00:00:00")
+        t1 = time.perf_counter()
+        outbox.commit()
+        t2 = time.perf_counter()
+        append_time += t1 - t0
+        commit_time += t2 - t1
+        commits.append(t2 - t1)
+    outbox.close()
+    commits.sort()
+    print(f"throughput | {n / (append_time + commit_time):8.0f} changes/s | append {append_time / n * 1e6:.2f} us | "
+          f"commit of {batch}: p50 {commits[len(commits) // 2] * 1000:.1f} ms, max {commits[-1] * 1000:.1f} ms")
+
+    # One commit per change: what the fsync batching saves
+    outbox = Outbox(os.path.join(directory, "unbatched.db"))
+    t0 = time.perf_counter()
+    for i in range(500):
+        outbox.append(i % 64, "ON", "2025-01-01T00:00:00")
+        outbox.commit()
+    print(f"           | {500 / (time.perf_counter() - t0):8.0f} changes/s with a commit per change")
+    outbox.close()
+
+
+def bounded(directory):
+    path = os.path.join(directory, "bounded.db")
+    outbox = Outbox(path, max_entries=50000)
+    sizes = []
+    for start in range(0, 500000, 5000):
+        for i in range(start, start + 5000):
+            outbox.append(i % 64, "ON", "2025-01-01T00:00:00")
+        outbox.commit()
+        sizes.append(disk_usage(path))
+    print(f"disk use   | 500000 changes, max_entries 50000 | kept {len(outbox)} | dropped {outbox.dropped} | "
+          f"files {sizes[9] / 1e6:.1f} MB after 50000, {max(sizes) / 1e6:.1f} MB peak, {sizes[-1] / 1e6:.1f} MB at end")
+    outbox.close()
+
+
+def check(name, expected):
+    stored = StubBackend.stored
+    ok = len(stored) == len(set(stored)) == expected
+    print(f"{name:<10} | stored {len(stored)}/{expected} | duplicates skipped {StubBackend.duplicates} | "
+          f"{'exactly once' if ok else 'MISMATCH'}")
+    return ok
+
+
+def outage(url, directory, mode):
+    StubBackend.reset()
+    n = 5000
+    uplink = Uplink(url, outbox=Outbox(os.path.join(directory, f"{mode}.db")), flush_interval=0.05,
+                    max_backoff=0.5).start()
+    if mode == "down":
+        StubBackend.mode = "down"
+    else:
+        StubBackend.lose_responses = 0.3
+    for i in range(n):
+        uplink.log(1, "ON", f"t{i}")
+        if i % 50 == 0:
+            time.sleep(0.001)
+    if mode == "down":
+        time.sleep(1)
+        StubBackend.mode = "up"
+    wait_for(lambda: len(StubBackend.stored) >= n and uplink.queue_depth() == 0)
+    uplink.close()
+    return check(mode, n)
+
+
+CHILD = """
+import sys, time
+from outbox import Outbox
+from uplink import Uplink
+uplink = Uplink(sys.argv[1], outbox=Outbox(sys.argv[2]), flush_interval=0.05, max_backoff=0.5).start()
+i = 0
+while True:
+    uplink.log(1, "ON", f"t{i}")
+    i += 1
+    if i % 5 == 0:
+        time.sleep(0.001)
+"""
+
+
+def crash(url, directory):
+    StubBackend.reset()
+    StubBackend.lose_responses = 0.3
+    path = os.path.join(directory, "crash.db")
+    child = subprocess.Popen([sys.executable, "-c", CHILD, url, path])
+    time.sleep(2)
+    os.kill(child.pid, signal.SIGKILL)
+    child.wait()
+    before = len(StubBackend.stored)
+
+    # Restart on the same file; whatever was committed is still there
+    outbox = Outbox(path)
+    pending = len(outbox)
+    uplink = Uplink(url, outbox=outbox, flush_interval=0.05, max_backoff=0.5).start()
+    wait_for(lambda: uplink.queue_depth() == 0, timeout=300)
+    uplink.close()
+
+    stored = [int(timestamp[1:]) for _, timestamp in StubBackend.stored]
+    prefix = stored == list(range(len(stored)))
+    print(f"crash      | stored {before} before the kill, {pending} more from the outbox after restart | "
+          f"{'gap-free prefix' if prefix else 'GAPS'}")
+    return check("crash", len(stored)) and prefix
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dir", help="where to put the outbox files (default: a scratch directory here)")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(dir=args.dir or ".")
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubBackend)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        throughput(directory)
+        bounded(directory)
+        ok = all([outage(url, directory, "down"), outage(url, directory, "lossy"), crash(url, directory)])
+    finally:
+        server.shutdown()
+        shutil.rmtree(directory)
+    if not ok:
+        sys.exit(1)
@@ -0,0 +1,191 @@
+"""
+Serial round-trip benchmark for the binary protocol, over a pseudo-terminal.
+
+A thread plays the Arduino on the master end of a pty: it sends a sensor
+frame, waits for the command frame and records the round trip. The host
+side opens the slave end with pyserial and runs the same read -> decide ->
+write steps as automation.py. The legacy ASCII protocol ('lux,pir1,...'
+lines, 'a1,...,aN' commands) is run the same way for comparison.
+
+A second check pushes frames through FrameReader with random corruption
+and junk between frames and verifies that every intact frame is recovered.
+
+Run from the project root (Linux/macOS):
+    python -m benchmarks.bench_protocol [--frames 2000]
+"""
+import argparse
+import os
+import random
+import threading
+import time
+import tty
+
+import numpy as np
+import serial
+
+from decision import DecisionEngine
+from lights import LightTable
+from protocol import (FRAME_COMMAND, FRAME_SENSOR, FrameReader, decode_sensor_payload, encode_frame,
+                      encode_sensor_payload, unpack_actions)
+
+
+def random_reading(num_lights):
+    return random.uniform(0, 40), [random.random() < 0.2 for _ in range(num_lights)]
+
+
+class BinaryController(threading.Thread):
+    """
+    Firmware side of the binary protocol on the pty master.
+    """
+
+    def __init__(self, fd, num_lights, frames):
+        super().__init__(daemon=True)
+        self.port = os.fdopen(fd, 'r+b', buffering=0)
+        self.num_lights = num_lights
+        self.frames = frames
+        self.latencies = []
+        self.bytes_sent = 0
+        self.bytes_received = 0
+
+    def run(self):
+        reader = FrameReader()
+        for seq in range(self.frames):
+            frame = encode_frame(FRAME_SENSOR, seq, encode_sensor_payload(*random_reading(self.num_lights)))
+            start = time.perf_counter()
+            self.port.write(frame)
+            self.bytes_sent += len(frame)
+            while True:
+                self.bytes_received += reader.readinto(self.port, 4096)
+                command = reader.next_frame()
+                if command is not None and command[0] == FRAME_COMMAND:
+                    break
+            self.latencies.append(time.perf_counter() - start)
+            unpack_actions(command[2], self.num_lights)
+
+
+class AsciiController(threading.Thread):
+    """
+    Firmware side of the original ASCII protocol on the pty master.
+    """
+
+    def __init__(self, fd, num_lights, frames):
+        super().__init__(daemon=True)
+        self.port = os.fdopen(fd, 'r+b', buffering=0)
+        self.num_lights = num_lights
+        self.frames = frames
+        self.latencies = []
+        self.bytes_sent = 0
+        self.bytes_received = 0
+
+    def run(self):
+        pending = b""
+        for _ in range(self.frames):
+            lux, pirs = random_reading(self.num_lights)
+            line = (f"{lux:.2f}," + ','.join('1' if p else '0' for p in pirs) + "\r\n").encode()
+            start = time.perf_counter()
+            self.port.write(line)
+            self.bytes_sent += len(line)
+            while b"\n" not in pending:
+                pending += self.port.read(4096)
+            self.latencies.append(time.perf_counter() - start)
+            command, pending = pending.split(b"\n", 1)
+            self.bytes_received += len(command) + 1
+            [int(c) for c in command.split(b",")]
+
+
+def host_binary(port, engine, lights, frames):
+    reader = FrameReader()
+    seq = 0
+    handled = 0
+    while handled < frames:
+        reader.readinto(port, max(port.in_waiting, 1))
+        while (frame := reader.next_frame()) is not None:
+            frame_type, _, payload = frame
+            if frame_type != FRAME_SENSOR:
+                continue
+            lux, pirs = decode_sensor_payload(payload, lights.num_channels)
+            lights.decide(engine.night_mode(lux, 3600), pirs)
+            port.write(encode_frame(FRAME_COMMAND, seq, lights.command()))
+            seq = (seq + 1) & 0xFF
+            lights.status_changes()
+            handled += 1
+
+
+def host_ascii(port, engine, lights, frames):
+    for _ in range(frames):
+        parts = port.readline().decode('utf-8').rstrip().split(',')
+        lux, pirs = float(parts[0]), np.array(parts[1:], dtype=np.uint8)
+        lights.decide(engine.night_mode(lux, 3600), pirs)
+        port.write((','.join(str(a) for a in lights.actions.tolist()) + "\n").encode())
+        lights.status_changes()
+
+
+def round_trip(protocol, engine, num_lights, frames):
+    master, slave = os.openpty()
+    tty.setraw(master)
+    port = serial.Serial(os.ttyname(slave), baudrate=115200, timeout=1)
+    lights = LightTable(range(1, num_lights + 1))
+    controller_cls, host = (BinaryController, host_binary) if protocol == "binary" else (AsciiController, host_ascii)
+    controller = controller_cls(master, num_lights, frames)
+
+    start = time.perf_counter()
+    controller.start()
+    host(port, engine, lights, frames)
+    controller.join()
+    elapsed = time.perf_counter() - start
+    port.close()
+    os.close(slave)
+    controller.port.close()
+
+    latencies = sorted(controller.latencies)
+    p50 = latencies[len(latencies) // 2] * 1e6
+    p99 = latencies[int(len(latencies) * 0.99)] * 1e6
+    per_frame = (controller.bytes_sent + controller.bytes_received) / frames
+    # 10 bits per byte on an 8N1 link; the pty itself has no baud rate
+    wire_ms = per_frame * 10 / 115200 * 1000
+    print(f"{protocol:>6} | {num_lights:>5} lights | {frames / elapsed:8.0f} frames/s | "
+          f"round trip p50 {p50:7.1f} us | p99 {p99:7.1f} us | {per_frame:7.1f} bytes/frame "
+          f"({wire_ms:.2f} ms at 115200 baud)")
+
+
+def check_resync(num_lights, frames):
+    stream = bytearray()
+    intact = 0
+    for seq in range(frames):
+        frame = bytearray(encode_frame(FRAME_SENSOR, seq, encode_sensor_payload(*random_reading(num_lights))))
+        if random.random() < 0.05:
+            frame[random.randrange(len(frame))] ^= 1 << random.randrange(8)
+        else:
+            intact += 1
+        if random.random() < 0.05:
+            stream += os.urandom(random.randint(1, 20))
+        stream += frame
+
+    reader = FrameReader()
+    recovered = 0
+    position = 0
+    while position < len(stream):
+        # Arbitrary chunk boundaries, like a real serial read
+        chunk = random.randint(1, 256)
+        reader.feed(stream[position:position + chunk])
+        position += chunk
+        while reader.next_frame() is not None:
+            recovered += 1
+    # Junk can contain a valid-looking frame only by CRC collision, so allow a tiny surplus
+    status = "ok" if recovered >= intact else "LOST FRAMES"
+    print(f"resync | {intact} intact frames, {recovered} recovered | {reader.bad_frames} bad frames, "
+          f"{reader.skipped_bytes} junk bytes skipped, {reader.lost_frames} gaps by sequence | {status}")
+    return recovered >= intact
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--frames", type=int, default=2000)
+    args = parser.parse_args()
+
+    engine = DecisionEngine.from_joblib('models/street_light_model.joblib')
+    for num_lights in (2, 64, 1024):
+        for protocol in ("ascii", "binary"):
+            round_trip(protocol, engine, num_lights, args.frames)
+    if not check_resync(64, 20000):
+        raise SystemExit(1)
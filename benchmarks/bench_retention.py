@@ -0,0 +1,236 @@
+"""
+Log retention (dashboard/backend/retention.py): analytics unchanged after
+archiving, and uploads while the job runs.
+
+Fills a scratch database with --days of seed_logs.py-style history for
+--lights lights (one of them silent for the last 60 days, one stuck in
+the same status for the last 50) and lets the backend build the rollups
+and intervals, then copies it as a reference. The backend is started on
+the original with LOG_RETENTION_DAYS=31, so the job archives every month
+before the horizon at startup, while a controller thread uploads small
+batches of new logs for other lights to /api/logs/bulk. Reports the
+archived and deleted rows, the archive size and the upload latency during
+the job and once it has finished.
+
+Both backends then receive the same late logs (one reviving the silent
+light, one out of order inside the stuck light's long interval), and the
+retained one a log older than the horizon, which it must refuse. Finally
+it checks that the rollups and intervals of both databases are identical,
+that timeline and traffic for 24h, 7d and 30d windows come out the same,
+and that an export of every log, archived months included, matches the
+reference byte for byte (apart from the IDs of the late logs). Exits with
+status 1 on any difference.
+
+Run from the project root:
+    python -m benchmarks.bench_retention [--lights 20] [--days 120] [--batch-rows 2000]
+"""
+import argparse
+import os
+import random
+import re
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+import requests
+
+from benchmarks.common import percentile, start_backend, stop_backend
+
+DURATIONS = {"24h": timedelta(hours=24), "7d": timedelta(days=7), "30d": timedelta(days=30)}
+RETENTION_DAYS = 31
+ROLLUP_COLUMNS = "streetlight_id, bucket_start, on_count, dim_count, off_count, on_seconds, dim_seconds, off_seconds"
+# Table: columns compared (not the IDs, which the uploads during the job use up)
+TABLES = {
+    "log_rollups_hourly": ROLLUP_COLUMNS,
+    "log_rollups_daily": ROLLUP_COLUMNS,
+    "status_intervals": "streetlight_id, status, start_time, end_time",
+}
+
+
+def fill(db_path, num_lights, days, now):
+    random.seed(1)
+    rows = []
+    for light_id in range(1, num_lights + 1):
+        status, patch_end = "OFF", now - timedelta(days=days)
+        for step in range(days * 96, -1, -1):
+            timestamp = now - timedelta(minutes=15 * step)
+            if light_id == num_lights and timestamp > now - timedelta(days=60):
+                # Silent since before the horizon
+                break
+            if light_id == num_lights - 1 and timestamp > now - timedelta(days=50):
+                status = "DIM"
+            elif 6 <= timestamp.hour < 18:
+                status = "OFF"
+            elif timestamp >= patch_end:
+                status = "DIM" if random.random() < 0.4 else "ON"
+                patch_end = timestamp + timedelta(minutes=random.randint(30, 150))
+            rows.append((light_id, status, timestamp.isoformat(sep=" ", timespec="microseconds")))
+    with sqlite3.connect(db_path) as connection:
+        connection.executemany("INSERT INTO logs (streetlight_id, status, timestamp) VALUES (?, ?, ?)", rows)
+    return len(rows)
+
+
+def copy_database(source, target):
+    with sqlite3.connect(source) as src, sqlite3.connect(target) as dst:
+        src.backup(dst)
+
+
+def metric(url, name):
+    text = requests.get(f"{url}/metrics").text
+    return sum(float(value) for value in re.findall(rf"^{name}(?:{{[^}}]*}})? (\S+)$", text, re.MULTILINE))
+
+
+def controller(url, first_light, num_lights, stop, latencies):
+    with requests.Session() as session:
+        while not stop.wait(0.05):
+            batch = [{"streetlight_id": light_id, "status": random.choice(("ON", "DIM", "OFF")),
+                      "timestamp": datetime.now().isoformat()}
+                     for light_id in range(first_light, first_light + num_lights)]
+            start = time.perf_counter()
+            session.post(f"{url}/api/logs/bulk", json=batch).raise_for_status()
+            latencies.append(time.perf_counter() - start)
+
+
+def upload_latencies(url, args, seconds, until=None):
+    stop, latencies = threading.Event(), []
+    thread = threading.Thread(target=controller, args=(url, args.lights + 1, 10, stop, latencies))
+    thread.start()
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds or (until is not None and not until()):
+        time.sleep(0.2)
+    stop.set()
+    thread.join()
+    latencies.sort()
+    return f"{len(latencies)} uploads, p50 {percentile(latencies, 0.5):6.1f} ms, " \
+           f"p99 {percentile(latencies, 0.99):6.1f} ms, max {latencies[-1] * 1000:6.1f} ms"
+
+
+def horizon(now):
+    return (now - timedelta(days=RETENTION_DAYS)).replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def late_logs(url, num_lights, now):
+    logs = [
+        {"streetlight_id": num_lights, "status": "ON", "timestamp": (now - timedelta(hours=2)).isoformat()},
+        {"streetlight_id": num_lights - 1, "status": "ON",
+         "timestamp": (horizon(now) + timedelta(hours=2, minutes=7)).isoformat()},
+    ]
+    return requests.post(f"{url}/api/logs/bulk", json=logs).json()
+
+
+def expired_log(url, now):
+    log = {"streetlight_id": 1, "status": "ON", "timestamp": (horizon(now) - timedelta(days=3)).isoformat()}
+    return requests.post(f"{url}/api/logs/bulk", json=[log]).json()
+
+
+def export(url, num_lights, seeded):
+    """
+    NDJSON export of the seeded lights, without the IDs of logs uploaded
+    after the fill.
+    """
+    params = [("format", "ndjson")] + [("light_id", i) for i in range(1, num_lights + 1)]
+    response = requests.get(f"{url}/api/export/logs", params=params)
+    response.raise_for_status()
+    return [re.sub(rb'^\{"id":\d+,', b"{", line) if int(line[6:line.index(b",")]) > seeded else line
+            for line in response.content.splitlines()]
+
+
+def table_rows(db_path, num_lights):
+    with sqlite3.connect(db_path) as connection:
+        return {table: connection.execute(f"SELECT {columns} FROM {table} WHERE streetlight_id <= ? "
+                                          "ORDER BY 1, 2, 3", (num_lights,)).fetchall()
+                for table, columns in TABLES.items()}
+
+
+def analytics(db_path, num_lights, now):
+    """
+    Timeline and traffic of every light as the endpoints compute them,
+    for fixed windows ending at `now`.
+    """
+    # Importing main opens its own database; keep it away from the project's
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    from dashboard.backend import intervals, main
+    from dashboard.backend.database import create_db_engine
+    from sqlalchemy.orm import sessionmaker
+
+    engine = create_db_engine(f"sqlite:///{db_path}", read_only=True)
+    results = {}
+    try:
+        with sessionmaker(bind=engine)() as db:
+            for light_id in range(1, num_lights + 1):
+                for duration, length in DURATIONS.items():
+                    # The last interval is closed at the current time
+                    results[light_id, duration, "timeline"] = intervals.timeline(db, light_id, now - length)[:-1]
+                    results[light_id, duration, "traffic"] = main.compute_traffic(db, light_id, duration,
+                                                                                  now - length)
+    finally:
+        engine.dispose()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lights", type=int, default=20)
+    parser.add_argument("--days", type=int, default=120)
+    parser.add_argument("--batch-rows", type=int, default=2000)
+    parser.add_argument("--seconds", type=float, default=5, help="upload latency sample after the job")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    db_path, reference_path = os.path.join(directory, "bench.db"), os.path.join(directory, "reference.db")
+    archive_dir = os.path.join(directory, "archive")
+    now = datetime.now().replace(microsecond=0) - timedelta(minutes=5)
+    server, _ = start_backend(db_path)
+    stop_backend(server)
+    rows = fill(db_path, args.lights, args.days, now)
+    # Backfills the rollups and intervals
+    server, _ = start_backend(db_path)
+    stop_backend(server)
+    copy_database(db_path, reference_path)
+    print(f"{rows} logs over {args.lights} lights, {args.days} days")
+
+    server, url = start_backend(db_path, LOG_RETENTION_DAYS=str(RETENTION_DAYS), LOG_ARCHIVE_DIR=archive_dir,
+                                RETENTION_BATCH_ROWS=str(args.batch_rows))
+    try:
+        start = time.perf_counter()
+        during = upload_latencies(url, args, 0, until=lambda: metric(url, "log_retention_runs_total") > 0)
+        elapsed = time.perf_counter() - start
+        archived, deleted = metric(url, "log_retention_rows_archived_total"), \
+            metric(url, "log_retention_rows_deleted_total")
+        size = sum(os.path.getsize(os.path.join(archive_dir, name)) for name in os.listdir(archive_dir))
+        print(f"retention job: {elapsed:.1f} s, {archived:.0f} logs archived to {len(os.listdir(archive_dir))} "
+              f"month files ({size / 1e6:.1f} MB), {deleted:.0f} raw logs deleted")
+        print(f"  uploads during the job | {during}")
+        print(f"  uploads afterwards     | {upload_latencies(url, args, args.seconds)}")
+        late = late_logs(url, args.lights, now)
+        expired = expired_log(url, now)
+        retained_export = export(url, args.lights, rows)
+    finally:
+        stop_backend(server)
+
+    server, url = start_backend(reference_path)
+    try:
+        reference_late = late_logs(url, args.lights, now)
+        reference_export = export(url, args.lights, rows)
+    finally:
+        stop_backend(server)
+
+    checks = {
+        "late logs stored": late == reference_late == {"inserted": 2, "duplicates": 0, "expired": 0},
+        "log older than the horizon refused": expired == {"inserted": 0, "duplicates": 0, "expired": 1},
+        "rollups and intervals identical": table_rows(db_path, args.lights) == table_rows(reference_path, args.lights),
+        "timeline and traffic identical":
+            analytics(db_path, args.lights, now) == analytics(reference_path, args.lights, now),
+        "export identical": retained_export == reference_export,
+    }
+    for check, ok in checks.items():
+        print(f"{check}: {'yes' if ok else 'NO'}")
+    if not all(checks.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Controller startup: joblib model vs the JSON coefficients file.
+
+Each run is a fresh interpreter that imports automation and loads the
+decision engine, the work a controller repeats after a watchdog restart
+or power loss. Reports wall time for the whole process (interpreter
+start included), time to a ready engine, and peak RSS. Also checks that
+both engines hold the same parameters and that a coefficients file from
+another model is rejected.
+
+Run from the project root:
+    python -m benchmarks.bench_startup [--runs 5]
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from decision import DecisionEngine
+
+PREFIX = "models/street_light_model"
+
+CHILD = """
+import time
+start = time.perf_counter()
+import automation
+from decision import DecisionEngine
+engine = {load}
+ready = time.perf_counter() - start
+import resource, sys
+heavy = sorted(name for name in ('sklearn', 'pandas', 'scipy', 'joblib') if name in sys.modules)
+print(ready, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, ','.join(heavy) or '-')
+"""
+
+LOADERS = {
+    "joblib": f"DecisionEngine.from_joblib('{PREFIX}.joblib')",
+    "json": f"DecisionEngine.load('{PREFIX}')",
+}
+
+
+def measure(loader):
+    start = time.perf_counter()
+    output = subprocess.run([sys.executable, "-c", CHILD.format(load=LOADERS[loader])],
+                            capture_output=True, text=True, check=True).stdout
+    wall = time.perf_counter() - start
+    ready, rss, heavy = output.split()
+    return wall, float(ready), float(rss), heavy
+
+
+def check_parity_and_stale():
+    slow = DecisionEngine.from_joblib(f"{PREFIX}.joblib")
+    fast = DecisionEngine.load(PREFIX)
+    assert vars(slow) == vars(fast), (vars(slow), vars(fast))
+
+    directory = tempfile.mkdtemp()
+    try:
+        prefix = os.path.join(directory, "model")
+        shutil.copy(f"{PREFIX}.joblib", f"{prefix}.joblib")
+        with open(f"{PREFIX}.json") as f:
+            params = json.load(f)
+        params["joblib_sha256"] = "0" * 64
+        with open(f"{prefix}.json", "w") as f:
+            json.dump(params, f)
+        try:
+            DecisionEngine.from_coefficients(f"{prefix}.json", f"{prefix}.joblib")
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("stale coefficients file was accepted")
+    finally:
+        shutil.rmtree(directory)
+    print("parameters match, stale coefficients file rejected")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'model':>7} | {'process':>9} | {'engine ready':>12} | {'peak RSS':>9} | heavy modules loaded")
+    for loader in LOADERS:
+        runs = [measure(loader) for _ in range(args.runs)]
+        wall = statistics.median(run[0] for run in runs)
+        ready = statistics.median(run[1] for run in runs)
+        rss = statistics.median(run[2] for run in runs)
+        print(f"{loader:>7} | {wall * 1000:7.0f} ms | {ready * 1000:9.0f} ms | {rss:6.1f} MB | {runs[0][3]}")
+    # Last: peak RSS (ru_maxrss, Linux kilobytes) survives exec, so the
+    # children must be started before this process loads sklearn
+    check_parity_and_stale()
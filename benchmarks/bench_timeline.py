@@ -0,0 +1,131 @@
+"""
+Regression check and latency benchmark for /api/analytics/{light_id}/timeline.
+
+Seeds seed_logs.py-style history (a log every 15 minutes, long steady
+stretches) through the API, partly out of order, then compares the
+interval-backed timeline with the original log-scanning implementation
+(kept below) for every calculate_cutoff duration and times both.
+
+Run from the project root:
+    python -m benchmarks.bench_timeline
+"""
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.common import scratch_database
+
+scratch_database()
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from dashboard.backend import intervals, main, models  # noqa: E402
+from dashboard.backend.database import SessionLocal  # noqa: E402
+
+DURATIONS = ["1h", "6h", "12h", "24h", "7d", "30d"]
+LIGHT_ID = 1
+DAYS = 30
+
+
+def legacy_timeline(light_id, duration, db):
+    cutoff_time = main.calculate_cutoff(duration)
+
+    logs = db.query(models.Log)\
+             .filter(models.Log.streetlight_id == light_id, models.Log.timestamp >= cutoff_time)\
+             .order_by(models.Log.timestamp)\
+             .all()
+
+    if not logs:
+        return []
+
+    timeline = []
+    current_start = logs[0].timestamp
+    current_status = logs[0].status
+
+    for i in range(1, len(logs)):
+        log = logs[i]
+        if log.status != current_status:
+            timeline.append({
+                "status": current_status,
+                "start_time": current_start,
+                "end_time": log.timestamp,
+                "duration_minutes": (log.timestamp - current_start).total_seconds() / 60
+            })
+            current_status = log.status
+            current_start = log.timestamp
+
+    timeline.append({
+        "status": current_status,
+        "start_time": current_start,
+        "end_time": datetime.now(),
+        "duration_minutes": (datetime.now() - current_start).total_seconds() / 60
+    })
+
+    return timeline
+
+
+def make_logs():
+    # Offset by 30 s so no log sits on a calculate_cutoff() boundary
+    newest = datetime.now() - timedelta(seconds=30)
+    logs = []
+    status, patch_end = "OFF", newest - timedelta(days=DAYS)
+    for step in range(DAYS * 96, -1, -1):
+        timestamp = newest - timedelta(minutes=15 * step)
+        if 6 <= timestamp.hour < 18:
+            status = "OFF"
+        elif timestamp >= patch_end:
+            status = "DIM" if random.random() < 0.4 else "ON"
+            patch_end = timestamp + timedelta(minutes=random.randint(30, 150))
+        logs.append({"streetlight_id": LIGHT_ID, "status": status, "timestamp": timestamp.isoformat()})
+    return logs
+
+
+def without_open_end(timeline):
+    # The last interval ends at datetime.now(), which differs between calls
+    return timeline[:-1] + [{"status": timeline[-1]["status"], "start_time": timeline[-1]["start_time"]}] if timeline else []
+
+
+def timed(fn, repeat=10):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+
+if __name__ == "__main__":
+    client = TestClient(main.app)
+    logs = make_logs()
+    in_order, shuffled = logs[:-500], logs[-500:]
+    random.shuffle(shuffled)
+    client.post("/api/logs/bulk", json=in_order[:len(in_order) // 2]).raise_for_status()
+    for log in in_order[len(in_order) // 2:] + shuffled:
+        client.post("/api/logs", json=log).raise_for_status()
+
+    db = SessionLocal()
+    print(f"{db.query(models.Log).count()} logs stored as {db.query(models.StatusInterval).count()} intervals")
+    failed = False
+    for duration in DURATIONS:
+        expected = legacy_timeline(LIGHT_ID, duration, db)
+        actual = main.get_light_timeline(LIGHT_ID, duration, db=db)
+        match = without_open_end(expected) == without_open_end(actual)
+        failed |= not match
+
+        legacy_ms = timed(lambda: legacy_timeline(LIGHT_ID, duration, db))
+        interval_ms = timed(lambda: main.get_light_timeline(LIGHT_ID, duration, db=db))
+        print(f"{duration:>5} | {len(actual):>4} intervals | {'match' if match else 'MISMATCH'} | "
+              f"logs {legacy_ms:7.2f} ms | intervals {interval_ms:6.2f} ms")
+
+    before = db.query(models.StatusInterval.status, models.StatusInterval.start_time, models.StatusInterval.end_time)\
+               .order_by(models.StatusInterval.start_time).all()
+    intervals.compact(db)
+    after = db.query(models.StatusInterval.status, models.StatusInterval.start_time, models.StatusInterval.end_time)\
+              .order_by(models.StatusInterval.start_time).all()
+    print(f"incremental intervals {'match' if before == after else 'DIFFER FROM'} full compaction")
+    failed |= before != after
+    db.close()
+    if failed:
+        sys.exit(1)
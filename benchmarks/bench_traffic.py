@@ -0,0 +1,103 @@
+"""
+Regression check and latency benchmark for /api/analytics/{light_id}/traffic.
+
+Compares the rollup-backed implementation against the original Python
+implementation (kept below) for every calculate_cutoff duration, on a busy
+light with one log per minute over 30 days, then times both.
+
+Run from the project root:
+    python -m benchmarks.bench_traffic
+"""
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.common import scratch_database
+
+scratch_database()
+
+from dashboard.backend import main, models, rollups  # noqa: E402
+from dashboard.backend.database import SessionLocal, engine  # noqa: E402
+
+DURATIONS = ["1h", "6h", "12h", "24h", "7d", "30d", "unknown"]
+LIGHT_ID = 1
+
+
+def legacy_traffic_analysis(light_id, duration, db):
+    cutoff_time = main.calculate_cutoff(duration)
+
+    logs = db.query(models.Log)\
+             .filter(models.Log.streetlight_id == light_id, models.Log.timestamp >= cutoff_time)\
+             .order_by(models.Log.timestamp)\
+             .all()
+
+    if not logs:
+        return []
+
+    is_long_duration = duration in ["7d", "30d"]
+    bucket_format = "%Y-%m-%d" if is_long_duration else "%Y-%m-%d %H:00"
+
+    bucketed_stats = {}
+
+    for log in logs:
+        bucket_key = log.timestamp.strftime(bucket_format)
+
+        if bucket_key not in bucketed_stats:
+            bucketed_stats[bucket_key] = {"ON": 0, "DIM": 0, "OFF": 0, "total": 0}
+
+        bucketed_stats[bucket_key][log.status] += 1
+        bucketed_stats[bucket_key]["total"] += 1
+
+    return main.summarize_traffic(bucketed_stats)
+
+
+def seed():
+    # Offset by 30 s so no row sits on a calculate_cutoff() boundary
+    newest = datetime.now() - timedelta(seconds=30)
+    rows = []
+    for light_id in (LIGHT_ID, 2):
+        for minute in range(30 * 24 * 60):
+            timestamp = newest - timedelta(minutes=minute)
+            night = not 6 <= timestamp.hour < 18
+            status = random.choice(("ON", "DIM", "DIM")) if night else random.choice(("OFF",) * 9 + ("DIM",))
+            rows.append((light_id, status, timestamp.isoformat(sep=' ')))
+    connection = engine.raw_connection()
+    connection.executemany("INSERT INTO logs (streetlight_id, status, timestamp) VALUES (?, ?, ?)", rows)
+    connection.commit()
+    connection.close()
+
+    db = SessionLocal()
+    start = time.perf_counter()
+    rollups.rebuild(db)
+    print(f"rollups rebuilt in {time.perf_counter() - start:.2f} s")
+    db.close()
+
+
+def timed(fn, repeat=10):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+
+if __name__ == "__main__":
+    seed()
+    db = SessionLocal()
+    failed = False
+    for duration in DURATIONS:
+        expected = legacy_traffic_analysis(LIGHT_ID, duration, db)
+        actual = main.get_traffic_analysis(LIGHT_ID, duration, db=db)
+        match = expected == actual
+        failed |= not match
+
+        legacy_ms = timed(lambda: legacy_traffic_analysis(LIGHT_ID, duration, db))
+        sql_ms = timed(lambda: main.get_traffic_analysis(LIGHT_ID, duration, db=db))
+        print(f"{duration:>8} | {len(actual):>4} buckets | {'match' if match else 'MISMATCH'} | "
+              f"python {legacy_ms:8.2f} ms | rollups {sql_ms:7.2f} ms")
+    db.close()
+    if failed:
+        sys.exit(1)
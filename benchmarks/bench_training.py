@@ -0,0 +1,81 @@
+"""
+Feature engineering time and memory: notebook pipeline vs train.py.
+
+Builds a larger training CSV by repeating data/street_light_data_shuffled.csv
+(with lux jitter), then loads it and computes features both ways, each in
+a fresh subprocess so peak RSS is comparable:
+
+    notebook   pd.read_csv, pd.to_datetime(...).dt.time, per-row lambda
+    train.py   typed chunked read_csv, vectorized seconds_of_day
+
+Finally checks that both produce identical features.
+
+Run from the project root:
+    python -m benchmarks.bench_training [--copies 50]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from train import peak_rss_mb, read_features
+
+
+def make_csv(path, copies):
+    source = pd.read_csv("data/street_light_data_shuffled.csv")
+    rng = np.random.default_rng(0)
+    with open(path, "w") as f:
+        f.write("timestamp,ambience_lux,light_needed\n")
+        for _ in range(copies):
+            chunk = source.copy()
+            chunk["ambience_lux"] = (chunk["ambience_lux"] + rng.normal(0, 0.5, len(chunk))).clip(0).round(2)
+            chunk.to_csv(f, header=False, index=False)
+
+
+def notebook_features(path):
+    df = pd.read_csv(path)
+    df['timestamp'] = pd.to_datetime(df['timestamp'], format='%H:%M:%S').dt.time
+    df['seconds_of_day'] = df['timestamp'].apply(lambda t: t.hour * 3600 + t.minute * 60 + t.second)
+    y = df['light_needed'].map({'yes': 1, 'no': 0})
+    return df['ambience_lux'].to_numpy(), df['seconds_of_day'].to_numpy(), y.to_numpy()
+
+
+def measure(method, path):
+    start = time.perf_counter()
+    if method == "notebook":
+        lux, seconds, labels = notebook_features(path)
+    else:
+        lux, seconds, labels = read_features([path])
+    elapsed = time.perf_counter() - start
+    np.savez(path + f".{method}.npz", lux=lux, seconds=seconds, labels=labels)
+    print(f"{method:>9} | {len(lux)} rows | {elapsed:6.2f} s | peak RSS {peak_rss_mb():7.1f} MB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--copies", type=int, default=50, help="times to repeat the 86,400-row dataset")
+    parser.add_argument("--measure", choices=["notebook", "train.py"], help=argparse.SUPPRESS)
+    parser.add_argument("--path", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        measure(args.measure, args.path)
+        sys.exit()
+
+    path = os.path.join(tempfile.mkdtemp(), "train.csv")
+    make_csv(path, args.copies)
+    print(f"{os.path.getsize(path) / 1e6:.0f} MB CSV")
+    for method in ("notebook", "train.py"):
+        subprocess.run([sys.executable, "-m", "benchmarks.bench_training", "--measure", method, "--path", path],
+                       check=True)
+
+    expected, actual = np.load(path + ".notebook.npz"), np.load(path + ".train.py.npz")
+    same = all(np.array_equal(expected[key], actual[key]) for key in ("lux", "seconds", "labels"))
+    print(f"features {'match' if same else 'DIFFER'}")
+    if not same:
+        sys.exit(1)
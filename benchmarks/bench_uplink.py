@@ -0,0 +1,98 @@
+"""
+Frame latency of the automation loop while the backend is fast, slow or down.
+
+Starts a local stub backend, then simulates frames that each change the
+status of a few lights and queue telemetry through the Uplink. Because all
+HTTP happens on the uplink worker, per-frame latency should stay flat in all
+three modes, and with an outbox no log is lost while the backend is down.
+
+Run from the project root:
+    python -m benchmarks.bench_uplink
+"""
+import json
+import os
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from outbox import Outbox
+from uplink import Uplink
+
+FRAMES = 400
+LIGHTS = 8
+FRAME_INTERVAL = 0.005
+
+
+class StubBackend(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    mode = "fast"
+    received_logs = 0
+
+    def _reply(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length)
+        if self.mode == "slow":
+            time.sleep(0.5)
+        if self.mode == "down":
+            self.send_response(503)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if self.path.startswith("/api/logs"):
+            payload = json.loads(body)
+            StubBackend.received_logs += len(payload) if isinstance(payload, list) else 1
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"{}")
+
+    do_POST = _reply
+    do_PATCH = _reply
+
+    def log_message(self, format, *args):
+        pass
+
+
+def run(mode, server, outbox_path):
+    StubBackend.mode = mode
+    StubBackend.received_logs = 0
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+    uplink = Uplink(url, outbox=Outbox(outbox_path), flush_interval=0.05).start()
+
+    timings = []
+    for frame in range(FRAMES):
+        start = time.perf_counter()
+        status = "ON" if frame % 2 else "OFF"
+        for light_id in range(1, LIGHTS + 1):
+            uplink.update_status(light_id, status)
+            uplink.log(light_id, status, "2025-01-01T00:00:00")
+        timings.append(time.perf_counter() - start)
+        time.sleep(FRAME_INTERVAL)
+
+    if mode == "down":
+        # Backend comes back: everything kept in the outbox during the outage is sent
+        StubBackend.mode = "fast"
+        deadline = time.monotonic() + 60
+        while StubBackend.received_logs < FRAMES * LIGHTS and time.monotonic() < deadline:
+            uplink._wake.set()
+            time.sleep(0.1)
+    uplink.close(timeout=5)
+
+    timings.sort()
+    p50 = timings[len(timings) // 2] * 1e6
+    p99 = timings[int(len(timings) * 0.99)] * 1e6
+    print(f"{mode:>5} backend | frame p50 {p50:6.1f} us | p99 {p99:6.1f} us | max {timings[-1] * 1e6:8.1f} us | "
+          f"logs delivered {StubBackend.received_logs}/{FRAMES * LIGHTS} | "
+          f"status updates sent {uplink.sent_statuses} | dropped {uplink.outbox.dropped}")
+
+
+if __name__ == "__main__":
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubBackend)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in ("fast", "slow", "down"):
+            run(mode, server, os.path.join(tmp, f"{mode}.db"))
+    server.shutdown()
@@ -0,0 +1,84 @@
+"""
+Helpers shared by the benchmarks that run the backend.
+
+start_backend() runs it with uvicorn on a free port, scratch_database()
+points an in-process import of dashboard.backend at a scratch database.
+Both turn the analytics cache off (ANALYTICS_CACHE_SIZE=0, no
+ANALYTICS_CACHE_URL) unless the caller sets it, so the benchmarks time
+the queries and not cache hits.
+"""
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import requests
+
+NO_CACHE = {"ANALYTICS_CACHE_SIZE": "0"}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def scratch_path(name="bench.db"):
+    return os.path.join(tempfile.mkdtemp(), name)
+
+
+def _disable_cache(env):
+    env.pop("ANALYTICS_CACHE_URL", None)
+    env.update(NO_CACHE)
+
+
+def scratch_database():
+    """
+    Call before importing dashboard.backend. Returns the database path.
+    """
+    db_path = scratch_path()
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    _disable_cache(os.environ)
+    return db_path
+
+
+def start_backend(db_path=None, backend_dir=".", workers=1, wait=20, **env):
+    """
+    Starts the backend on db_path (default: a new scratch database), with
+    env added to the environment, and waits up to `wait` seconds for it to
+    answer. Returns the process and its base URL.
+    """
+    port = free_port()
+    environment = dict(os.environ, DATABASE_URL=f"sqlite:///{db_path or scratch_path()}")
+    _disable_cache(environment)
+    environment.update(env)
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "dashboard.backend.main:app", "--port", str(port), "--log-level", "warning",
+         "--workers", str(workers)],
+        env=environment, cwd=backend_dir,
+    )
+    url = f"http://127.0.0.1:{port}"
+    for _ in range(int(wait * 10)):
+        try:
+            requests.get(f"{url}/api/streetlights").raise_for_status()
+            return server, url
+        except requests.exceptions.ConnectionError:
+            time.sleep(0.1)
+    raise RuntimeError("backend did not start")
+
+
+def stop_backend(server):
+    # SIGINT/SIGTERM let uvicorn run the shutdown hooks
+    server.send_signal(signal.SIGTERM)
+    server.wait()
+
+
+def percentile(samples, fraction):
+    """
+    In milliseconds, from samples in seconds (NaN if there are none).
+    """
+    samples = sorted(samples)
+    return samples[min(int(len(samples) * fraction), len(samples) - 1)] * 1000 if samples else float("nan")
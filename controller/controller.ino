@@ -5,26 +5,67 @@
 // Initialize the BH1750 light sensor
 BH1750 lightMeter;
 
-// Define the pins for the PIR sensors and LEDs
-const int pirPin1 = 2;
-const int pirPin2 = 3;
-const int ledPin1 = 9; // Corresponds to PIR1
-const int ledPin2 = 10; // Corresponds to PIR2
-
-volatile int pir1Triggered = 0;
-volatile int pir2Triggered = 0;
+// Define the pins for the PIR sensors and LEDs.
+// Light i is driven by ledPins[i] and reports motion from pirPins[i].
+const int NUM_LIGHTS = 2;
+const int pirPins[NUM_LIGHTS] = {2, 3};
+const int ledPins[NUM_LIGHTS] = {9, 10};
+
+volatile int pirTriggered[NUM_LIGHTS] = {0};
 unsigned long lastLuxRead = 0;
-const unsigned long luxInterval = 50;
+// One sensor frame per interval. Commands are handled between frames, so
+// this can go down to the BH1750 low-res conversion time (~16 ms).
+const unsigned long luxInterval = 250;
 unsigned long lastMotionTime = 0;
 const unsigned long motionTimeout = 3000;
 
+// === Serial framing (see protocol.py) ===
+// 0xA5 | type | seq | length (LE) | payload | CRC-16/CCITT-FALSE (LE) over type..payload
+const uint8_t FRAME_START = 0xA5;
+const uint8_t FRAME_SENSOR = 0x01;
+const uint8_t FRAME_COMMAND = 0x02;
+const int PIR_BYTES = (NUM_LIGHTS + 7) / 8;
+const int SENSOR_PAYLOAD = 4 + PIR_BYTES;
+// Commands pack four 2-bit actions per byte
+const int COMMAND_PAYLOAD = (NUM_LIGHTS + 3) / 4;
+
+uint8_t txSeq = 0;
+
+enum RxState { RX_START, RX_HEADER, RX_PAYLOAD, RX_CRC };
+RxState rxState = RX_START;
+uint8_t rxHeader[4];
+uint8_t rxPayload[COMMAND_PAYLOAD];
+uint8_t rxCrc[2];
+uint16_t rxLength = 0;
+uint16_t rxCount = 0;
+
+uint16_t crc16(uint16_t crc, const uint8_t *data, uint16_t length) {
+  while (length--) {
+    crc ^= (uint16_t)(*data++) << 8;
+    for (uint8_t bit = 0; bit < 8; bit++) {
+      crc = (crc & 0x8000) ? (crc << 1) ^ 0x1021 : crc << 1;
+    }
+  }
+  return crc;
+}
+
+void sendFrame(uint8_t type, const uint8_t *payload, uint16_t length) {
+  uint8_t header[4] = {type, txSeq++, (uint8_t)(length & 0xFF), (uint8_t)(length >> 8)};
+  uint16_t crc = crc16(crc16(0xFFFF, header, 4), payload, length);
+  Serial.write(FRAME_START);
+  Serial.write(header, 4);
+  Serial.write(payload, length);
+  Serial.write((uint8_t)(crc & 0xFF));
+  Serial.write((uint8_t)(crc >> 8));
+}
+
 void pir1ISR() {
-  pir1Triggered = 1;
+  pirTriggered[0] = 1;
   lastMotionTime = millis();
 }
 
 void pir2ISR() {
-  pir2Triggered = 1;
+  pirTriggered[1] = 1;
   lastMotionTime = millis();
 }
 
@@ -35,74 +76,109 @@ void setup() {
   // Initialize sensors and outputs
   Wire.begin();
   lightMeter.begin(BH1750::CONTINUOUS_LOW_RES_MODE);
-  pinMode(pirPin1, INPUT);
-  pinMode(pirPin2, INPUT);
-  pinMode(ledPin1, OUTPUT);
-  pinMode(ledPin2, OUTPUT);
+  for (int i = 0; i < NUM_LIGHTS; i++) {
+    pinMode(pirPins[i], INPUT);
+    pinMode(ledPins[i], OUTPUT);
+  }
 
-  attachInterrupt(digitalPinToInterrupt(pirPin1), pir1ISR, RISING);
-  attachInterrupt(digitalPinToInterrupt(pirPin2), pir2ISR, RISING);
+  // The first two PIRs sit on the interrupt pins; any others are polled in loop()
+  attachInterrupt(digitalPinToInterrupt(pirPins[0]), pir1ISR, RISING);
+  attachInterrupt(digitalPinToInterrupt(pirPins[1]), pir2ISR, RISING);
 }
 
 void loop() {
+  for (int i = 2; i < NUM_LIGHTS; i++) {
+    if (digitalRead(pirPins[i]) == HIGH) {
+      pirTriggered[i] = 1;
+    }
+  }
+
   // === Read all sensor data ===
   if (millis() - lastLuxRead >= luxInterval) {
     float lux = lightMeter.readLightLevel();
-    int pirState1 = pir1Triggered;
-    int pirState2 = pir2Triggered;
 
     // === Send sensor data to Raspberry Pi ===
-    // Format: lux,pir1,pir2
-    Serial.print(lux);
-    Serial.print(",");
-    Serial.print(pirState1);
-    Serial.print(",");
-    Serial.println(pirState2);
-
-    // reset
-    pir1Triggered = 0;
-    pir2Triggered = 0;
+    // Payload: lux (float32) followed by one PIR bit per light
+    uint8_t payload[SENSOR_PAYLOAD] = {0};
+    memcpy(payload, &lux, 4);
+    for (int i = 0; i < NUM_LIGHTS; i++) {
+      if (pirTriggered[i]) {
+        payload[4 + i / 8] |= 1 << (i % 8);
+      }
+      // reset
+      pirTriggered[i] = 0;
+    }
+    sendFrame(FRAME_SENSOR, payload, SENSOR_PAYLOAD);
 
     lastLuxRead = millis();
   }
 
-  // === Listen for a command from the Raspberry Pi ===
-  if (Serial.available() > 0) {
-    String command = Serial.readStringUntil('\n');
-    command.trim();
-    int commaIndex = command.indexOf(',');
-    if (commaIndex != -1) {
-      char cmd1 = command.charAt(0);
-      char cmd2 = command.charAt(commaIndex + 1);
-      controlLights(cmd1, cmd2);
-    }
+  // === Listen for commands from the Raspberry Pi ===
+  while (Serial.available() > 0) {
+    readCommandByte(Serial.read());
   }
-
-  // Wait for half a second before sending the next reading
-  delay(250);
 }
 
-// Function to control the lights based on the received command
-void controlLights(char cmd1, char cmd2) {
-  // Control LED 1
-  if (cmd1 == '0') { // OFF
-    digitalWrite(ledPin1, LOW);
+// Feeds one received byte through the frame parser and applies complete,
+// valid command frames. Corrupt frames are dropped; parsing resumes at the
+// next start byte.
+void readCommandByte(uint8_t b) {
+  switch (rxState) {
+    case RX_START:
+      if (b == FRAME_START) {
+        rxState = RX_HEADER;
+        rxCount = 0;
+      }
+      break;
+    case RX_HEADER:
+      rxHeader[rxCount++] = b;
+      if (rxCount == 4) {
+        rxLength = rxHeader[2] | (rxHeader[3] << 8);
+        rxCount = 0;
+        if (rxHeader[0] != FRAME_COMMAND || rxLength > COMMAND_PAYLOAD) {
+          rxState = RX_START;
+        } else {
+          rxState = rxLength ? RX_PAYLOAD : RX_CRC;
+        }
+      }
+      break;
+    case RX_PAYLOAD:
+      rxPayload[rxCount++] = b;
+      if (rxCount == rxLength) {
+        rxCount = 0;
+        rxState = RX_CRC;
+      }
+      break;
+    case RX_CRC:
+      rxCrc[rxCount++] = b;
+      if (rxCount == 2) {
+        uint16_t crc = crc16(crc16(0xFFFF, rxHeader, 4), rxPayload, rxLength);
+        if (crc == (uint16_t)(rxCrc[0] | (rxCrc[1] << 8))) {
+          applyCommand(rxPayload, rxLength);
+        }
+        rxState = RX_START;
+      }
+      break;
   }
-  else if (cmd1 == '1') { // DIM
-    analogWrite(ledPin1, 10);
-  }
-  else if (cmd1 == '2') { // BRIGHT
-    digitalWrite(ledPin1, HIGH);
+}
+
+// Sets every light from one command frame
+void applyCommand(const uint8_t *payload, uint16_t length) {
+  for (int i = 0; i < NUM_LIGHTS && i / 4 < length; i++) {
+    uint8_t cmd = (payload[i / 4] >> ((i % 4) * 2)) & 0x03;
+    controlLight(ledPins[i], cmd);
   }
+}
 
-  // Control LED 2
-  if (cmd2 == '0') { // OFF
-    digitalWrite(ledPin2, LOW);
+// Function to control a light based on the received command
+void controlLight(int ledPin, uint8_t cmd) {
+  if (cmd == 0) { // OFF
+    digitalWrite(ledPin, LOW);
   }
-  else if (cmd2 == '1') { // DIM
-    analogWrite(ledPin2, 10);
+  else if (cmd == 1) { // DIM
+    analogWrite(ledPin, 10);
   }
-  else if (cmd2 == '2') { // BRIGHT
-    digitalWrite(ledPin2, HIGH);
+  else if (cmd == 2) { // BRIGHT
+    digitalWrite(ledPin, HIGH);
   }
 }
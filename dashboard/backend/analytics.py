@@ -0,0 +1,175 @@
+"""
+Fleet analytics for GET /api/analytics/fleet: a timeline summary, the
+traffic level and an energy estimate for every registered light (or the
+requested ones) over one window.
+
+A dashboard showing the whole fleet through the single-light endpoints
+makes two requests and a handful of queries per light. Here the lights are
+split into chunks of LIGHTS_PER_QUERY IDs, and each chunk takes four
+grouped queries whose IN lists the database resolves as index seeks on
+(streetlight_id, time):
+
+- per light, the first log in the window and the status of the interval
+  holding it (where /timeline starts),
+- the status intervals starting after that,
+- the logs of the bucket holding the cutoff, counted by status,
+- the rollups of the later buckets, summed.
+
+The numbers are the ones the single-light endpoints give: minutes per
+status over the /timeline intervals, and the /traffic counts summed over
+all buckets. Energy is the ON and DIM hours weighted by LIGHT_ON_WATTS
+and LIGHT_DIM_WATTS (defaults 100 and 40).
+
+Chunks run on FLEET_ANALYTICS_WORKERS threads (default 1), each with its
+own read session; the database does the work, so more workers help on
+Postgres or a multi-core SQLite host.
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import func, select
+
+from . import models, rollups, telemetry
+
+LIGHTS_PER_QUERY = 500
+WORKERS = int(os.environ.get("FLEET_ANALYTICS_WORKERS", "1"))
+ON_WATTS = float(os.environ.get("LIGHT_ON_WATTS", "100"))
+DIM_WATTS = float(os.environ.get("LIGHT_DIM_WATTS", "40"))
+STATUSES = ("ON", "DIM", "OFF")
+
+Interval = models.StatusInterval
+Log = models.Log
+Streetlight = models.Streetlight
+
+
+def traffic_level(stats: dict) -> str:
+    """
+    Describes {"ON", "DIM", "OFF", "total"} log counts (total > 0).
+    """
+    total = stats["total"]
+    if stats["OFF"] / total > 0.8:
+        return "Inactive (Day)"
+    if stats["ON"] / total > 0.6:
+        return "High Traffic"
+    if stats["DIM"] / total > 0.6:
+        return "Low Traffic"
+    return "Moderate"
+
+
+def _empty_counts():
+    return {"ON": 0, "DIM": 0, "OFF": 0, "total": 0}
+
+
+def _chunk(db, light_ids: list[int], cutoff: datetime, now: datetime, long_duration: bool) -> list[dict]:
+    if long_duration:
+        rollup, first_full_bucket = models.DailyRollup, rollups.day_floor(cutoff) + rollups.DAY
+    else:
+        rollup, first_full_bucket = models.HourlyRollup, rollups.hour_floor(cutoff) + rollups.HOUR
+
+    first_log = select(func.min(Log.timestamp))\
+        .where(Log.streetlight_id == Streetlight.id, Log.timestamp >= cutoff)\
+        .correlate(Streetlight)\
+        .scalar_subquery()
+    first_status = select(Interval.status)\
+        .where(Interval.streetlight_id == Streetlight.id, Interval.start_time <= first_log)\
+        .order_by(Interval.start_time.desc())\
+        .limit(1)\
+        .scalar_subquery()
+    starts = db.execute(select(Streetlight.id, first_log, first_status)
+                        .where(Streetlight.id.in_(light_ids))).all()
+
+    later = db.execute(select(Interval.streetlight_id, Interval.status, Interval.start_time)
+                       .where(Interval.streetlight_id.in_(light_ids), Interval.start_time >= cutoff)
+                       .order_by(Interval.streetlight_id, Interval.start_time)).all()
+
+    partial = db.execute(select(Log.streetlight_id, Log.status, func.count())
+                         .where(Log.streetlight_id.in_(light_ids),
+                                Log.timestamp >= cutoff,
+                                Log.timestamp < first_full_bucket,
+                                Log.status.in_(STATUSES))
+                         .group_by(Log.streetlight_id, Log.status)).all()
+    full = db.execute(select(rollup.streetlight_id, func.sum(rollup.on_count), func.sum(rollup.dim_count),
+                             func.sum(rollup.off_count), func.count())
+                      .where(rollup.streetlight_id.in_(light_ids), rollup.bucket_start >= first_full_bucket)
+                      .group_by(rollup.streetlight_id)).all()
+    telemetry.record_rows_read("fleet", len(starts) + len(later) + sum(count for *_, count in partial)
+                               + sum(buckets for *_, buckets in full))
+
+    counts = {}
+    for light_id, status, count in partial:
+        light = counts.setdefault(light_id, _empty_counts())
+        light[status] += count
+        light["total"] += count
+    for light_id, on_count, dim_count, off_count, _ in full:
+        light = counts.setdefault(light_id, _empty_counts())
+        light["ON"] += on_count
+        light["DIM"] += dim_count
+        light["OFF"] += off_count
+        light["total"] += on_count + dim_count + off_count
+
+    changes = {}
+    for light_id, status, start in later:
+        changes.setdefault(light_id, []).append((status, start))
+
+    result = []
+    for light_id, first_timestamp, status in sorted(starts):
+        minutes = dict.fromkeys(STATUSES, 0.0)
+        summary = {"light_id": light_id, "status": None, "status_since": None, "changes": 0, "minutes": minutes}
+        if first_timestamp is not None and status is not None:
+            # The interval holding the first log counts from that log, as in /timeline
+            segments = [(status, first_timestamp)]
+            segments += [change for change in changes.get(light_id, ()) if change[1] > first_timestamp]
+            ends = [start for _, start in segments[1:]] + [now]
+            for (segment_status, start), end in zip(segments, ends):
+                if segment_status in minutes:
+                    minutes[segment_status] += (end - start).total_seconds() / 60
+            summary.update(status=segments[-1][0], status_since=segments[-1][1].isoformat(),
+                           changes=len(segments) - 1)
+        summary["energy_wh"] = (minutes["ON"] * ON_WATTS + minutes["DIM"] * DIM_WATTS) / 60
+        traffic = counts.get(light_id, _empty_counts())
+        summary["traffic"] = {**traffic, "traffic_level": traffic_level(traffic) if traffic["total"] else None}
+        result.append(summary)
+    return result
+
+
+def fleet(session_factory, cutoff: datetime, now: datetime, long_duration: bool,
+          light_ids: Optional[list[int]] = None, workers: int = WORKERS) -> dict:
+    """
+    Per-light summaries of the window [cutoff, now] ordered by light ID,
+    and their totals, ready for json.dumps(). long_duration selects daily
+    traffic buckets, as /traffic does for 7d and 30d.
+    """
+    with session_factory() as db:
+        query = select(Streetlight.id).order_by(Streetlight.id)
+        if light_ids:
+            query = query.where(Streetlight.id.in_(light_ids))
+        ids = list(db.scalars(query))
+    chunks = [ids[i:i + LIGHTS_PER_QUERY] for i in range(0, len(ids), LIGHTS_PER_QUERY)]
+
+    def run(chunk):
+        with session_factory() as db:
+            return _chunk(db, chunk, cutoff, now, long_duration)
+
+    if workers > 1 and len(chunks) > 1:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(run, chunks))
+    else:
+        results = [run(chunk) for chunk in chunks]
+    lights = [light for chunk in results for light in chunk]
+
+    minutes = dict.fromkeys(STATUSES, 0.0)
+    traffic = _empty_counts()
+    for light in lights:
+        for status in STATUSES:
+            minutes[status] += light["minutes"][status]
+            traffic[status] += light["traffic"][status]
+        traffic["total"] += light["traffic"]["total"]
+    totals = {
+        "lights": len(lights),
+        "minutes": minutes,
+        "energy_wh": sum(light["energy_wh"] for light in lights),
+        "traffic": {**traffic, "traffic_level": traffic_level(traffic) if traffic["total"] else None},
+    }
+    return {"start_time": cutoff.isoformat(), "end_time": now.isoformat(), "lights": lights, "totals": totals}
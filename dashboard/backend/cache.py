@@ -0,0 +1,154 @@
+"""
+Response cache for the analytics endpoints.
+
+Dashboards reload the timeline and traffic of the same light every few
+seconds, and until a new log arrives for that light the answer only moves
+with the clock. Responses are cached per light and duration under the
+window start rounded down to RESOLUTION seconds (the bucket boundary), so
+a cached answer is reused for at most RESOLUTION seconds of window drift.
+
+Writes don't delete anything: every light has a generation number that is
+part of its keys, and invalidate() moves the light to the next generation
+once the new logs are committed. A request that read the old logs stores
+its answer under the old generation, where nothing looks it up again, and
+the LRU eventually evicts it.
+
+Configured from the environment:
+
+    ANALYTICS_CACHE_SIZE  responses kept in process (default 1024, 0 disables)
+    ANALYTICS_CACHE_URL   optional redis:// URL to share the cache (and the
+                          generations) between backend worker processes;
+                          needs the `redis` package
+"""
+import json
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+from fastapi.encoders import jsonable_encoder
+
+from .metrics import Counter, Gauge
+
+RESOLUTION = 60
+
+CACHE_REQUESTS = Counter("analytics_cache_requests_total", "Analytics cache lookups by result", ["endpoint", "result"])
+CACHE_ENTRIES = Gauge("analytics_cache_entries", "Responses held by the in-process analytics cache")
+CACHE_EVICTIONS = Counter("analytics_cache_evictions_total", "Responses evicted from the in-process analytics cache")
+
+
+class LRUBackend:
+    """
+    In-process store: at most max_entries responses, the least recently
+    used evicted first. Generations are kept apart, so evicting never
+    resets one.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._generations = {}
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, key: str):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def generation(self, light_id: int) -> int:
+        return self._generations.get(light_id, 0)
+
+    def bump(self, light_id: int):
+        with self._lock:
+            self._generations[light_id] = self._generations.get(light_id, 0) + 1
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class RedisBackend:
+    """
+    Shared store on Redis. Responses expire after ttl seconds (they are
+    only looked up within one bucket anyway); generations never expire.
+    """
+
+    def __init__(self, url: str, ttl: int = 2 * RESOLUTION):
+        import redis
+        self._redis = redis.Redis.from_url(url)
+        self.ttl = ttl
+
+    def get(self, key: str):
+        value = self._redis.get(key)
+        return json.loads(value) if value is not None else None
+
+    def set(self, key: str, value):
+        self._redis.set(key, json.dumps(jsonable_encoder(value)), ex=self.ttl)
+
+    def generation(self, light_id: int) -> int:
+        return int(self._redis.get(f"analytics:generation:{light_id}") or 0)
+
+    def bump(self, light_id: int):
+        self._redis.incr(f"analytics:generation:{light_id}")
+
+
+class AnalyticsCache:
+    """
+    Front for a backend with get(key), set(key, value), generation(light_id)
+    and bump(light_id); None disables caching.
+    """
+
+    def __init__(self, backend=None):
+        self.backend = backend
+        if isinstance(backend, LRUBackend):
+            CACHE_ENTRIES.set_function(lambda: len(backend))
+            CACHE_EVICTIONS.set_function(lambda: backend.evictions)
+
+    @classmethod
+    def from_env(cls):
+        url = os.environ.get("ANALYTICS_CACHE_URL")
+        if url:
+            return cls(RedisBackend(url))
+        size = int(os.environ.get("ANALYTICS_CACHE_SIZE", "1024"))
+        return cls(LRUBackend(size) if size > 0 else None)
+
+    def get_or_compute(self, endpoint: str, light_id: int, duration: str, cutoff: datetime, compute):
+        """
+        The cached response for this window, or compute() stored in its place.
+        """
+        if self.backend is None:
+            return compute()
+        # Read the generation before computing, so a write committed
+        # meanwhile leaves this response under the old one
+        bucket = int(cutoff.timestamp()) // RESOLUTION
+        key = f"analytics:{endpoint}:{light_id}:{duration}:{bucket}:{self.backend.generation(light_id)}"
+        value = self.backend.get(key)
+        if value is not None:
+            CACHE_REQUESTS.labels(endpoint, "hit").inc()
+            return value
+        CACHE_REQUESTS.labels(endpoint, "miss").inc()
+        value = compute()
+        self.backend.set(key, value)
+        return value
+
+    def invalidate(self, light_ids):
+        """
+        Call after committing new logs for these lights.
+        """
+        if self.backend is None:
+            return
+        for light_id in light_ids:
+            self.backend.bump(light_id)
+
+
+analytics_cache = AnalyticsCache.from_env()
@@ -0,0 +1,66 @@
+"""
+Skips logs that a controller uploads more than once.
+
+A controller with a local outbox tags every log with the outbox's ID
+(source) and a sequence number that only increases, and uploads them in
+order. If a response is lost it sends the same batch again. Keeping the
+highest sequence number stored per source is enough to recognise those
+repeats, with one row per controller instead of one key per log.
+"""
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from . import models
+
+
+class Conflict(Exception):
+    """
+    Another request from the same source was stored first. The caller must
+    roll back; resending the batch skips whatever that request stored.
+    """
+
+
+def new_logs(db: Session, logs: list, marks: dict) -> list:
+    """
+    Returns the logs not stored before. `marks` maps each source seen in
+    this request to [stored, highest] sequence numbers and is updated.
+    Logs without a dedup key are always new.
+    """
+    fresh = []
+    for log in logs:
+        if log.source is None or log.seq is None:
+            fresh.append(log)
+            continue
+        mark = marks.get(log.source)
+        if mark is None:
+            row = db.get(models.UplinkSource, log.source)
+            stored = row.last_seq if row is not None else None
+            mark = marks[log.source] = [stored, stored]
+        if mark[1] is not None and log.seq <= mark[1]:
+            continue
+        mark[1] = log.seq
+        fresh.append(log)
+    return fresh
+
+
+def save_marks(db: Session, marks: dict):
+    """
+    Records the new highest sequence numbers in the request's transaction.
+    Raises Conflict if a concurrent request moved a mark in the meantime.
+    """
+    UplinkSource = models.UplinkSource
+    for source, (stored, highest) in marks.items():
+        if highest == stored:
+            continue
+        if stored is None:
+            db.add(UplinkSource(source=source, last_seq=highest))
+            try:
+                db.flush()
+            except IntegrityError:
+                raise Conflict(source)
+        else:
+            updated = db.query(UplinkSource)\
+                        .filter(UplinkSource.source == source, UplinkSource.last_seq == stored)\
+                        .update({UplinkSource.last_seq: highest}, synchronize_session=False)
+            if not updated:
+                raise Conflict(source)
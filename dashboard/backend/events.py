@@ -0,0 +1,86 @@
+"""
+In-process pub/sub for pushing streetlight updates to dashboard clients.
+
+Endpoints publish events (from any thread); every subscriber has a small
+bounded queue on the event loop. A subscriber that falls behind loses its
+oldest events instead of slowing down publishers or other subscribers, and
+is told how many it missed.
+"""
+import asyncio
+import json
+
+from fastapi.encoders import jsonable_encoder
+
+
+class Subscriber:
+    def __init__(self, light_ids, events, queue_size):
+        self.light_ids = light_ids
+        self.events = events
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.dropped = 0
+
+
+class EventBroker:
+    def __init__(self, queue_size: int = 100):
+        self.queue_size = queue_size
+        self.subscribers = set()
+        self.loop = None
+
+    def subscribe(self, light_ids=None, events=None) -> Subscriber:
+        """
+        Must be called from the event loop. light_ids=None receives every
+        light, events=None every type of event.
+        """
+        self.loop = asyncio.get_running_loop()
+        subscriber = Subscriber(set(light_ids) if light_ids else None, set(events) if events else None,
+                                self.queue_size)
+        self.subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        self.subscribers.discard(subscriber)
+
+    def publish(self, event: str, light_id: int, data):
+        """
+        Thread-safe. Serializes the event once and hands it to the loop.
+        """
+        if not self.subscribers or self.loop is None:
+            return
+        message = f"event: {event}\ndata: {json.dumps(jsonable_encoder(data))}\n\n"
+        try:
+            self.loop.call_soon_threadsafe(self._dispatch, event, light_id, message)
+        except RuntimeError:
+            # Event loop already closed (shutdown)
+            pass
+
+    def _dispatch(self, event: str, light_id: int, message: str):
+        for subscriber in self.subscribers:
+            if subscriber.light_ids is not None and light_id not in subscriber.light_ids:
+                continue
+            if subscriber.events is not None and event not in subscriber.events:
+                continue
+            if subscriber.queue.full():
+                subscriber.queue.get_nowait()
+                subscriber.dropped += 1
+            subscriber.queue.put_nowait(message)
+
+    async def stream(self, subscriber: Subscriber, keepalive: float = 15.0):
+        """
+        Server-Sent Events body for one subscriber.
+        """
+        try:
+            while True:
+                try:
+                    message = await asyncio.wait_for(subscriber.queue.get(), timeout=keepalive)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                if subscriber.dropped:
+                    yield f"event: dropped\ndata: {subscriber.dropped}\n\n"
+                    subscriber.dropped = 0
+                yield message
+        finally:
+            self.unsubscribe(subscriber)
+
+
+broker = EventBroker()
@@ -0,0 +1,180 @@
+"""
+Streaming log export for GET /api/export/logs.
+
+Rows come from a server-side cursor (SQLite steps through the index as
+they are fetched, Postgres uses a named cursor) CHUNK_ROWS at a time, and
+each chunk is encoded and handed to the response before the next one is
+fetched, so memory use doesn't depend on how many rows are exported.
+
+Formats: NDJSON, CSV and, when pyarrow is installed, Parquet (one row
+group per chunk). The export reads in one transaction, which on SQLite
+holds back WAL checkpoints until it finishes. Months that retention.py has
+archived are read from their files and merged in by light, so an export
+covers them the same way.
+"""
+import csv
+import heapq
+import importlib.util
+import io
+import json
+from datetime import datetime
+from itertools import chain, islice
+from operator import itemgetter
+from typing import Optional
+
+from sqlalchemy import String, select, type_coerce
+
+from . import models, telemetry
+
+CHUNK_ROWS = 10000
+COLUMNS = ("id", "streetlight_id", "status", "timestamp")
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+def parquet_available() -> bool:
+    return importlib.util.find_spec("pyarrow") is not None
+
+
+def _query(light_ids: Optional[list[int]], since: Optional[datetime], until: Optional[datetime]):
+    Log = models.Log
+    # SQLite keeps timestamps as ISO text; passing it through skips
+    # parsing every row into a datetime (Postgres still returns datetimes)
+    query = select(Log.id, Log.streetlight_id, Log.status, type_coerce(Log.timestamp, String))
+    if light_ids:
+        query = query.where(Log.streetlight_id.in_(light_ids))
+    if since:
+        query = query.where(Log.timestamp >= since)
+    if until:
+        query = query.where(Log.timestamp < until)
+    # Index order, so the database never sorts
+    return query.order_by(Log.streetlight_id, Log.timestamp, Log.id)
+
+
+def _chunks(engine, query):
+    rows_read = 0
+    try:
+        with engine.connect() as conn:
+            result = conn.execution_options(yield_per=CHUNK_ROWS).execute(query)
+            for rows in result.partitions():
+                rows_read += len(rows)
+                yield rows
+    finally:
+        telemetry.record_rows_read("export", rows_read)
+
+
+def rows(engine, light_ids=None, since=None, until=None):
+    """
+    Logs as chunks of (id, streetlight_id, status, timestamp) rows in
+    export order, read from the database.
+    """
+    return _chunks(engine, _query(light_ids, since, until))
+
+
+def _merged(engine, archive, archived_until, light_ids, since, until):
+    months = [archive.rows(month, light_ids, since, until) for month in archive.months(since, until)]
+    recent = chain.from_iterable(rows(engine, light_ids, max(since or archived_until, archived_until), until))
+    # Each input is ordered by light and time, and within a light the
+    # months come before the database rows; merge() keeps that order
+    merged = heapq.merge(*months, recent, key=itemgetter(1))
+    while chunk := list(islice(merged, CHUNK_ROWS)):
+        yield chunk
+
+
+def _timestamp(value) -> str:
+    if isinstance(value, str):
+        return value.replace(" ", "T", 1)
+    return value.isoformat()
+
+
+def _ndjson(chunks):
+    for rows in chunks:
+        yield "".join(
+            f'{{"id":{log_id},"streetlight_id":{light_id},"status":{json.dumps(status)},'
+            f'"timestamp":"{_timestamp(timestamp)}"}}\n'
+            for log_id, light_id, status, timestamp in rows
+        ).encode()
+
+
+def _csv(chunks):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(COLUMNS)
+    for rows in chunks:
+        writer.writerows((log_id, light_id, status, _timestamp(timestamp))
+                         for log_id, light_id, status, timestamp in rows)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        # Header only
+        yield buffer.getvalue().encode()
+
+
+class _Sink:
+    """
+    Write-only file for ParquetWriter that hands out what was written.
+    """
+
+    def __init__(self):
+        self._parts = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data, self._parts = b"".join(self._parts), []
+        return data
+
+
+def _parquet(chunks):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    timestamp_type = pa.timestamp("us")
+    schema = pa.schema([("id", pa.int64()), ("streetlight_id", pa.int64()),
+                        ("status", pa.string()), ("timestamp", timestamp_type)])
+    sink = _Sink()
+    with pq.ParquetWriter(sink, schema, compression="zstd") as writer:
+        for rows in chunks:
+            log_ids, light_ids, statuses, timestamps = zip(*rows)
+            if isinstance(timestamps[0], str):
+                timestamps = pa.array(timestamps, pa.string()).cast(timestamp_type)
+            else:
+                timestamps = pa.array(timestamps, timestamp_type)
+            writer.write_table(pa.table([pa.array(log_ids, pa.int64()), pa.array(light_ids, pa.int64()),
+                                         pa.array(statuses, pa.string()), timestamps], schema=schema))
+            yield sink.drain()
+    yield sink.drain()
+
+
+ENCODERS = {"ndjson": _ndjson, "csv": _csv, "parquet": _parquet}
+
+
+def stream(engine, fmt: str, light_ids=None, since=None, until=None, archive=None):
+    """
+    The export as an iterator of byte chunks, for a StreamingResponse.
+    `archive` is a retention.Archive whose months are included.
+    """
+    archived_until = archive.until() if archive is not None else None
+    if archived_until is not None and (since is None or since < archived_until):
+        chunks = _merged(engine, archive, archived_until, light_ids, since, until)
+    else:
+        chunks = rows(engine, light_ids, since, until)
+    return ENCODERS[fmt](chunks)
@@ -0,0 +1,201 @@
+"""
+Run-length encoded status history (the status_intervals table).
+
+Consecutive logs with the same status collapse into one interval, so a
+light that reports the same status all night is a single row. New logs
+extend the open interval, or close it and open a new one when the status
+changes. Logs that arrive out of order re-encode the affected stretch from
+the raw logs.
+
+To build the intervals for existing logs:
+
+    python -m dashboard.backend.intervals
+"""
+from datetime import datetime
+
+from sqlalchemy import delete, func
+from sqlalchemy.orm import Session
+
+from . import models
+
+Interval = models.StatusInterval
+Log = models.Log
+
+
+def _interval_at(db: Session, light_id: int, ts: datetime):
+    """
+    The interval containing ts (the last one starting at or before it).
+    """
+    return db.query(Interval)\
+             .filter(Interval.streetlight_id == light_id, Interval.start_time <= ts)\
+             .order_by(Interval.start_time.desc())\
+             .first()
+
+
+def _runs(logs):
+    """
+    Collapses (timestamp, status) rows into [status, start, end] runs.
+    """
+    runs = []
+    for timestamp, status in logs:
+        if runs and runs[-1][0] == status:
+            continue
+        if runs:
+            runs[-1][2] = timestamp
+        runs.append([status, timestamp, None])
+    return runs
+
+
+def append_log(db: Session, light_id: int, status: str, timestamp: datetime) -> bool:
+    """
+    Fast path for the common case of a log newer than every other log of
+    its light. Returns False when the log is out of order.
+    """
+    newer = db.query(Log.id)\
+              .filter(Log.streetlight_id == light_id, Log.timestamp > timestamp)\
+              .first()
+    if newer is not None:
+        return False
+
+    current = _interval_at(db, light_id, timestamp)
+    if current is not None and current.end_time is not None:
+        return False
+    if current is not None and current.status == status:
+        return True
+
+    if current is not None:
+        current.end_time = timestamp
+    db.add(Interval(streetlight_id=light_id, status=status, start_time=timestamp))
+    return True
+
+
+def reencode_range(db: Session, light_id: int, first: datetime, last: datetime):
+    """
+    Rebuilds every interval of a light that overlaps [first, last] from the
+    raw logs.
+    """
+    containing = _interval_at(db, light_id, first)
+    range_start = containing.start_time if containing else first
+    following = db.query(Interval)\
+                  .filter(Interval.streetlight_id == light_id, Interval.start_time > last)\
+                  .order_by(Interval.start_time)\
+                  .first()
+    range_end = following.start_time if following else None
+
+    stale = delete(Interval).where(Interval.streetlight_id == light_id, Interval.start_time >= range_start)
+    logs = db.query(Log.timestamp, Log.status)\
+             .filter(Log.streetlight_id == light_id, Log.timestamp >= range_start)
+    if range_end is not None:
+        stale = stale.where(Interval.start_time < range_end)
+        logs = logs.filter(Log.timestamp < range_end)
+    db.execute(stale)
+
+    # The containing interval's start stands in for its first log, which
+    # may have been archived (see retention.py)
+    start = [(containing.start_time, containing.status)] if containing else []
+    runs = _runs(start + logs.order_by(Log.timestamp, Log.id).all())
+    if runs:
+        runs[-1][2] = range_end
+        if following is not None and runs[-1][0] == following.status:
+            following.start_time = runs.pop()[1]
+    db.bulk_insert_mappings(Interval, [
+        {"streetlight_id": light_id, "status": status, "start_time": start, "end_time": end}
+        for status, start, end in runs
+    ])
+
+
+def update_for_new_logs(db: Session, ranges: dict):
+    """
+    Brings the intervals up to date after logs covering `ranges`
+    ({light_id: (first, last)}, see rollups.extend_ranges) were added to
+    the session's transaction.
+    """
+    db.flush()
+    for light_id, (first, last) in ranges.items():
+        reencode_range(db, light_id, first, last)
+
+
+def timeline(db: Session, light_id: int, cutoff: datetime):
+    """
+    Status intervals from the first log at or after cutoff until now, in
+    the format of /api/analytics/{light_id}/timeline.
+    """
+    first_log = db.query(Log.timestamp)\
+                  .filter(Log.streetlight_id == light_id, Log.timestamp >= cutoff)\
+                  .order_by(Log.timestamp, Log.id)\
+                  .first()
+    if first_log is None:
+        return []
+
+    # The interval holding the first log in the window starts at that log
+    containing = db.query(Interval.status, Interval.end_time)\
+                   .filter(Interval.streetlight_id == light_id, Interval.start_time <= first_log.timestamp)\
+                   .order_by(Interval.start_time.desc())\
+                   .first()
+    rows = [(containing.status, first_log.timestamp, containing.end_time)]
+    rows += db.query(Interval.status, Interval.start_time, Interval.end_time)\
+              .filter(Interval.streetlight_id == light_id, Interval.start_time > first_log.timestamp)\
+              .order_by(Interval.start_time)\
+              .all()
+
+    result = []
+    for status, start, end in rows[:-1]:
+        result.append({
+            "status": status,
+            "start_time": start,
+            "end_time": end,
+            "duration_minutes": (end - start).total_seconds() / 60
+        })
+
+    # Close the last interval
+    status, start, _ = rows[-1]
+    result.append({
+        "status": status,
+        "start_time": start,
+        "end_time": datetime.now(), # Cap at 'now'
+        "duration_minutes": (datetime.now() - start).total_seconds() / 60
+    })
+    return result
+
+
+def compact(db: Session):
+    """
+    Drops all intervals and re-encodes them from the logs table.
+    """
+    db.execute(delete(Interval))
+    light_ids = [light_id for (light_id,) in db.query(Log.streetlight_id).distinct()]
+    for light_id in light_ids:
+        logs = db.query(Log.timestamp, Log.status)\
+                 .filter(Log.streetlight_id == light_id)\
+                 .order_by(Log.timestamp, Log.id)\
+                 .yield_per(10000)
+        db.bulk_insert_mappings(Interval, [
+            {"streetlight_id": light_id, "status": status, "start_time": start, "end_time": end}
+            for status, start, end in _runs(logs)
+        ])
+    db.commit()
+
+
+def backfill_if_empty(db: Session):
+    """
+    Builds the intervals once for databases created before they existed.
+    """
+    has_logs = db.query(Log.id).first() is not None
+    has_intervals = db.query(Interval.id).first() is not None
+    if has_logs and not has_intervals:
+        print("Building status intervals for existing logs...")
+        compact(db)
+
+
+if __name__ == "__main__":
+    from .database import Base, SessionLocal, engine
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        compact(db)
+        logs = db.query(func.count(Log.id)).scalar()
+        intervals = db.query(func.count(Interval.id)).scalar()
+        print(f"Encoded {logs} logs as {intervals} status intervals.")
+    finally:
+        db.close()
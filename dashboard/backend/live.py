@@ -0,0 +1,145 @@
+"""
+Current status of every streetlight, held in memory.
+
+The table is loaded from the streetlights table at startup and is the
+source of truth while the backend runs: reads never touch the database,
+and updates only change memory and mark the light dirty. A background
+thread writes the dirty lights back in one transaction every
+LIVE_STATUS_FLUSH_INTERVAL seconds (default 1) and once more on shutdown,
+so a crash loses at most that much status history; the controllers send
+a light's status again when it next changes. A failed write-back is
+retried at the next flush and counted in live_status_flush_failures_total
+on /metrics.
+
+Only one backend process may own the table, so run a single uvicorn
+worker (or route all streetlight traffic to one).
+"""
+import json
+import os
+import threading
+
+from sqlalchemy import bindparam, update
+
+from . import models
+from .metrics import Counter
+
+FLUSH_INTERVAL = float(os.environ.get("LIVE_STATUS_FLUSH_INTERVAL", "1"))
+
+FLUSH_FAILURES = Counter("live_status_flush_failures_total",
+                         "Failed write-backs of streetlight statuses (retried at the next flush)")
+
+
+def _encode(light_id: int, status: str) -> bytes:
+    return json.dumps({"id": light_id, "status": status}, separators=(",", ":")).encode()
+
+
+class LiveStatus:
+    def __init__(self, session_factory, flush_interval: float = FLUSH_INTERVAL):
+        self.session_factory = session_factory
+        self.flush_interval = flush_interval
+        self._statuses = {}
+        # Each light's JSON object, in ID order, so a changed fleet is
+        # re-encoded by joining them rather than serializing every light
+        self._encoded = {}
+        self._dirty = {}
+        self._lock = threading.Lock()
+        # GET /api/streetlights body, rebuilt only after a change
+        self._body = None
+        self._stop = threading.Event()
+        self._worker = None
+
+    def load(self):
+        with self.session_factory() as db:
+            rows = db.query(models.Streetlight.id, models.Streetlight.status).order_by(models.Streetlight.id).all()
+        with self._lock:
+            self._statuses = dict(rows)
+            self._encoded = {light_id: _encode(light_id, status) for light_id, status in rows}
+            self._body = None
+
+    def __contains__(self, light_id: int) -> bool:
+        return light_id in self._statuses
+
+    def __len__(self):
+        return len(self._statuses)
+
+    def body(self) -> bytes:
+        """
+        Every light as a JSON array of {"id", "status"}, ordered by ID.
+        """
+        body = self._body
+        if body is None:
+            with self._lock:
+                body = self._body = b"[" + b",".join(self._encoded.values()) + b"]"
+        return body
+
+    def add(self, light_id: int, status: str):
+        """
+        For a light the caller has just inserted into the database.
+        """
+        with self._lock:
+            last = next(reversed(self._encoded), None)
+            self._statuses[light_id] = status
+            self._encoded[light_id] = _encode(light_id, status)
+            if last is not None and light_id < last:
+                # Keep the table in ID order, as the database query gave it
+                self._encoded = dict(sorted(self._encoded.items()))
+            self._body = None
+
+    def update(self, changes) -> tuple[list, list]:
+        """
+        Applies (light_id, status) pairs together. Returns the pairs that
+        changed a status and the IDs of unknown lights.
+        """
+        changed, unknown = [], []
+        with self._lock:
+            for light_id, status in changes:
+                current = self._statuses.get(light_id)
+                if current is None:
+                    unknown.append(light_id)
+                elif current != status:
+                    self._statuses[light_id] = status
+                    self._encoded[light_id] = _encode(light_id, status)
+                    self._dirty[light_id] = status
+                    changed.append((light_id, status))
+            if changed:
+                self._body = None
+        return changed, unknown
+
+    def flush(self):
+        """
+        Writes the dirty lights to the database in one transaction.
+        """
+        with self._lock:
+            dirty, self._dirty = self._dirty, {}
+        if not dirty:
+            return
+        table = models.Streetlight.__table__
+        statement = update(table).where(table.c.id == bindparam("light_id")).values(status=bindparam("new_status"))
+        try:
+            with self.session_factory() as db:
+                db.execute(statement, [{"light_id": light_id, "new_status": status}
+                                       for light_id, status in dirty.items()])
+                db.commit()
+        except Exception as e:
+            FLUSH_FAILURES.inc()
+            print(f"Error saving {len(dirty)} streetlight statuses: {e}")
+            with self._lock:
+                # Keep anything that changed again meanwhile
+                for light_id, status in dirty.items():
+                    self._dirty.setdefault(light_id, status)
+
+    def start(self):
+        self._stop.clear()
+        self._worker = threading.Thread(target=self._run, name="live-status", daemon=True)
+        self._worker.start()
+
+    def close(self):
+        self._stop.set()
+        if self._worker is not None:
+            self._worker.join()
+            self._worker = None
+        self.flush()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
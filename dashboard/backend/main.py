@@ -1,9 +1,22 @@
-from fastapi import FastAPI, Depends, HTTPException
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from pydantic import TypeAdapter, ValidationError
+from sqlalchemy import func, insert, tuple_
 from sqlalchemy.orm import Session
-from . import models, schemas
-from .database import SessionLocal, engine
+from . import analytics, dedup, export, intervals, models, retention, rollups, schemas, telemetry
+from .cache import analytics_cache
+from .events import broker
+from .live import LiveStatus
+from .database import (SessionLocal, ReadSessionLocal, engine, read_engine, create_missing_indexes, get_db,
+                       get_read_db, strftime)
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
+from contextlib import asynccontextmanager
 from datetime import datetime, timedelta
+from typing import Optional
+import base64
+import hashlib
+import json
 import os
 
 try:
@@ -16,9 +29,29 @@ except Exception:
 FRONTEND_URL = os.environ.get("FRONTEND_URL", "http://localhost:5173")
 BACKEND_URL = os.environ.get("BACKEND_URL", "http://localhost:8000")
 
+telemetry.instrument_engine(engine)
+if read_engine is not engine:
+    telemetry.instrument_engine(read_engine)
 models.Base.metadata.create_all(bind=engine)
-
-app = FastAPI()
+create_missing_indexes()
+with SessionLocal() as db:
+    rollups.backfill_if_empty(db)
+    intervals.backfill_if_empty(db)
+live_status = LiveStatus(SessionLocal)
+live_status.load()
+retention_job = retention.RetentionJob(SessionLocal, read_engine)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    live_status.start()
+    if retention_job.days:
+        retention_job.start()
+    yield
+    retention_job.close()
+    live_status.close()
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(telemetry.MetricsMiddleware)
 
 origins = [FRONTEND_URL]
 
@@ -28,19 +61,20 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+# --- METRICS ---
+
+@app.get("/metrics", include_in_schema=False)
+def get_metrics():
+    body, content_type = telemetry.render()
+    return Response(content=body, media_type=content_type)
 
 # --- AUTH & REQUESTS ---
 
 @app.post("/api/login")
-def login(user_login: schemas.UserLogin, db: Session = Depends(get_db)):
+def login(user_login: schemas.UserLogin, db: Session = Depends(get_read_db)):
     user = db.query(models.User).filter(models.User.username == user_login.username).first()
     if not user or user.password != user_login.password:
         raise HTTPException(status_code=401, detail="Invalid credentials")
@@ -71,48 +105,73 @@ def update_request(request_id: int, request_update: schemas.RequestUpdate, db: S
         db_issue.override_start_time = request_update.override_start_time
     if request_update.override_end_time:
         db_issue.override_end_time = request_update.override_end_time
-    
-    print(f"{db_issue.light_id}, {db_issue.override_start_time}, {db_issue.override_end_time}")
-    
+
     db.commit()
     db.refresh(db_issue)
+    # Controllers re-fetch their override schedule when they see this
+    broker.publish("overrides", db_issue.light_id, {"id": db_issue.id, "light_id": db_issue.light_id})
     return db_issue
 
 @app.get("/api/admin/requests")
-def get_admin_requests(db: Session = Depends(get_db)):
+def get_admin_requests(db: Session = Depends(get_read_db)):
     return db.query(models.Issue).all()
 
 # --- STREETLIGHTS ---
 
 @app.get("/api/streetlights", response_model=list[schemas.Streetlight])
-def get_streetlights(db: Session = Depends(get_db)):
-    return db.query(models.Streetlight).all()
+def get_streetlights():
+    # Served from the live status table, see live.py
+    return Response(content=live_status.body(), media_type="application/json")
 
 @app.post("/api/streetlights", response_model=schemas.Streetlight)
 def create_streetlight(streetlight: schemas.StreetlightCreate, db: Session = Depends(get_db)):
-    existing_light = db.query(models.Streetlight).filter(models.Streetlight.id == streetlight.id).first()
-    if existing_light:
+    if streetlight.id in live_status:
         raise HTTPException(status_code=400, detail="Streetlight ID already registered")
     db_streetlight = models.Streetlight(id=streetlight.id, status=streetlight.status)
     db.add(db_streetlight)
     db.commit()
     db.refresh(db_streetlight)
+    live_status.add(db_streetlight.id, db_streetlight.status)
+    broker.publish("status", db_streetlight.id, schemas.Streetlight.model_validate(db_streetlight))
     return db_streetlight
 
+@app.patch("/api/streetlights")
+def update_streetlight_statuses(updates: list[schemas.Streetlight]):
+    """
+    Sets the status of many lights at once (a JSON array of {"id", "status"}).
+    Applied together to the live status table, which writes them to the
+    database in one transaction shortly after.
+    """
+    changed, unknown = live_status.update((update.id, update.status) for update in updates)
+    for light_id, status in changed:
+        broker.publish("status", light_id, {"id": light_id, "status": status})
+    return {"updated": len(changed), "unchanged": len(updates) - len(changed) - len(unknown), "unknown": unknown}
+
 @app.patch("/api/streetlights/{streetlight_id}", response_model=schemas.Streetlight)
-def update_streetlight_status(
-    streetlight_id: int,
-    streetlight_update: schemas.StreetlightStatusUpdate,
-    db: Session = Depends(get_db)
-):
-    db_streetlight = db.query(models.Streetlight).filter(models.Streetlight.id == streetlight_id).first()
-    if db_streetlight is None:
+def update_streetlight_status(streetlight_id: int, streetlight_update: schemas.StreetlightStatusUpdate):
+    changed, unknown = live_status.update([(streetlight_id, streetlight_update.status)])
+    if unknown:
         raise HTTPException(status_code=404, detail="Streetlight not found")
+    light = {"id": streetlight_id, "status": streetlight_update.status}
+    if changed:
+        broker.publish("status", streetlight_id, light)
+    return light
 
-    db_streetlight.status = streetlight_update.status
-    db.commit()
-    db.refresh(db_streetlight)
-    return db_streetlight
+@app.get("/api/events")
+async def stream_events(light_id: Optional[list[int]] = Query(None), event: Optional[list[str]] = Query(None)):
+    """
+    Server-Sent Events stream of status changes ("status"), new logs
+    ("log", or "logs" for bulk inserts) and override approvals
+    ("overrides"). Repeat ?light_id= to only receive some lights, and
+    ?event= to only receive some types. A "dropped" event reports events
+    skipped because the client was reading too slowly.
+    """
+    subscriber = broker.subscribe(light_id, event)
+    return StreamingResponse(
+        broker.stream(subscriber),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 # --- USERS & LOGS ---
 
@@ -129,27 +188,157 @@ def create_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
 
 @app.post("/api/logs", response_model=schemas.Log)
 def create_log_entry(log: schemas.LogCreate, db: Session = Depends(get_db)):
+    if retention.expired(log.timestamp, retention.cutoff()):
+        raise HTTPException(status_code=422, detail="Log is older than the retention window")
     db_log = models.Log(
         streetlight_id=log.streetlight_id,
         status=log.status,
         timestamp=log.timestamp
     )
     db.add(db_log)
+    ranges = rollups.extend_ranges({}, [db_log])
+    rollups.update_for_new_logs(db, ranges)
+    if not intervals.append_log(db, log.streetlight_id, log.status, log.timestamp):
+        intervals.update_for_new_logs(db, ranges)
     db.commit()
+    analytics_cache.invalidate([log.streetlight_id])
     db.refresh(db_log)
+    broker.publish("log", db_log.streetlight_id, schemas.Log.model_validate(db_log))
     return db_log
 
+BULK_INSERT_CHUNK = 5000
+log_list_adapter = TypeAdapter(list[schemas.LogUpload])
+
+def insert_logs(db: Session, logs: list[schemas.LogUpload], marks: dict) -> tuple[list[schemas.LogUpload], int]:
+    """
+    Inserts the logs not uploaded before and returns them, with the number
+    skipped for being older than the retention window.
+    """
+    logs = dedup.new_logs(db, logs, marks)
+    oldest = retention.cutoff()
+    kept = [log for log in logs if not retention.expired(log.timestamp, oldest)]
+    if kept:
+        db.execute(insert(models.Log), [log.model_dump(exclude={"source", "seq"}) for log in kept])
+    return kept, len(logs) - len(kept)
+
+@app.post("/api/logs/bulk")
+async def create_log_entries(request: Request, db: Session = Depends(get_db)):
+    """
+    Inserts many logs in one transaction.
+    Accepts a JSON array of LogUpload, or NDJSON (one LogUpload per line,
+    Content-Type: application/x-ndjson) which is parsed while it streams in.
+    Nothing is written until the whole body has arrived, so a slow client
+    never holds the write transaction open.
+    Logs with a source and seq that were already stored are skipped and
+    counted as duplicates (see dedup.py). Logs older than the retention
+    window are skipped and counted as expired (see retention.py).
+    """
+    inserted = 0
+    expired = 0
+    ranges = {}
+    marks = {}
+    try:
+        if request.headers.get("content-type", "").startswith("application/x-ndjson"):
+            pending = []
+            buffer = b""
+            async for chunk in request.stream():
+                buffer += chunk
+                lines = buffer.split(b"\n")
+                buffer = lines.pop()
+                pending.extend(schemas.LogUpload.model_validate_json(line) for line in lines if line.strip())
+            if buffer.strip():
+                pending.append(schemas.LogUpload.model_validate_json(buffer))
+        else:
+            pending = log_list_adapter.validate_json(await request.body())
+        for i in range(0, len(pending), BULK_INSERT_CHUNK):
+            logs, skipped = await run_in_threadpool(insert_logs, db, pending[i:i + BULK_INSERT_CHUNK], marks)
+            rollups.extend_ranges(ranges, logs)
+            inserted += len(logs)
+            expired += skipped
+        await run_in_threadpool(dedup.save_marks, db, marks)
+    except ValidationError as e:
+        await run_in_threadpool(db.rollback)
+        raise HTTPException(status_code=422, detail=json.loads(e.json()))
+    except dedup.Conflict:
+        await run_in_threadpool(db.rollback)
+        raise HTTPException(status_code=409, detail="Concurrent upload from the same source; retry")
+
+    await run_in_threadpool(rollups.update_for_new_logs, db, ranges)
+    await run_in_threadpool(intervals.update_for_new_logs, db, ranges)
+    await run_in_threadpool(db.commit)
+    analytics_cache.invalidate(ranges)
+    # One summary event per light rather than one per row
+    for light_id, (first, last) in ranges.items():
+        broker.publish("logs", light_id, {"streetlight_id": light_id, "first_timestamp": first, "last_timestamp": last})
+    return {"inserted": inserted, "duplicates": len(pending) - inserted - expired, "expired": expired}
+
+def encode_log_cursor(log: models.Log) -> str:
+    raw = f"{log.timestamp.isoformat()}|{log.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_log_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        timestamp, log_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(timestamp), int(log_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
 @app.get("/api/logs/{streetlight_id}", response_model=list[schemas.Log])
-def get_logs_for_streetlight(streetlight_id: int, db: Session = Depends(get_db)):
-    logs = db.query(models.Log).filter(models.Log.streetlight_id == streetlight_id).all()
+def get_logs_for_streetlight(
+    streetlight_id: int,
+    response: Response,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    limit: int = Query(1000, ge=1, le=10000),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_read_db)
+):
+    """
+    Returns logs in (timestamp, id) order, one page at a time.
+    When more rows are available, the X-Next-Cursor header holds the
+    cursor for the next page.
+    """
+    query = db.query(models.Log).filter(models.Log.streetlight_id == streetlight_id)
+    if since:
+        query = query.filter(models.Log.timestamp >= since)
+    if until:
+        query = query.filter(models.Log.timestamp < until)
+    if cursor:
+        # Keyset pagination: seek past the last row of the previous page via the index
+        query = query.filter(tuple_(models.Log.timestamp, models.Log.id) > tuple_(*decode_log_cursor(cursor)))
+
+    logs = query.order_by(models.Log.timestamp, models.Log.id).limit(limit + 1).all()
+    if len(logs) > limit:
+        logs = logs[:limit]
+        response.headers["X-Next-Cursor"] = encode_log_cursor(logs[-1])
     return logs
 
+@app.get("/api/export/logs")
+def export_logs(
+    light_id: Optional[list[int]] = Query(None),
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    format: str = Query("ndjson", pattern="^(ndjson|csv|parquet)$"),
+):
+    """
+    Streams every log of the given lights (repeat ?light_id=, or all
+    lights) in [since, until) as NDJSON, CSV or Parquet, ordered by light
+    and time, archived months included. See export.py.
+    """
+    if format == "parquet" and not export.parquet_available():
+        raise HTTPException(status_code=501, detail="Parquet export needs pyarrow installed on the backend")
+    return StreamingResponse(
+        export.stream(read_engine, format, light_id, since, until, retention.archive),
+        media_type=export.MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="logs.{format}"'},
+    )
+
 @app.get("/api/users/{username}/requests")
-def get_user_requests(username: str, db: Session = Depends(get_db)):
+def get_user_requests(username: str, db: Session = Depends(get_read_db)):
     return db.query(models.Issue).filter(models.Issue.submitted_by_user == username).all()
 
 @app.get("/api/overrides/schedule")
-def get_active_overrides(db: Session = Depends(get_db)):
+def get_active_overrides(db: Session = Depends(get_read_db)):
     now = datetime.now()
     return db.query(models.Issue).filter(
         models.Issue.status == "Approved",
@@ -157,6 +346,38 @@ def get_active_overrides(db: Session = Depends(get_db)):
         models.Issue.override_end_time >= now
     ).all()
 
+@app.get("/api/overrides/upcoming")
+def get_upcoming_overrides(
+    request: Request,
+    response: Response,
+    light_id: Optional[list[int]] = Query(None),
+    db: Session = Depends(get_read_db)
+):
+    """
+    Approved overrides that are active now or start later, for controllers
+    to index locally. Supports If-None-Match, so polling an unchanged
+    schedule returns an empty 304.
+    """
+    query = db.query(models.Issue.id, models.Issue.light_id,
+                     models.Issue.override_start_time, models.Issue.override_end_time)\
+              .filter(models.Issue.status == "Approved",
+                      models.Issue.override_start_time.isnot(None),
+                      models.Issue.override_end_time >= datetime.now())
+    if light_id:
+        query = query.filter(models.Issue.light_id.in_(light_id))
+
+    overrides = [
+        {"id": row.id, "light_id": row.light_id,
+         "override_start_time": row.override_start_time.isoformat(),
+         "override_end_time": row.override_end_time.isoformat()}
+        for row in query.order_by(models.Issue.override_start_time, models.Issue.id)
+    ]
+    etag = '"' + hashlib.sha1(json.dumps(overrides).encode()).hexdigest() + '"'
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    return overrides
+
 # --- ANALYTICS HELPER ---
 
 def calculate_cutoff(duration: str) -> datetime:
@@ -178,80 +399,112 @@ def calculate_cutoff(duration: str) -> datetime:
 
 # --- ANALYTICS ENDPOINTS ---
 
+TRAFFIC_STATUSES = ("ON", "DIM", "OFF")
+
+@app.get("/api/analytics/fleet")
+def get_fleet_analytics(duration: str = "24h", light_id: Optional[list[int]] = Query(None)):
+    """
+    Timeline summary (minutes per status, current status, changes), traffic
+    counts and level, and estimated energy of every streetlight, or those
+    given with ?light_id=, plus fleet totals. Same windows as the
+    single-light endpoints; see analytics.py.
+    """
+    cutoff = calculate_cutoff(duration)
+    # Already plain JSON types; skips jsonable_encoder walking every light
+    return JSONResponse(analytics.fleet(ReadSessionLocal, cutoff, datetime.now(), duration in ["7d", "30d"], light_id))
+
 @app.get("/api/analytics/{light_id}/timeline")
-def get_light_timeline(light_id: int, duration: str = "24h", db: Session = Depends(get_db)):
+def get_light_timeline(light_id: int, duration: str = "24h", db: Session = Depends(get_read_db)):
     """
     Returns intervals (Start -> End) for ON/OFF/DIM status.
     Used for Gantt chart visualization.
     """
-    cutoff_time = calculate_cutoff(duration)
-
-    logs = db.query(models.Log)\
-             .filter(models.Log.streetlight_id == light_id, models.Log.timestamp >= cutoff_time)\
-             .order_by(models.Log.timestamp)\
-             .all()
-
-    if not logs:
-        return []
-
-    timeline = []
-    current_start = logs[0].timestamp
-    current_status = logs[0].status
-
-    for i in range(1, len(logs)):
-        log = logs[i]
-        if log.status != current_status:
-            timeline.append({
-                "status": current_status,
-                "start_time": current_start,
-                "end_time": log.timestamp,
-                "duration_minutes": (log.timestamp - current_start).total_seconds() / 60
-            })
-            current_status = log.status
-            current_start = log.timestamp
-
-    # Close the last interval
-    timeline.append({
-        "status": current_status,
-        "start_time": current_start,
-        "end_time": datetime.now(), # Cap at 'now'
-        "duration_minutes": (datetime.now() - current_start).total_seconds() / 60
-    })
-
-    return timeline
+    cutoff = calculate_cutoff(duration)
+
+    def compute():
+        timeline = intervals.timeline(db, light_id, cutoff)
+        # One interval row per entry, plus the log that locates the window start
+        telemetry.record_rows_read("timeline", len(timeline) + 1)
+        return timeline
+
+    timeline = analytics_cache.get_or_compute("timeline", light_id, duration, cutoff, compute)
+    if not timeline:
+        return timeline
+
+    # A cached timeline's open interval ended when it was computed
+    last = timeline[-1]
+    start = last["start_time"]
+    if isinstance(start, str):
+        start = datetime.fromisoformat(start)
+    now = datetime.now()
+    return timeline[:-1] + [{**last, "end_time": now, "duration_minutes": (now - start).total_seconds() / 60}]
 
 @app.get("/api/analytics/{light_id}/traffic")
-def get_traffic_analysis(light_id: int, duration: str = "24h", db: Session = Depends(get_db)):
+def get_traffic_analysis(light_id: int, duration: str = "24h", db: Session = Depends(get_read_db)):
     """
     Aggregates traffic data based on light status.
     - Short durations (<= 24h) bucket by HOUR.
     - Long durations (> 24h) bucket by DAY.
     """
     cutoff_time = calculate_cutoff(duration)
+    return analytics_cache.get_or_compute("traffic", light_id, duration, cutoff_time,
+                                          lambda: compute_traffic(db, light_id, duration, cutoff_time))
 
-    logs = db.query(models.Log)\
-             .filter(models.Log.streetlight_id == light_id, models.Log.timestamp >= cutoff_time)\
-             .order_by(models.Log.timestamp)\
-             .all()
-
-    if not logs:
-        return []
-
+def compute_traffic(db: Session, light_id: int, duration: str, cutoff_time: datetime) -> list:
+    """
+    The traffic analysis for the window starting at cutoff_time, from the database.
+    """
     # Determine Bucketing Strategy
     is_long_duration = duration in ["7d", "30d"]
     bucket_format = "%Y-%m-%d" if is_long_duration else "%Y-%m-%d %H:00"
 
-    bucketed_stats = {}
+    if is_long_duration:
+        rollup, first_full_bucket = models.DailyRollup, rollups.day_floor(cutoff_time) + rollups.DAY
+    else:
+        rollup, first_full_bucket = models.HourlyRollup, rollups.hour_floor(cutoff_time) + rollups.HOUR
+
+    # The bucket containing the cutoff is only partly inside the window, so
+    # count it from the raw logs (one GROUP BY over at most one bucket)
+    bucket = strftime(db, bucket_format, models.Log.timestamp).label("bucket")
+    rows = db.query(bucket, models.Log.status, func.count())\
+             .filter(models.Log.streetlight_id == light_id,
+                     models.Log.timestamp >= cutoff_time,
+                     models.Log.timestamp < first_full_bucket,
+                     models.Log.status.in_(TRAFFIC_STATUSES))\
+             .group_by(bucket, models.Log.status)\
+             .all()
 
-    for log in logs:
-        bucket_key = log.timestamp.strftime(bucket_format)
+    bucketed_stats = {}
 
+    for bucket_key, status, count in rows:
         if bucket_key not in bucketed_stats:
             bucketed_stats[bucket_key] = {"ON": 0, "DIM": 0, "OFF": 0, "total": 0}
 
-        bucketed_stats[bucket_key][log.status] += 1
-        bucketed_stats[bucket_key]["total"] += 1
+        bucketed_stats[bucket_key][status] += count
+        bucketed_stats[bucket_key]["total"] += count
+
+    # Every later bucket comes straight from the rollups
+    full_buckets = db.query(rollup)\
+                     .filter(rollup.streetlight_id == light_id, rollup.bucket_start >= first_full_bucket)\
+                     .order_by(rollup.bucket_start)\
+                     .all()
+
+    for row in full_buckets:
+        total = row.on_count + row.dim_count + row.off_count
+        bucketed_stats[row.bucket_start.strftime(bucket_format)] = {
+            "ON": row.on_count, "DIM": row.dim_count, "OFF": row.off_count, "total": total
+        }
+
+    # The GROUP BY reads every raw log it counts
+    telemetry.record_rows_read("traffic", sum(count for _, _, count in rows) + len(full_buckets))
 
+    return summarize_traffic(bucketed_stats)
+
+def summarize_traffic(bucketed_stats: dict) -> list:
+    """
+    Turns {time_bucket: {"ON", "DIM", "OFF", "total"}} counts into the
+    traffic analysis response, sorted by time bucket.
+    """
     analysis_result = []
 
     for time_key, stats in bucketed_stats.items():
@@ -259,16 +512,7 @@ def get_traffic_analysis(light_id: int, duration: str = "24h", db: Session = Dep
         if total == 0: continue
 
         on_ratio = stats["ON"] / total
-        dim_ratio = stats["DIM"] / total
-        off_ratio = stats["OFF"] / total
-
-        traffic_desc = "Moderate"
-        if off_ratio > 0.8:
-            traffic_desc = "Inactive (Day)"
-        elif on_ratio > 0.6:
-            traffic_desc = "High Traffic"
-        elif dim_ratio > 0.6:
-            traffic_desc = "Low Traffic"
+        traffic_desc = analytics.traffic_level(stats)
 
         analysis_result.append({
             "time_bucket": time_key,
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Float, Index
 from sqlalchemy.sql import func
 from .database import Base
 
@@ -30,8 +30,69 @@ class Streetlight(Base):
 
 class Log(Base):
     __tablename__ = "logs"
+    __table_args__ = (
+        Index("ix_logs_streetlight_id_timestamp", "streetlight_id", "timestamp"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     streetlight_id = Column(Integer, ForeignKey("streetlights.id"))
     status = Column(String)
-    timestamp = Column(DateTime, server_default=func.now())
\ No newline at end of file
+    timestamp = Column(DateTime, server_default=func.now())
+
+class HourlyRollup(Base):
+    """
+    Per-light log counts and status durations for one hour.
+    Durations only cover closed intervals (a status up to the next log).
+    """
+    __tablename__ = "log_rollups_hourly"
+
+    streetlight_id = Column(Integer, primary_key=True)
+    bucket_start = Column(DateTime, primary_key=True)
+    on_count = Column(Integer, default=0)
+    dim_count = Column(Integer, default=0)
+    off_count = Column(Integer, default=0)
+    on_seconds = Column(Float, default=0)
+    dim_seconds = Column(Float, default=0)
+    off_seconds = Column(Float, default=0)
+
+class DailyRollup(Base):
+    """
+    Same as HourlyRollup, summed per day.
+    """
+    __tablename__ = "log_rollups_daily"
+
+    streetlight_id = Column(Integer, primary_key=True)
+    bucket_start = Column(DateTime, primary_key=True)
+    on_count = Column(Integer, default=0)
+    dim_count = Column(Integer, default=0)
+    off_count = Column(Integer, default=0)
+    on_seconds = Column(Float, default=0)
+    dim_seconds = Column(Float, default=0)
+    off_seconds = Column(Float, default=0)
+
+class StatusInterval(Base):
+    """
+    Run-length encoded log history: one row per stretch of identical
+    statuses. end_time is the first log with a different status, or NULL
+    while the interval is still open.
+    """
+    __tablename__ = "status_intervals"
+    __table_args__ = (
+        Index("ix_status_intervals_streetlight_id_start_time", "streetlight_id", "start_time"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    streetlight_id = Column(Integer, ForeignKey("streetlights.id"))
+    status = Column(String)
+    start_time = Column(DateTime)
+    end_time = Column(DateTime, nullable=True)
+
+class UplinkSource(Base):
+    """
+    Highest log sequence number stored from each controller outbox, used to
+    skip logs that are uploaded again (see dedup.py).
+    """
+    __tablename__ = "uplink_sources"
+
+    source = Column(String, primary_key=True)
+    last_seq = Column(Integer, nullable=False)
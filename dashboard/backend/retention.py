@@ -0,0 +1,302 @@
+"""
+Log retention: raw logs older than LOG_RETENTION_DAYS move to compressed
+per-month archive files.
+
+The analytics endpoints don't need those logs. The status intervals and
+the hourly and daily rollups are kept up to date as logs arrive and are
+never pruned, and the raw logs are only read for the start of a window
+(the first log of a timeline, the first partial traffic bucket), which
+the 30 day maximum keeps inside the retention window if that is at least
+MIN_DAYS.
+
+A background job archives every calendar month lying entirely before the
+horizon (today minus the window) to LOG_ARCHIVE_DIR/logs-YYYY-MM.csv.gz,
+sorted by light and time like the export. The file is written under a
+temporary name and renamed once complete; only then are the month's raw
+logs deleted, at most RETENTION_BATCH_ROWS per transaction with a pause
+after each batch, so uploads never wait long for the write lock. A job
+stopped halfway picks up where it left off. Per light it keeps the logs of
+the month's last hour and the one log before them: a late log refreshes
+the rollups from the hour of the light's previous log, and those hours
+have to come out the same.
+
+Logs older than cutoff() (the horizon, or the end of the last archived
+month if that is later) are refused at upload: the hours they belong to
+can no longer be recomputed. Archived months are read back by
+/api/export/logs.
+
+Configured from the environment:
+
+    LOG_RETENTION_DAYS    days of raw logs to keep (default 0 keeps them all)
+    LOG_ARCHIVE_DIR       directory of the month files (default ./log_archive)
+    RETENTION_BATCH_ROWS  raw logs deleted per transaction (default 5000)
+    RETENTION_INTERVAL    seconds between runs of the job (default 3600)
+
+Rebuilding the rollups or intervals from scratch (python -m
+dashboard.backend.rollups / intervals) only sees the raw logs, so don't
+once months have been archived.
+"""
+import csv
+import gzip
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import delete, func, select
+
+from .metrics import Counter
+
+from . import export, models
+from .cache import analytics_cache
+from .rollups import day_floor, hour_floor
+
+MIN_DAYS = 31
+RETENTION_DAYS = int(os.environ.get("LOG_RETENTION_DAYS", "0"))
+ARCHIVE_DIR = os.environ.get("LOG_ARCHIVE_DIR", "log_archive")
+BATCH_ROWS = int(os.environ.get("RETENTION_BATCH_ROWS", "5000"))
+INTERVAL = float(os.environ.get("RETENTION_INTERVAL", "3600"))
+# IN lists per archive query, well below SQLite's bound parameter limit
+LIGHTS_PER_QUERY = 1000
+
+ROWS_ARCHIVED = Counter("log_retention_rows_archived_total", "Logs written to month archives")
+ROWS_DELETED = Counter("log_retention_rows_deleted_total", "Raw logs deleted after they were archived")
+RUNS = Counter("log_retention_runs_total", "Runs of the log retention job by result", ["result"])
+
+Log = models.Log
+
+
+def month_floor(ts: datetime) -> datetime:
+    return day_floor(ts).replace(day=1)
+
+
+def next_month(ts: datetime) -> datetime:
+    return month_floor(month_floor(ts) + timedelta(days=32))
+
+
+class Archive:
+    """
+    The month files in one directory.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._months = None
+
+    def path(self, month: datetime) -> str:
+        return os.path.join(self.directory, f"logs-{month:%Y-%m}.csv.gz")
+
+    def months(self, since: Optional[datetime] = None, until: Optional[datetime] = None) -> list[datetime]:
+        """
+        Archived months overlapping [since, until), oldest first.
+        """
+        if self._months is None:
+            names = os.listdir(self.directory) if os.path.isdir(self.directory) else []
+            self._months = sorted(datetime.strptime(name[5:12], "%Y-%m") for name in names
+                                  if name.startswith("logs-") and name.endswith(".csv.gz"))
+        return [month for month in self._months
+                if (since is None or since < next_month(month)) and (until is None or month < until)]
+
+    def until(self) -> Optional[datetime]:
+        """
+        End of the last archived month.
+        """
+        months = self.months()
+        return next_month(months[-1]) if months else None
+
+    def write(self, month: datetime, chunks) -> int:
+        """
+        Stores one month of logs given as export.rows() chunks, replacing
+        the file only once it is complete. Returns the number of rows.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(month)
+        temporary = f"{path}.tmp"
+        written = 0
+
+        def counted():
+            nonlocal written
+            for rows in chunks:
+                written += len(rows)
+                yield rows
+
+        try:
+            with open(temporary, "wb") as file:
+                with gzip.GzipFile(fileobj=file, mode="wb") as archive:
+                    for data in export.ENCODERS["csv"](counted()):
+                        archive.write(data)
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(temporary, path)
+        except BaseException:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+            raise
+        if month not in self.months():
+            self._months = sorted(self._months + [month])
+        return written
+
+    def rows(self, month: datetime, light_ids=None, since=None, until=None):
+        """
+        The (id, streetlight_id, status, timestamp) rows of one month file
+        in file order, optionally filtered like export.rows(). Timestamps
+        stay ISO text.
+        """
+        light_ids = set(light_ids) if light_ids else None
+        with gzip.open(self.path(month), "rt", newline="") as file:
+            reader = csv.reader(file)
+            next(reader)
+            for log_id, light_id, status, timestamp in reader:
+                light_id = int(light_id)
+                if light_ids is not None and light_id not in light_ids:
+                    continue
+                if since is not None or until is not None:
+                    ts = datetime.fromisoformat(timestamp)
+                    if (since is not None and ts < since) or (until is not None and ts >= until):
+                        continue
+                yield int(log_id), light_id, status, timestamp
+
+
+archive = Archive(ARCHIVE_DIR)
+
+
+def horizon(days: int = RETENTION_DAYS, now: Optional[datetime] = None) -> Optional[datetime]:
+    """
+    Raw logs before this are archived (None when retention is off).
+    """
+    if not days:
+        return None
+    return day_floor((now or datetime.now()) - timedelta(days=days))
+
+
+def cutoff() -> Optional[datetime]:
+    """
+    Uploaded logs older than this are refused (None: none are).
+    """
+    bounds = [bound for bound in (horizon(), archive.until()) if bound is not None]
+    return max(bounds) if bounds else None
+
+
+def expired(timestamp: datetime, oldest: Optional[datetime]) -> bool:
+    # Logs are stored without their UTC offset, so compare them that way
+    return oldest is not None and timestamp.replace(tzinfo=None) < oldest
+
+
+class _Stopped(Exception):
+    pass
+
+
+class RetentionJob:
+    def __init__(self, session_factory, read_engine, archive: Archive = archive, days: int = RETENTION_DAYS,
+                 batch_rows: int = BATCH_ROWS, interval: float = INTERVAL, pause: float = 0.05):
+        if 0 < days < MIN_DAYS:
+            raise ValueError(f"LOG_RETENTION_DAYS must be 0 or at least {MIN_DAYS} (the 30d analytics window)")
+        self.session_factory = session_factory
+        self.read_engine = read_engine
+        self.archive = archive
+        self.days = days
+        self.batch_rows = batch_rows
+        self.interval = interval
+        self.pause = pause
+        self._stop = threading.Event()
+        self._worker = None
+        self.failures = 0
+
+    def run_once(self, now: Optional[datetime] = None) -> tuple[int, int]:
+        """
+        Archives and purges every month before the horizon. Returns the
+        number of logs archived and deleted.
+        """
+        limit = horizon(self.days, now)
+        if limit is None:
+            return 0, 0
+        with self.read_engine.connect() as conn:
+            light_ids = list(conn.scalars(select(Log.streetlight_id).distinct().order_by(Log.streetlight_id)))
+            firsts = [conn.scalar(select(func.min(Log.timestamp)).where(Log.streetlight_id == light_id))
+                      for light_id in light_ids]
+        if not firsts:
+            return 0, 0
+
+        archived = deleted = 0
+        month = month_floor(min(firsts))
+        while next_month(month) <= limit and not self._stop.is_set():
+            months = self.archive.months()
+            # Earlier archived months were purged before the next one was
+            # started; the last may have been interrupted
+            if month not in months or month == months[-1]:
+                if month not in months:
+                    rows = self.archive.write(month, self._month_rows(light_ids, month))
+                    ROWS_ARCHIVED.inc(rows)
+                    archived += rows
+                purged, lights = self._purge(light_ids, month)
+                analytics_cache.invalidate(lights)
+                deleted += purged
+                print(f"Log retention: {month:%Y-%m} archived to {self.archive.path(month)}, "
+                      f"{purged} raw logs deleted")
+            month = next_month(month)
+        return archived, deleted
+
+    def _month_rows(self, light_ids: list[int], month: datetime):
+        for i in range(0, len(light_ids), LIGHTS_PER_QUERY):
+            for rows in export.rows(self.read_engine, light_ids[i:i + LIGHTS_PER_QUERY], month, next_month(month)):
+                if self._stop.is_set():
+                    raise _Stopped
+                yield rows
+
+    def _purge(self, light_ids: list[int], month: datetime) -> tuple[int, list[int]]:
+        start, end = month, next_month(month)
+        deleted = since_pause = 0
+        lights = []
+        for light_id in light_ids:
+            in_month = (Log.streetlight_id == light_id, Log.timestamp >= start)
+            with self.read_engine.connect() as conn:
+                last = conn.scalar(select(func.max(Log.timestamp)).where(*in_month, Log.timestamp < end))
+                if last is None:
+                    continue
+                keep_from = conn.scalar(select(func.max(Log.timestamp))
+                                        .where(*in_month, Log.timestamp < hour_floor(last)))
+            if keep_from is None:
+                continue
+            batch = select(Log.id).where(*in_month, Log.timestamp < keep_from).limit(self.batch_rows)
+            while True:
+                if self._stop.is_set():
+                    raise _Stopped
+                with self.session_factory() as db:
+                    count = db.execute(delete(Log).where(Log.id.in_(batch.scalar_subquery()))).rowcount
+                    db.commit()
+                ROWS_DELETED.inc(count)
+                deleted += count
+                since_pause += count
+                if count and light_id not in lights:
+                    lights.append(light_id)
+                if since_pause >= self.batch_rows:
+                    # Let waiting uploads have the write lock
+                    since_pause = 0
+                    self._stop.wait(self.pause)
+                if count < self.batch_rows:
+                    break
+        return deleted, lights
+
+    def start(self):
+        self._stop.clear()
+        self._worker = threading.Thread(target=self._run, name="log-retention", daemon=True)
+        self._worker.start()
+
+    def close(self):
+        self._stop.set()
+        if self._worker is not None:
+            self._worker.join()
+            self._worker = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+                RUNS.labels("ok").inc()
+            except _Stopped:
+                break
+            except Exception as e:
+                self.failures += 1
+                RUNS.labels("error").inc()
+                print(f"Error in log retention: {e}")
+            self._stop.wait(self.interval)
@@ -0,0 +1,189 @@
+"""
+Hourly and daily rollups of the logs table.
+
+Each rollup row holds, for one light and one bucket, how many ON/DIM/OFF
+logs were written and how long the light spent in each status. A status
+lasts from its log until the next log for the same light; the newest log of
+a light is still open and is not counted until the next one arrives.
+
+Rollups are kept up to date by recomputing the buckets touched by new logs
+(see update_for_new_logs). To rebuild them from scratch:
+
+    python -m dashboard.backend.rollups
+"""
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, func
+from sqlalchemy.orm import Session
+
+from . import models
+
+HOUR = timedelta(hours=1)
+DAY = timedelta(days=1)
+STATUSES = ("ON", "DIM", "OFF")
+FIELDS = ("on_count", "dim_count", "off_count", "on_seconds", "dim_seconds", "off_seconds")
+
+
+def hour_floor(ts: datetime) -> datetime:
+    return ts.replace(minute=0, second=0, microsecond=0)
+
+
+def day_floor(ts: datetime) -> datetime:
+    return ts.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _empty_row():
+    return dict.fromkeys(FIELDS, 0)
+
+
+def _add_duration(buckets: dict, status: str, start: datetime, end: datetime):
+    """
+    Adds the time between start and end to `status`, split at hour boundaries.
+    """
+    if status not in STATUSES:
+        return
+    field = f"{status.lower()}_seconds"
+    while start < end:
+        bucket = hour_floor(start)
+        segment_end = min(bucket + HOUR, end)
+        buckets.setdefault(bucket, _empty_row())[field] += (segment_end - start).total_seconds()
+        start = segment_end
+
+
+def refresh_range(db: Session, light_id: int, start: datetime, end: datetime):
+    """
+    Recomputes the hourly rollups of one light for every hour touching
+    [start, end], then the daily rollups of the days containing them.
+    """
+    Log = models.Log
+    range_start = hour_floor(start)
+    range_end = hour_floor(end) + HOUR
+
+    previous = db.query(Log.timestamp, Log.status)\
+                 .filter(Log.streetlight_id == light_id, Log.timestamp < range_start)\
+                 .order_by(Log.timestamp.desc(), Log.id.desc())\
+                 .first()
+    logs = db.query(Log.timestamp, Log.status)\
+             .filter(Log.streetlight_id == light_id, Log.timestamp >= range_start, Log.timestamp < range_end)\
+             .order_by(Log.timestamp, Log.id)\
+             .all()
+    following = db.query(Log.timestamp)\
+                  .filter(Log.streetlight_id == light_id, Log.timestamp >= range_end)\
+                  .order_by(Log.timestamp, Log.id)\
+                  .first()
+
+    buckets = {}
+    for timestamp, status in logs:
+        if status in STATUSES:
+            buckets.setdefault(hour_floor(timestamp), _empty_row())[f"{status.lower()}_count"] += 1
+
+    # The status in effect at range_start carries over from the previous log
+    points = ([(range_start, previous.status)] if previous else []) + [tuple(log) for log in logs]
+    ends = [timestamp for timestamp, _ in points[1:]] + [following.timestamp if following else None]
+    for (interval_start, status), interval_end in zip(points, ends):
+        if interval_end is None:
+            break
+        _add_duration(buckets, status, interval_start, min(interval_end, range_end))
+
+    db.execute(delete(models.HourlyRollup).where(
+        models.HourlyRollup.streetlight_id == light_id,
+        models.HourlyRollup.bucket_start >= range_start,
+        models.HourlyRollup.bucket_start < range_end,
+    ))
+    if buckets:
+        db.bulk_insert_mappings(models.HourlyRollup, [
+            {"streetlight_id": light_id, "bucket_start": bucket, **row} for bucket, row in buckets.items()
+        ])
+
+    _refresh_days(db, light_id, day_floor(range_start), day_floor(range_end - HOUR) + DAY)
+
+
+def _refresh_days(db: Session, light_id: int, start: datetime, end: datetime):
+    hourly = db.query(models.HourlyRollup)\
+               .filter(models.HourlyRollup.streetlight_id == light_id,
+                       models.HourlyRollup.bucket_start >= start,
+                       models.HourlyRollup.bucket_start < end)\
+               .all()
+    days = {}
+    for row in hourly:
+        day = days.setdefault(day_floor(row.bucket_start), _empty_row())
+        for field in FIELDS:
+            day[field] += getattr(row, field)
+
+    db.execute(delete(models.DailyRollup).where(
+        models.DailyRollup.streetlight_id == light_id,
+        models.DailyRollup.bucket_start >= start,
+        models.DailyRollup.bucket_start < end,
+    ))
+    if days:
+        db.bulk_insert_mappings(models.DailyRollup, [
+            {"streetlight_id": light_id, "bucket_start": day, **row} for day, row in days.items()
+        ])
+
+
+def extend_ranges(ranges: dict, logs):
+    """
+    Tracks the first and last timestamp per light of newly written logs
+    (objects with streetlight_id and timestamp).
+    """
+    for log in logs:
+        first, last = ranges.get(log.streetlight_id, (log.timestamp, log.timestamp))
+        ranges[log.streetlight_id] = (min(first, log.timestamp), max(last, log.timestamp))
+    return ranges
+
+
+def update_for_new_logs(db: Session, ranges: dict):
+    """
+    Brings rollups up to date after logs covering `ranges`
+    ({light_id: (first, last)}, see extend_ranges) were added to the
+    session's transaction. Also handles logs that arrive out of order.
+    """
+    Log = models.Log
+    db.flush()
+    for light_id, (first, last) in ranges.items():
+        # Durations of the neighbouring logs change too
+        previous = db.query(func.max(Log.timestamp))\
+                     .filter(Log.streetlight_id == light_id, Log.timestamp < first)\
+                     .scalar()
+        following = db.query(func.min(Log.timestamp))\
+                      .filter(Log.streetlight_id == light_id, Log.timestamp > last)\
+                      .scalar()
+        refresh_range(db, light_id, previous or first, following or last)
+
+
+def rebuild(db: Session):
+    """
+    Drops all rollups and recomputes them from the logs table.
+    """
+    db.execute(delete(models.HourlyRollup))
+    db.execute(delete(models.DailyRollup))
+    ranges = db.query(models.Log.streetlight_id, func.min(models.Log.timestamp), func.max(models.Log.timestamp))\
+               .group_by(models.Log.streetlight_id)\
+               .all()
+    for light_id, first, last in ranges:
+        refresh_range(db, light_id, first, last)
+    db.commit()
+
+
+def backfill_if_empty(db: Session):
+    """
+    Builds the rollups once for databases created before they existed.
+    """
+    has_logs = db.query(models.Log.id).first() is not None
+    has_rollups = db.query(models.HourlyRollup.streetlight_id).first() is not None
+    if has_logs and not has_rollups:
+        print("Building log rollups for existing logs...")
+        rebuild(db)
+
+
+if __name__ == "__main__":
+    from .database import Base, SessionLocal, engine
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        rebuild(db)
+        print(f"Rebuilt {db.query(models.HourlyRollup).count()} hourly and "
+              f"{db.query(models.DailyRollup).count()} daily rollups.")
+    finally:
+        db.close()
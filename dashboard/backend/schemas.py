@@ -44,6 +44,11 @@ class LogBase(BaseModel):
 class LogCreate(LogBase):
     timestamp: datetime
 
+class LogUpload(LogCreate):
+    # Dedup key from a controller outbox: its ID and an increasing sequence number
+    source: Optional[str] = None
+    seq: Optional[int] = None
+
 class Log(LogBase):
     id: int
     timestamp: datetime
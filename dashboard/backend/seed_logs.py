@@ -1,3 +1,5 @@
+import argparse
+import json
 import requests
 import random
 from datetime import datetime, timedelta
@@ -5,8 +7,8 @@ import os
 
 API_URL = os.environ.get("BACKEND_URL", "http://localhost:8000").rstrip("/")
 
-def register_streetlights():
-    for i in [1, 2]:
+def register_streetlights(light_ids):
+    for i in light_ids:
         try:
             response = requests.post(
                 f"{API_URL}/api/streetlights",
@@ -21,17 +23,17 @@ def register_streetlights():
         except Exception as e:
             print(f"Error registering streetlight {i}: {e}")
 
-def generate_and_upload_logs():
-    light_ids = [1, 2]
-
+def generate_logs(light_ids, hours):
+    """
+    Yields log payloads every 15 minutes for each light over the last `hours`.
+    """
     end_time = datetime.now()
-    start_time = end_time - timedelta(hours=48)
+    start_time = end_time - timedelta(hours=hours)
 
     current_time = start_time
 
     light_states = {
-        1: {'status': 'OFF', 'patch_end': start_time},
-        2: {'status': 'OFF', 'patch_end': start_time}
+        light_id: {'status': 'OFF', 'patch_end': start_time} for light_id in light_ids
     }
 
     print(f"Starting data seeding from {start_time} to {end_time}...")
@@ -60,25 +62,78 @@ def generate_and_upload_logs():
 
                 status = light_states[light_id]['status']
 
-            payload = {
+            yield {
                 "streetlight_id": light_id,
                 "status": status,
                 "timestamp": current_time.isoformat(timespec='seconds')
             }
 
-            try:
-                response = requests.post(f"{API_URL}/api/logs", json=payload)
-                if response.status_code == 200:
-                    print(f"Logged: Light {light_id} | {status} | {current_time}")
-                else:
-                    print(f"Failed: {response.text}")
-            except Exception as e:
-                print(f"Connection Error: {e}")
-
         current_time += timedelta(minutes=15)
 
+def upload_logs_single(logs):
+    """
+    One POST /api/logs per log.
+    """
+    for payload in logs:
+        try:
+            response = requests.post(f"{API_URL}/api/logs", json=payload)
+            if response.status_code == 200:
+                print(f"Logged: Light {payload['streetlight_id']} | {payload['status']} | {payload['timestamp']}")
+            else:
+                print(f"Failed: {response.text}")
+        except Exception as e:
+            print(f"Connection Error: {e}")
+
+def upload_logs_bulk(logs, batch_size):
+    """
+    Streams logs as NDJSON to POST /api/logs/bulk, one transaction per batch.
+    """
+    session = requests.Session()
+    total = 0
+    batch = []
+
+    def send(batch):
+        body = (json.dumps(payload) + "\n" for payload in batch)
+        try:
+            response = session.post(
+                f"{API_URL}/api/logs/bulk",
+                data=body,
+                headers={"Content-Type": "application/x-ndjson"},
+            )
+            if response.status_code == 200:
+                return response.json()["inserted"]
+            print(f"Failed: {response.text}")
+        except Exception as e:
+            print(f"Connection Error: {e}")
+        return 0
+
+    for payload in logs:
+        batch.append(payload)
+        if len(batch) >= batch_size:
+            total += send(batch)
+            print(f"Logged {total} entries...")
+            batch = []
+    if batch:
+        total += send(batch)
+    print(f"Logged {total} entries.")
+
+def generate_and_upload_logs(light_ids=(1, 2), hours=48, bulk=True, batch_size=10000):
+    logs = generate_logs(light_ids, hours)
+    if bulk:
+        upload_logs_bulk(logs, batch_size)
+    else:
+        upload_logs_single(logs)
+
     print("Data seeding completed.")
 
 if __name__ == "__main__":
-    register_streetlights()
-    generate_and_upload_logs()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Seed the dashboard with synthetic streetlight logs.")
+    parser.add_argument("--lights", type=int, default=2, help="number of streetlights (IDs 1..N)")
+    parser.add_argument("--hours", type=int, default=48, help="hours of history to generate")
+    parser.add_argument("--batch-size", type=int, default=10000, help="logs per bulk request")
+    parser.add_argument("--single", action="store_true", help="send one request per log instead of using the bulk endpoint")
+    args = parser.parse_args()
+
+    light_ids = list(range(1, args.lights + 1))
+    register_streetlights(light_ids)
+    generate_and_upload_logs(light_ids, args.hours, bulk=not args.single, batch_size=args.batch_size)
@@ -0,0 +1,89 @@
+"""
+Request, database and analytics metrics for the backend, served from
+GET /metrics in the Prometheus text format.
+
+Request latency is measured up to the start of the response, so streaming
+endpoints (/api/events) report time to first byte rather than the life of
+the stream. SQL statements are attributed to the route that issued them.
+"""
+import contextvars
+import time
+
+from sqlalchemy import event
+
+from .metrics import CONTENT_TYPE, REGISTRY, ROW_BUCKETS, Histogram
+
+REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "Time until the response starts", ["method", "route", "status"]
+)
+DB_QUERY_SECONDS = Histogram(
+    "db_query_duration_seconds", "SQL statement execution time (SQLite: until the first row)", ["route"]
+)
+DB_ROWS_READ = Histogram(
+    "db_rows_read", "Database rows an analytics request had to read", ["endpoint"], buckets=ROW_BUCKETS
+)
+
+_scope = contextvars.ContextVar("request_scope", default=None)
+
+
+def _route(scope):
+    if scope is None:
+        return "background"
+    # Set by the router once a route has matched
+    route = scope.get("route")
+    return getattr(route, "path", "unmatched")
+
+
+class MetricsMiddleware:
+    """
+    Plain ASGI middleware (no per-request task or body buffering).
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        recorded = False
+
+        async def send_with_timing(message):
+            nonlocal recorded
+            if message["type"] == "http.response.start" and not recorded:
+                recorded = True
+                REQUEST_SECONDS.labels(scope["method"], _route(scope), message["status"])\
+                               .observe(time.perf_counter() - start)
+            await send(message)
+
+        token = _scope.set(scope)
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            if not recorded:
+                REQUEST_SECONDS.labels(scope["method"], _route(scope), 500).observe(time.perf_counter() - start)
+            _scope.reset(token)
+
+
+def instrument_engine(engine):
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        context._query_start = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - context._query_start
+        DB_QUERY_SECONDS.labels(_route(_scope.get())).observe(elapsed)
+
+
+def record_rows_read(endpoint, rows):
+    DB_ROWS_READ.labels(endpoint).observe(rows)
+
+
+def render():
+    """
+    Returns (body, content type) for the /metrics endpoint.
+    """
+    return REGISTRY.render(), CONTENT_TYPE
@@ -0,0 +1,136 @@
+import hashlib
+import json
+import os
+from types import SimpleNamespace
+
+# Version of the coefficients file written by train.py
+COEFFICIENTS_FORMAT = 1
+
+
+def sha256_file(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class DecisionEngine:
+    """
+    Closed-form evaluator for the day/night logistic regression model.
+
+    The model only has two features, so a prediction is a single dot product
+    and a sign check. Extracting the coefficients once avoids building a
+    DataFrame and going through sklearn's input validation on every frame.
+    """
+
+    def __init__(self, model):
+        coef = model.coef_[0]
+        self.coef_lux = float(coef[0])
+        self.coef_seconds = float(coef[1])
+        self.intercept = float(model.intercept_[0])
+        self.classes = [int(c) for c in model.classes_]
+
+    @classmethod
+    def from_joblib(cls, path):
+        # Pulls in sklearn (and numpy/scipy) to unpickle the model
+        import joblib
+        return cls(joblib.load(path))
+
+    @classmethod
+    def from_coefficients(cls, path, joblib_path=None):
+        """
+        Loads the JSON written by train.py. If `joblib_path` exists, the file
+        must have been exported from it (matching SHA-256), otherwise
+        ValueError is raised.
+        """
+        with open(path) as f:
+            params = json.load(f)
+        if params.get("format") != COEFFICIENTS_FORMAT:
+            raise ValueError(f"{path}: unsupported coefficients format {params.get('format')!r}")
+        if joblib_path is not None and os.path.exists(joblib_path):
+            if sha256_file(joblib_path) != params.get("joblib_sha256"):
+                raise ValueError(f"{path} was not exported from {joblib_path}; re-run train.py")
+        return cls(SimpleNamespace(coef_=[params["coef"]], intercept_=[params["intercept"]],
+                                   classes_=params["classes"]))
+
+    @classmethod
+    def load(cls, prefix):
+        """
+        Loads '<prefix>.json' when it is present and matches '<prefix>.joblib',
+        so startup does not need sklearn. Falls back to the joblib model.
+        """
+        joblib_path = f"{prefix}.joblib"
+        try:
+            return cls.from_coefficients(f"{prefix}.json", joblib_path)
+        except FileNotFoundError:
+            pass
+        except (ValueError, KeyError) as e:
+            print(f"Warning: {e}. Loading {joblib_path} instead.")
+        return cls.from_joblib(joblib_path)
+
+    def decision_function(self, lux, seconds_of_day):
+        return lux * self.coef_lux + seconds_of_day * self.coef_seconds + self.intercept
+
+    def night_mode(self, lux, seconds_of_day):
+        """
+        Same result as luminosity_model.predict() for a single (lux, seconds) row.
+        """
+        if self.decision_function(lux, seconds_of_day) > 0:
+            return self.classes[1]
+        return self.classes[0]
+
+
+class DecisionTable:
+    """
+    Lookup-table form of a DecisionEngine, with hysteresis.
+
+    For a fixed time of day the model is linear in lux, so night mode is on
+    exactly when lux is on one side of a threshold. The threshold is
+    precomputed for every `resolution`-second bucket of the day, and a
+    decision is one list lookup and one comparison.
+
+    Once a state is reached, lux has to cross the threshold by more than
+    `hysteresis` lux to leave it again, which stops sensor noise around
+    dusk and dawn from toggling every light (and its status updates and
+    log rows) several times.
+    """
+
+    def __init__(self, engine, resolution=60, hysteresis=0.0):
+        if engine.coef_lux == 0:
+            raise ValueError("The model does not depend on lux; no threshold to tabulate")
+        if 86400 % resolution:
+            raise ValueError("resolution must divide a day (86400 seconds)")
+        self.resolution = resolution
+        self.hysteresis = hysteresis
+        self.classes = engine.classes
+        # Night mode is on below the threshold when more light lowers the
+        # decision function (the usual case), above it otherwise. Both are
+        # stored as "sign * lux < threshold".
+        self._sign = -1.0 if engine.coef_lux > 0 else 1.0
+        self.thresholds = [
+            self._sign * -(start * engine.coef_seconds + engine.intercept) / engine.coef_lux
+            for start in range(0, 86400, resolution)
+        ]
+        # Threshold to compare against, by current state (None: no decision yet)
+        self._limits = {
+            None: self.thresholds,
+            False: [threshold - hysteresis for threshold in self.thresholds],
+            True: [threshold + hysteresis for threshold in self.thresholds],
+        }
+        self._night = None
+
+    def threshold(self, seconds_of_day):
+        """
+        Lux threshold (without hysteresis) for the given second of the day.
+        """
+        return self._sign * self.thresholds[int(seconds_of_day) // self.resolution]
+
+    def night_mode(self, lux, seconds_of_day):
+        """
+        Same interface as DecisionEngine.night_mode(), but remembers the last
+        decision to apply the hysteresis band.
+        """
+        night = self._sign * lux < self._limits[self._night][int(seconds_of_day) // self.resolution]
+        self._night = night
+        return self.classes[night]
@@ -0,0 +1,90 @@
+import numpy as np
+
+from protocol import pack_actions
+
+# Action codes understood by the Arduino firmware
+ACTION_OFF = 0
+ACTION_DIM = 1
+ACTION_BRIGHT = 2
+
+
+def parse_light_ids(value):
+    """
+    Parse a comma separated list of light IDs, e.g. "1,2" or "1-64,100".
+    """
+    ids = []
+    for part in value.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        if '-' in part:
+            first, last = part.split('-', 1)
+            ids.extend(range(int(first), int(last) + 1))
+        else:
+            ids.append(int(part))
+    return ids
+
+
+class LightTable:
+    """
+    Array-backed state for every light driven by this host.
+
+    Index i of each array belongs to light ids[i], which reads motion from
+    PIR channel pir_channels[i] of the sensor frame.
+    """
+
+    def __init__(self, light_ids, pir_channels=None):
+        self.ids = np.asarray(light_ids, dtype=np.int32)
+        if len(self.ids) == 0:
+            raise ValueError("At least one light ID is required")
+        if pir_channels is None:
+            pir_channels = range(len(self.ids))
+        self.pir_channels = np.asarray(pir_channels, dtype=np.intp)
+        if len(self.pir_channels) != len(self.ids):
+            raise ValueError("Each light needs exactly one PIR channel")
+        self.num_channels = int(self.pir_channels.max()) + 1
+
+        size = len(self.ids)
+        # Padded to whole command bytes so command() packs without copying
+        self._padded_actions = np.zeros((size + 3) // 4 * 4, dtype=np.uint8)
+        self.actions = self._padded_actions[:size]
+        self.overridden = np.zeros(size, dtype=bool)
+        self.active_overrides = None
+        self.reported_on = np.zeros(size, dtype=bool)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def set_overrides(self, active_overrides):
+        self.overridden[:] = np.isin(self.ids, list(active_overrides))
+        self.active_overrides = active_overrides
+
+    def decide(self, night_mode_active, pirs):
+        """
+        Compute the action for every light in one pass.
+        """
+        if night_mode_active == 0:
+            self.actions.fill(ACTION_OFF)
+        else:
+            np.add(ACTION_DIM, pirs[self.pir_channels] != 0, out=self.actions, casting='unsafe')
+        self.actions[self.overridden] = ACTION_BRIGHT
+        return self.actions
+
+    def command(self):
+        """
+        FRAME_COMMAND payload for the current actions (2 bits per light).
+        """
+        return pack_actions(self._padded_actions)
+
+    def status_changes(self):
+        """
+        Return (light_id, status) for every light whose ON/OFF status changed
+        since the last call, and mark them as reported.
+        """
+        on = self.actions != ACTION_OFF
+        changed = np.flatnonzero(on != self.reported_on)
+        self.reported_on[changed] = on[changed]
+        return [(int(self.ids[i]), "ON" if on[i] else "OFF") for i in changed]
+
+    def lights_on(self):
+        return [int(light_id) for light_id in self.ids[self.reported_on]]
@@ -0,0 +1,223 @@
+"""
+Queues of status changes waiting to be sent to the backend.
+
+Outbox keeps them in a local SQLite database (WAL mode), so changes made
+while the backend is unreachable, or before a crash or power loss, are
+sent once it is back. MemoryOutbox has the same interface without the
+disk, for hosts that don't want one.
+
+Every log in an Outbox carries the outbox's random `source` ID and a
+sequence number that never goes back, even across restarts. The backend
+remembers the highest sequence number it stored per source and skips
+anything at or below it, so replaying a batch whose response was lost
+doesn't count it twice.
+"""
+import sqlite3
+import threading
+import uuid
+from collections import deque
+
+
+class Outbox:
+    """
+    Write-ahead store for status changes, safe to use from two threads:
+    the controller appends, the uplink worker commits, reads and acks.
+
+    append() and set_status() only buffer in memory. commit() writes the
+    buffer in one transaction, so the fsync is paid once per batch instead
+    of once per change; a crash loses at most what was appended since the
+    last commit (the uplink commits every flush interval). Once more than
+    max_entries logs are stored the oldest ones are dropped, which bounds
+    disk use while the backend is down for a long time.
+    """
+
+    def __init__(self, path, max_entries=1_000_000):
+        self.path = path
+        self.max_entries = max_entries
+        self._conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # FULL: a commit is on disk when it returns, NORMAL only guarantees that at checkpoints
+        self._conn.execute("PRAGMA synchronous=FULL")
+        # Shrink the WAL back after a checkpoint instead of keeping the largest burst's size
+        self._conn.execute("PRAGMA journal_size_limit=4194304")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+            CREATE TABLE IF NOT EXISTS logs (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                streetlight_id INTEGER NOT NULL,
+                status TEXT NOT NULL,
+                timestamp TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS statuses (streetlight_id INTEGER PRIMARY KEY, status TEXT NOT NULL);
+        """)
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'source'").fetchone()
+        if row is None:
+            self.source = uuid.uuid4().hex
+            self._conn.execute("INSERT INTO meta VALUES ('source', ?)", (self.source,))
+        else:
+            self.source = row[0]
+
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._logs = []
+        self._statuses = {}
+        self._sent_statuses = {}
+        # Highest seq the backend has accepted; deleted on the next commit
+        self._acked = 0
+        self._purged = 0
+        self._count = self._conn.execute("SELECT COUNT(*) FROM logs").fetchone()[0]
+        self.dropped = 0
+
+    def append(self, light_id, status, timestamp):
+        with self._lock:
+            self._logs.append((light_id, status, timestamp))
+
+    def set_status(self, light_id, status):
+        with self._lock:
+            self._statuses[light_id] = status
+
+    def commit(self):
+        """
+        Makes everything appended so far durable and removes acked entries.
+        """
+        with self._lock:
+            logs, self._logs = self._logs, []
+            statuses, self._statuses = self._statuses, {}
+            sent_statuses, self._sent_statuses = self._sent_statuses, {}
+        with self._db_lock:
+            acked = 0
+            if self._acked > self._purged:
+                acked = self._conn.execute("SELECT COUNT(*) FROM logs WHERE seq <= ?", (self._acked,)).fetchone()[0]
+            if not (logs or statuses or sent_statuses or acked):
+                self._purged = self._acked
+                return
+            self._conn.execute("BEGIN")
+            try:
+                if acked:
+                    self._conn.execute("DELETE FROM logs WHERE seq <= ?", (self._acked,))
+                # Only clear a status if it hasn't changed again since it was sent
+                self._conn.executemany("DELETE FROM statuses WHERE streetlight_id = ? AND status = ?",
+                                       sent_statuses.items())
+                self._conn.executemany("INSERT INTO logs (streetlight_id, status, timestamp) VALUES (?, ?, ?)", logs)
+                self._conn.executemany(
+                    "INSERT INTO statuses VALUES (?, ?) "
+                    "ON CONFLICT (streetlight_id) DO UPDATE SET status = excluded.status",
+                    statuses.items(),
+                )
+                count = self._count - acked + len(logs)
+                overflow = count - self.max_entries
+                if overflow > 0:
+                    self._conn.execute("DELETE FROM logs WHERE seq IN (SELECT seq FROM logs ORDER BY seq LIMIT ?)",
+                                       (overflow,))
+                    count -= overflow
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                with self._lock:
+                    self._logs[:0] = logs
+                    for light_id, status in statuses.items():
+                        self._statuses.setdefault(light_id, status)
+                raise
+            self._count = count
+            self._purged = self._acked
+            if overflow > 0:
+                self.dropped += overflow
+
+    def statuses(self):
+        """
+        Committed statuses not sent yet, by light.
+        """
+        with self._db_lock:
+            return dict(self._conn.execute("SELECT streetlight_id, status FROM statuses").fetchall())
+
+    def status_sent(self, light_id, status):
+        with self._lock:
+            self._sent_statuses[light_id] = status
+
+    def peek(self, limit):
+        """
+        The oldest committed logs not acked yet, as backend LogUpload dicts.
+        """
+        with self._db_lock:
+            rows = self._conn.execute(
+                "SELECT seq, streetlight_id, status, timestamp FROM logs WHERE seq > ? ORDER BY seq LIMIT ?",
+                (self._acked, limit),
+            ).fetchall()
+        return [{"streetlight_id": light_id, "status": status, "timestamp": timestamp,
+                 "source": self.source, "seq": seq}
+                for seq, light_id, status, timestamp in rows]
+
+    def ack(self, entries):
+        """
+        Marks logs returned by peek() as stored by the backend.
+        """
+        if entries:
+            self._acked = max(self._acked, entries[-1]["seq"])
+
+    def __len__(self):
+        with self._lock:
+            buffered = len(self._logs)
+        with self._db_lock:
+            unacked = self._conn.execute("SELECT COUNT(*) FROM logs WHERE seq > ?", (self._acked,)).fetchone()[0]
+        return buffered + unacked
+
+    def close(self):
+        self.commit()
+        with self._db_lock:
+            self._conn.close()
+
+
+class MemoryOutbox:
+    """
+    Outbox without persistence: a bounded in-memory queue that drops the
+    oldest logs when full. Logs have no dedup key.
+    """
+
+    source = None
+
+    def __init__(self, max_entries=10000):
+        self._logs = deque()
+        self.max_entries = max_entries
+        self._statuses = {}
+        self._lock = threading.Lock()
+        self.dropped = 0
+
+    def append(self, light_id, status, timestamp):
+        with self._lock:
+            if len(self._logs) >= self.max_entries:
+                self._logs.popleft()
+                self.dropped += 1
+            self._logs.append({"streetlight_id": light_id, "status": status, "timestamp": timestamp})
+
+    def set_status(self, light_id, status):
+        with self._lock:
+            self._statuses[light_id] = status
+
+    def commit(self):
+        pass
+
+    def statuses(self):
+        with self._lock:
+            return dict(self._statuses)
+
+    def status_sent(self, light_id, status):
+        with self._lock:
+            if self._statuses.get(light_id) == status:
+                del self._statuses[light_id]
+
+    def peek(self, limit):
+        with self._lock:
+            return [self._logs[i] for i in range(min(limit, len(self._logs)))]
+
+    def ack(self, entries):
+        with self._lock:
+            # Entries dropped while the batch was in flight are already gone
+            for entry in entries:
+                if self._logs and self._logs[0] is entry:
+                    self._logs.popleft()
+
+    def __len__(self):
+        return len(self._logs)
+
+    def close(self):
+        pass
@@ -0,0 +1,161 @@
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+import requests
+
+
+class OverrideIndex:
+    """
+    Pre-parsed override schedule as a time-sorted list of start/end
+    boundaries. active_at() only advances past boundaries that have been
+    reached, so checking it every frame is O(1) amortized.
+
+    An override is active while start <= now <= end, like the backend's
+    /api/overrides/schedule.
+    """
+
+    def __init__(self, overrides, now=None):
+        now = now or datetime.now()
+        events = []
+        for override in overrides:
+            start = datetime.fromisoformat(override['override_start_time'])
+            end = datetime.fromisoformat(override['override_end_time'])
+            if end >= now:
+                # Starts sort before ends at the same instant
+                events.append((start, 0, override['light_id']))
+                events.append((end, 1, override['light_id']))
+        events.sort()
+        self._events = events
+        self._position = 0
+        self._counts = Counter()
+        self.active = frozenset()
+        self.active_at(now)
+
+    def active_at(self, now):
+        """
+        Light IDs with an active override. Returns the same frozenset object
+        until the set changes.
+        """
+        events = self._events
+        changed = False
+        while self._position < len(events):
+            boundary, is_end, light_id = events[self._position]
+            if is_end:
+                if boundary >= now:
+                    break
+                self._counts[light_id] -= 1
+            else:
+                if boundary > now:
+                    break
+                self._counts[light_id] += 1
+            self._position += 1
+            changed = True
+        if changed:
+            self.active = frozenset(light_id for light_id, count in self._counts.items() if count > 0)
+        return self.active
+
+    def next_boundary(self):
+        """
+        Time of the next start/end not yet passed by active_at(), or None.
+        """
+        if self._position < len(self._events):
+            return self._events[self._position][0]
+        return None
+
+
+class OverrideSchedule:
+    """
+    Keeps an OverrideIndex in sync with the backend from a background thread.
+
+    The thread listens on /api/events for "overrides" notifications and
+    re-fetches /api/overrides/upcoming (with If-None-Match) when one arrives,
+    so approved overrides apply within a frame. If the event stream is
+    unavailable it falls back to polling every `poll_interval` seconds.
+
+    on_change, if set, is called from the background thread whenever a new
+    schedule has been loaded.
+    """
+
+    def __init__(self, api_url, light_ids, timeout=2.0, poll_interval=30, on_change=None):
+        self.api_url = api_url.rstrip("/")
+        light_ids = list(light_ids)
+        # Long ID lists don't fit in a URL; unfiltered is fine, the index ignores other lights
+        self._params = {"light_id": light_ids} if len(light_ids) <= 100 else {}
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self.on_change = on_change
+        self.index = OverrideIndex([])
+        self._etag = None
+        self._session = requests.Session()
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="overrides", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopping = True
+
+    def active_at(self, now):
+        return self.index.active_at(now)
+
+    def next_boundary(self):
+        return self.index.next_boundary()
+
+    def refresh(self):
+        """
+        Fetches the upcoming overrides. Returns False if the backend could
+        not be reached.
+        """
+        headers = {"If-None-Match": self._etag} if self._etag else {}
+        try:
+            response = self._session.get(
+                f"{self.api_url}/api/overrides/upcoming",
+                params=self._params,
+                headers=headers,
+                timeout=self.timeout,
+            )
+            if response.status_code == 304:
+                return True
+            response.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            print(f"Error fetching override schedule: {e}")
+            return False
+        self.index = OverrideIndex(response.json())
+        self._etag = response.headers.get("ETag")
+        if self.on_change:
+            self.on_change()
+        return True
+
+    def _run(self):
+        while not self._stopping:
+            self.refresh()
+            try:
+                self._listen()
+            except requests.exceptions.RequestException:
+                pass
+            # Event stream is down: poll until it comes back
+            deadline = time.monotonic() + self.poll_interval
+            while not self._stopping and time.monotonic() < deadline:
+                time.sleep(0.5)
+
+    def _listen(self):
+        with self._session.get(
+            f"{self.api_url}/api/events",
+            # Only approvals; not the status and log events of our own writes
+            params={**self._params, "event": "overrides"},
+            stream=True,
+            # Longer than the server's keep-alive interval
+            timeout=(self.timeout, 60),
+        ) as response:
+            response.raise_for_status()
+            # Catch anything approved while we were disconnected
+            self.refresh()
+            for line in response.iter_lines():
+                if self._stopping:
+                    return
+                if line == b"event: overrides":
+                    self.refresh()
@@ -0,0 +1,166 @@
+"""
+Binary serial protocol shared with controller/controller.ino.
+
+Every frame is laid out as
+
+    0xA5 | type (u8) | seq (u8) | length (u16 LE) | payload | crc16 (u16 LE)
+
+where crc16 is CRC-16/CCITT-FALSE (poly 0x1021, init 0xFFFF) over
+type, seq, length and payload.
+
+    FRAME_SENSOR  (Arduino -> host): lux (float32 LE), then one PIR bit per
+                  channel, least significant bit first.
+    FRAME_COMMAND (host -> Arduino): one 2-bit action per light (0 OFF,
+                  1 DIM, 2 BRIGHT), four lights per byte, light 0 in the
+                  lowest bits.
+"""
+import binascii
+import struct
+
+import numpy as np
+
+FRAME_START = 0xA5
+FRAME_SENSOR = 0x01
+FRAME_COMMAND = 0x02
+
+HEADER_SIZE = 5
+CRC_SIZE = 2
+_HEADER = struct.Struct('<BBBH')
+_LUX = struct.Struct('<f')
+
+
+def crc16(data):
+    return binascii.crc_hqx(data, 0xFFFF)
+
+
+def encode_frame(frame_type, seq, payload):
+    header = _HEADER.pack(FRAME_START, frame_type, seq & 0xFF, len(payload))
+    crc = crc16(header[1:] + payload)
+    return header + payload + struct.pack('<H', crc)
+
+
+def encode_sensor_payload(lux, pirs):
+    return _LUX.pack(lux) + np.packbits(np.asarray(pirs, dtype=np.uint8), bitorder='little').tobytes()
+
+
+def decode_sensor_payload(payload, num_channels):
+    """
+    Returns (lux, pirs) where pirs is a uint8 array with one entry per
+    PIR channel. Returns None if the payload is too short.
+    """
+    if len(payload) < _LUX.size + (num_channels + 7) // 8:
+        return None
+    lux = _LUX.unpack_from(payload)[0]
+    bits = np.frombuffer(payload, dtype=np.uint8, offset=_LUX.size)
+    return lux, np.unpackbits(bits, count=num_channels, bitorder='little')
+
+
+def pack_actions(actions):
+    """
+    Packs 0/1/2 actions into the 2-bit FRAME_COMMAND payload. Passing a
+    uint8 array whose length is a multiple of 4 avoids a padding copy.
+    """
+    padded = actions
+    if len(actions) % 4:
+        padded = np.zeros((len(actions) + 3) // 4 * 4, dtype=np.uint8)
+        padded[:len(actions)] = actions
+    packed = padded[0::4] | (padded[1::4] << 2) | (padded[2::4] << 4) | (padded[3::4] << 6)
+    return packed.tobytes()
+
+
+def unpack_actions(payload, count):
+    packed = np.frombuffer(payload, dtype=np.uint8)
+    return np.stack([(packed >> shift) & 3 for shift in (0, 2, 4, 6)], axis=1).ravel()[:count]
+
+
+class FrameReader:
+    """
+    Incremental frame parser over a fixed-size bytearray.
+
+    Serial data is read straight into the buffer (readinto) and payloads
+    are returned as memoryviews into it, so nothing is copied. A payload
+    view is only valid until the next feed()/readinto() call. Corrupt or
+    truncated frames are skipped by resyncing on the next start byte.
+    """
+
+    def __init__(self, capacity=65536, max_payload=1024):
+        self._buffer = bytearray(capacity)
+        self._view = memoryview(self._buffer)
+        self._start = 0
+        self._end = 0
+        self.max_payload = max_payload
+        self._expected_seq = {}
+
+        self.frames = 0
+        self.bad_frames = 0
+        self.skipped_bytes = 0
+        self.lost_frames = 0
+
+    def _make_room(self, size):
+        if self._end + size <= len(self._buffer):
+            return
+        # Move the unread bytes to the front (same-size slice assignment,
+        # so outstanding memoryviews stay valid)
+        unread = self._end - self._start
+        if unread + size > len(self._buffer):
+            # Can't hold a full frame; drop what we have and resync
+            self.skipped_bytes += unread
+            self._start = self._end = 0
+            return
+        self._buffer[:unread] = self._buffer[self._start:self._end]
+        self._start, self._end = 0, unread
+
+    def feed(self, data):
+        size = len(data)
+        self._make_room(size)
+        self._buffer[self._end:self._end + size] = data
+        self._end += size
+
+    def readinto(self, port, size):
+        """
+        Reads up to `size` bytes from a file-like port into the buffer.
+        """
+        self._make_room(size)
+        count = port.readinto(self._view[self._end:self._end + size]) or 0
+        self._end += count
+        return count
+
+    def next_frame(self):
+        """
+        Returns (frame_type, seq, payload) for the next valid frame, or
+        None until more data arrives.
+        """
+        buffer = self._buffer
+        while True:
+            start = buffer.find(FRAME_START, self._start, self._end)
+            if start < 0:
+                self.skipped_bytes += self._end - self._start
+                self._start = self._end
+                return None
+            self.skipped_bytes += start - self._start
+            self._start = start
+
+            if self._end - start < HEADER_SIZE:
+                return None
+            length = buffer[start + 3] | (buffer[start + 4] << 8)
+            if length > self.max_payload:
+                self.bad_frames += 1
+                self._start += 1
+                continue
+            payload_end = start + HEADER_SIZE + length
+            if self._end < payload_end + CRC_SIZE:
+                return None
+            crc = buffer[payload_end] | (buffer[payload_end + 1] << 8)
+            if crc16(self._view[start + 1:payload_end]) != crc:
+                self.bad_frames += 1
+                self._start += 1
+                continue
+
+            self._start = payload_end + CRC_SIZE
+            frame_type, seq = buffer[start + 1], buffer[start + 2]
+            expected = self._expected_seq.get(frame_type)
+            if expected is not None:
+                self.lost_frames += (seq - expected) & 0xFF
+            self._expected_seq[frame_type] = (seq + 1) & 0xFF
+            self.frames += 1
+            return frame_type, seq, self._view[start + HEADER_SIZE:payload_end]
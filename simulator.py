@@ -0,0 +1,190 @@
+"""
+Hardware-free stand-in for the Arduino.
+
+Opens a pseudo-terminal and speaks the firmware's side of the serial
+protocol on it: sensor frames go out at a fixed rate (or in lockstep with
+the commands coming back), commands are decoded and applied to a simulated
+set of lights. Lux comes from a diurnal curve or is replayed from
+data/street_light_data_shuffled.csv; PIRs trigger at random.
+
+Simulated time can run faster than real time. Pass `clock.now` to the
+Controller so both sides agree on the time of day.
+
+Run it on its own and point automation.py at the printed port (Linux/macOS):
+    python simulator.py --lights 64 --rate 20 --source csv
+    SERIAL_PORT=/dev/pts/N python automation.py
+"""
+import argparse
+import csv
+import math
+import os
+import threading
+import time
+import tty
+from collections import deque
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from protocol import FRAME_COMMAND, FRAME_SENSOR, FrameReader, encode_frame, encode_sensor_payload, unpack_actions
+
+CSV_PATH = "data/street_light_data_shuffled.csv"
+
+
+class SimClock:
+    """
+    Wall clock running `speed` times faster than real time from `start`.
+    """
+
+    def __init__(self, start=None, speed=1.0):
+        self.start = start or datetime.now()
+        self.speed = speed
+        self._origin = time.monotonic()
+
+    def now(self):
+        return self.start + timedelta(seconds=(time.monotonic() - self._origin) * self.speed)
+
+
+def seconds_of_day(when):
+    return when.hour * 3600 + when.minute * 60 + when.second
+
+
+def diurnal_lux(seconds, rng):
+    """
+    Clear-sky daylight between 06:00 and 18:00 plus sensor noise.
+    """
+    daylight = max(0.0, math.sin(math.pi * (seconds - 6 * 3600) / (12 * 3600)))
+    return 1000.0 * daylight + rng.uniform(0, 5)
+
+
+def load_csv_lux(path=CSV_PATH):
+    """
+    Lux for every second of the day from the training data.
+    """
+    lux = np.zeros(86400)
+    with open(path, newline="") as f:
+        for row in csv.DictReader(f):
+            h, m, s = (int(part) for part in row["timestamp"].split(":"))
+            lux[h * 3600 + m * 60 + s] = float(row["ambience_lux"])
+    return lux
+
+
+class SimulatedArduino:
+    """
+    Firmware side of the serial link on the master end of a pty.
+
+    rate is sensor frames per second; rate <= 0 sends the next frame as soon
+    as the command for the previous one has arrived (maximum throughput).
+    """
+
+    def __init__(self, num_lights, rate=4.0, source="diurnal", clock=None, motion=0.05, seed=None,
+                 csv_path=CSV_PATH):
+        self.num_lights = num_lights
+        self.rate = rate
+        self.clock = clock or SimClock()
+        self.motion = motion
+        self.rng = np.random.default_rng(seed)
+        self.csv_lux = load_csv_lux(csv_path) if source == "csv" else None
+
+        self._master, self._slave = os.openpty()
+        tty.setraw(self._master)
+        self.port_name = os.ttyname(self._slave)
+        self._port = os.fdopen(self._master, "r+b", buffering=0)
+
+        self.actions = np.zeros(num_lights, dtype=np.uint8)
+        self.frames_sent = 0
+        self.commands_received = 0
+        # Seconds from sending a sensor frame to receiving the next command
+        self.round_trips = deque(maxlen=100000)
+
+        self._sent_at = None
+        self._answered = threading.Event()
+        self._stopping = threading.Event()
+        self._threads = [
+            threading.Thread(target=self._send, name="sim-sensor", daemon=True),
+            threading.Thread(target=self._receive, name="sim-command", daemon=True),
+        ]
+
+    def start(self):
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def stop(self):
+        self._stopping.set()
+        self._answered.set()
+        for thread in self._threads:
+            thread.join(1)
+        self._port.close()
+        os.close(self._slave)
+
+    def reading(self):
+        now = self.clock.now()
+        if self.csv_lux is not None:
+            lux = float(self.csv_lux[seconds_of_day(now)])
+        else:
+            lux = diurnal_lux(seconds_of_day(now), self.rng)
+        return lux, self.rng.random(self.num_lights) < self.motion
+
+    def _send(self):
+        interval = 1.0 / self.rate if self.rate > 0 else 0
+        next_frame = time.perf_counter()
+        seq = 0
+        while not self._stopping.is_set():
+            if interval:
+                delay = next_frame - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                next_frame += interval
+            frame = encode_frame(FRAME_SENSOR, seq, encode_sensor_payload(*self.reading()))
+            self._answered.clear()
+            self._sent_at = time.perf_counter()
+            try:
+                self._port.write(frame)
+            except OSError:
+                return
+            self.frames_sent += 1
+            seq = (seq + 1) & 0xFF
+            if not interval:
+                # Give up on a lost command after a second so lockstep can't stall
+                self._answered.wait(1.0)
+
+    def _receive(self):
+        reader = FrameReader()
+        while not self._stopping.is_set():
+            try:
+                if not reader.readinto(self._port, 4096):
+                    return
+            except OSError:
+                return
+            while (frame := reader.next_frame()) is not None:
+                frame_type, _, payload = frame
+                if frame_type != FRAME_COMMAND:
+                    continue
+                self.actions[:] = unpack_actions(payload, self.num_lights)
+                self.commands_received += 1
+                if not self._answered.is_set():
+                    self.round_trips.append(time.perf_counter() - self._sent_at)
+                    self._answered.set()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lights", type=int, default=2)
+    parser.add_argument("--rate", type=float, default=4.0, help="sensor frames per second (0 = lockstep)")
+    parser.add_argument("--source", choices=["diurnal", "csv"], default="diurnal")
+    parser.add_argument("--speed", type=float, default=1.0, help="simulated seconds per real second")
+    parser.add_argument("--motion", type=float, default=0.05, help="chance a PIR triggers in a frame")
+    args = parser.parse_args()
+
+    simulator = SimulatedArduino(args.lights, args.rate, args.source, SimClock(speed=args.speed), args.motion)
+    simulator.start()
+    print(f"Simulating {args.lights} lights on {simulator.port_name}. Press Ctrl+C to exit.")
+    try:
+        while True:
+            time.sleep(5)
+            print(f"{simulator.clock.now():%H:%M:%S} sent {simulator.frames_sent} frames, "
+                  f"received {simulator.commands_received} commands, "
+                  f"{int((simulator.actions != 0).sum())} lights on")
+    except KeyboardInterrupt:
+        simulator.stop()
@@ -25,3 +25,21 @@ print(luminosity_model.predict(data_multi))
 print(data_single.head())
 print("data shape:", data_single.shape)
 print(luminosity_model.predict(data_single))
+
+# Parity check: closed-form DecisionEngine vs sklearn over the training data
+from decision import DecisionEngine
+
+engine = DecisionEngine(luminosity_model)
+df = pd.read_csv('data/street_light_data_shuffled.csv')
+parts = df['timestamp'].str.split(':', expand=True).astype(int)
+df['seconds_of_day'] = parts[0] * 3600 + parts[1] * 60 + parts[2]
+
+expected = luminosity_model.predict(df[["ambience_lux", "seconds_of_day"]])
+actual = [
+    engine.night_mode(lux, seconds)
+    for lux, seconds in zip(df['ambience_lux'].tolist(), df['seconds_of_day'].tolist())
+]
+mismatches = int((expected != actual).sum())
+print(f"DecisionEngine parity: {len(df) - mismatches}/{len(df)} rows match sklearn")
+if mismatches:
+    sys.exit(1)
@@ -0,0 +1,169 @@
+"""
+Train the day/night logistic regression from the command line.
+
+Scriptable version of notebooks/model_training.ipynb. The CSVs (one or
+many, e.g. one per site) are read in chunks with typed columns, and each
+chunk is reduced straight to compact feature arrays with vectorized
+arithmetic. Only those arrays (13 bytes per row) are kept, so training
+sets much larger than the raw text fit in memory.
+
+Writes the joblib model used for validation and retraining, and a small
+JSON coefficients file the controller can load without sklearn or pandas.
+
+Run from the project root:
+    python train.py [data/*.csv ...] [--chunksize 1000000] [--output models/street_light_model]
+    python train.py --export-only   # JSON for the existing joblib model
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime, timezone
+
+try:
+    import resource
+except ImportError:
+    # Windows
+    resource = None
+
+import joblib
+import numpy as np
+import pandas as pd
+import sklearn
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import accuracy_score, classification_report, confusion_matrix
+from sklearn.model_selection import train_test_split
+
+from decision import COEFFICIENTS_FORMAT, sha256_file
+
+FEATURES = ["ambience_lux", "seconds_of_day"]
+DEFAULT_DATA = ["data/street_light_data_shuffled.csv"]
+DEFAULT_OUTPUT = "models/street_light_model"
+
+
+def seconds_of_day(timestamps):
+    """
+    Vectorized 'HH:MM:SS' -> seconds since midnight for a Series of strings.
+    """
+    raw = timestamps.to_numpy(dtype="S8")
+    digits = raw.view(np.uint8).reshape(-1, 8).astype(np.int32) - ord("0")
+    # Anything not shaped like HH:MM:SS goes through the (slower) datetime parser
+    if not ((raw.view(np.uint8).reshape(-1, 8)[:, [2, 5]] == ord(":")).all()
+            and (digits[:, [0, 1, 3, 4, 6, 7]] >= 0).all()
+            and (digits[:, [0, 1, 3, 4, 6, 7]] <= 9).all()):
+        parsed = pd.to_datetime(timestamps, format="%H:%M:%S")
+        return (parsed.dt.hour * 3600 + parsed.dt.minute * 60 + parsed.dt.second).to_numpy(np.int32)
+    return ((digits[:, 0] * 10 + digits[:, 1]) * 3600
+            + (digits[:, 3] * 10 + digits[:, 4]) * 60
+            + digits[:, 6] * 10 + digits[:, 7])
+
+
+def read_features(paths, chunksize=1_000_000):
+    """
+    Returns (lux, seconds, light_needed) arrays for every row of the CSVs.
+    """
+    lux, seconds, labels = [], [], []
+    for path in paths:
+        chunks = pd.read_csv(
+            path,
+            usecols=["timestamp", "ambience_lux", "light_needed"],
+            dtype={"timestamp": str, "ambience_lux": np.float64, "light_needed": "category"},
+            chunksize=chunksize,
+        )
+        for chunk in chunks:
+            lux.append(chunk["ambience_lux"].to_numpy())
+            seconds.append(seconds_of_day(chunk["timestamp"]))
+            labels.append((chunk["light_needed"] == "yes").to_numpy())
+    return np.concatenate(lux), np.concatenate(seconds), np.concatenate(labels).astype(np.int8)
+
+
+def write_coefficients(model, path, joblib_path):
+    """
+    Writes the model parameters as JSON, tied to the joblib artifact by its
+    SHA-256 so a stale file can be detected.
+    """
+    coefficients = {
+        "format": COEFFICIENTS_FORMAT,
+        "features": FEATURES,
+        "coef": [float(c) for c in model.coef_[0]],
+        "intercept": float(model.intercept_[0]),
+        "classes": [int(c) for c in model.classes_],
+        "sklearn_version": sklearn.__version__,
+        "joblib_sha256": sha256_file(joblib_path),
+        "exported_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+    }
+    with open(path, "w") as f:
+        json.dump(coefficients, f, indent=2)
+        f.write("\n")
+    return coefficients
+
+
+def peak_rss_mb():
+    """
+    Peak resident memory of this process (NaN where the resource module
+    is missing, i.e. on Windows).
+    """
+    if resource is None:
+        return float("nan")
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Bytes on macOS, kilobytes on Linux
+    return peak / (1 << 20) if sys.platform == "darwin" else peak / 1024
+
+
+def train(paths, output=DEFAULT_OUTPUT, chunksize=1_000_000, test_size=0.3):
+    timings = {}
+
+    start = time.perf_counter()
+    lux, seconds, labels = read_features(paths, chunksize)
+    X = pd.DataFrame({"ambience_lux": lux, "seconds_of_day": seconds}, columns=FEATURES, copy=False)
+    del lux, seconds
+    timings["read + features"] = time.perf_counter() - start
+    feature_bytes = X.memory_usage(index=False).sum() + labels.nbytes
+    print(f"Loaded {len(X)} rows from {len(paths)} file(s) ({feature_bytes / 1e6:.1f} MB of features)")
+
+    # Same split as the notebook, so results are comparable
+    X_train, X_test, y_train, y_test = train_test_split(X, labels, test_size=test_size, random_state=42)
+
+    start = time.perf_counter()
+    model = LogisticRegression()
+    model.fit(X_train, y_train)
+    timings["fit"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    y_pred = model.predict(X_test)
+    timings["evaluate"] = time.perf_counter() - start
+
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    joblib_path = f"{output}.joblib"
+    joblib.dump(model, joblib_path)
+    write_coefficients(model, f"{output}.json", joblib_path)
+    print(f"Model exported to '{joblib_path}' and '{output}.json'")
+    print("-" * 30)
+
+    print(f"Model Accuracy: {accuracy_score(y_test, y_pred):.4f}")
+    print("Confusion Matrix:")
+    print(confusion_matrix(y_test, y_pred))
+    print(classification_report(y_test, y_pred, target_names=['No Light Needed', 'Light Needed']))
+    print("-" * 30)
+
+    for stage, elapsed in timings.items():
+        print(f"{stage:<16} {elapsed:8.2f} s")
+    print(f"{'peak RSS':<16} {peak_rss_mb():8.1f} MB")
+    return model
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("data", nargs="*", default=DEFAULT_DATA, help="training CSVs (timestamp, ambience_lux, light_needed)")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="path prefix for the .joblib and .json files")
+    parser.add_argument("--chunksize", type=int, default=1_000_000, help="rows per CSV chunk")
+    parser.add_argument("--test-size", type=float, default=0.3)
+    parser.add_argument("--export-only", action="store_true",
+                        help="write the .json for the existing <output>.joblib without retraining")
+    args = parser.parse_args()
+    if args.export_only:
+        write_coefficients(joblib.load(f"{args.output}.joblib"), f"{args.output}.json", f"{args.output}.joblib")
+        print(f"Coefficients exported to '{args.output}.json'")
+    else:
+        train(args.data, args.output, args.chunksize, args.test_size)
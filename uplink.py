@@ -0,0 +1,201 @@
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from metrics import Counter, Histogram
+from outbox import MemoryOutbox
+
+UPLINK_REQUEST_SECONDS = Histogram("uplink_request_seconds", "Duration of requests to the backend", ["endpoint"])
+UPLINK_LOGS = Counter("uplink_logs_total", "Log entries by outcome", ["outcome"])
+UPLINK_FAILURES = Counter("uplink_failures_total", "Flushes that failed and were retried with backoff")
+_STATUS_SECONDS = UPLINK_REQUEST_SECONDS.labels("status")
+_LOGS_SECONDS = UPLINK_REQUEST_SECONDS.labels("logs")
+
+
+class Uplink:
+    """
+    Background telemetry sender for the automation loop.
+
+    Status updates and log entries go into an outbox (see outbox.py): the
+    caller never blocks on HTTP. A worker thread commits the outbox, sends
+    the pending status of each light (only the latest one) in one request
+    to PATCH /api/streetlights and drains logs
+    in batches to /api/logs/bulk over a keep-alive session. Failed sends are
+    retried with exponential backoff; with a persistent outbox nothing is
+    lost meanwhile, and logs survive restarts until the backend has them.
+    """
+
+    def __init__(self, api_url, max_queue=10000, batch_size=100, timeout=2.0,
+                 outbox=None, flush_interval=0.5, max_backoff=30.0):
+        self.api_url = api_url.rstrip("/")
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self.outbox = outbox if outbox is not None else MemoryOutbox(max_queue)
+        self.flush_interval = flush_interval
+        self.max_backoff = max_backoff
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=2)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._wake = threading.Event()
+        self._stopping = False
+        self._backoff = 0.0
+        self._retry_at = 0.0
+        self._pending = 0
+
+        self.sent_statuses = 0
+        self.sent_logs = 0
+        self.duplicate_logs = 0
+        self.expired_logs = 0
+        self.failures = 0
+
+        self._worker = threading.Thread(target=self._run, name="uplink", daemon=True)
+
+        UPLINK_LOGS.labels("sent").set_function(lambda: self.sent_logs)
+        UPLINK_LOGS.labels("duplicate").set_function(lambda: self.duplicate_logs)
+        UPLINK_LOGS.labels("expired").set_function(lambda: self.expired_logs)
+        UPLINK_LOGS.labels("dropped").set_function(lambda: self.outbox.dropped)
+        UPLINK_FAILURES.set_function(lambda: self.failures)
+
+    def start(self):
+        self._worker.start()
+        return self
+
+    def update_status(self, light_id, status):
+        """
+        Queue a status update. Replaces any unsent status for the same light.
+        """
+        self.outbox.set_status(light_id, status)
+        self._wake.set()
+
+    def log(self, light_id, status, timestamp):
+        """
+        Queue a log entry without blocking the caller.
+        """
+        self.outbox.append(light_id, status, timestamp)
+        self._pending += 1
+        if self._pending >= self.batch_size:
+            self._wake.set()
+
+    def queue_depth(self):
+        return len(self.outbox)
+
+    def close(self, timeout=5.0):
+        """
+        Flush what can be sent within the timeout and stop the worker.
+        A persistent outbox keeps the rest for the next start.
+        """
+        self._stopping = True
+        self._wake.set()
+        if self._worker.is_alive():
+            self._worker.join(timeout)
+        if self._worker.is_alive():
+            # Stuck on a slow request; still make everything queued durable
+            self.outbox.commit()
+        else:
+            self.outbox.close()
+        self.session.close()
+
+    # --- worker ---
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self._pending = 0
+            # Durability doesn't wait for the backend
+            self.outbox.commit()
+            if self._stopping and self._backoff:
+                # Don't keep retrying a dead backend on shutdown
+                return
+            if time.monotonic() < self._retry_at:
+                continue
+
+            ok = self._flush()
+            if ok:
+                self._backoff = 0.0
+            else:
+                self.failures += 1
+                self._backoff = min(max(self._backoff * 2, 0.5), self.max_backoff)
+                self._retry_at = time.monotonic() + self._backoff
+
+            if self._stopping and (not ok or self.queue_depth() == 0):
+                return
+
+    def _flush(self):
+        statuses = self.outbox.statuses()
+        if statuses:
+            if not self._send_statuses(statuses):
+                return False
+            for light_id, status in statuses.items():
+                self.outbox.status_sent(light_id, status)
+
+        while True:
+            # Also picks up logs queued while the previous batch was in flight
+            self.outbox.commit()
+            batch = self.outbox.peek(self.batch_size)
+            if not batch:
+                return True
+            if not self._send_logs(batch):
+                return False
+            self.outbox.ack(batch)
+
+    def _send_statuses(self, statuses):
+        """
+        Send the latest status of every light in `statuses` in one request.
+        Returns False if it should be retried.
+        """
+        start = time.perf_counter()
+        try:
+            response = self.session.patch(
+                f"{self.api_url}/api/streetlights",
+                json=[{"id": light_id, "status": status} for light_id, status in statuses.items()],
+                timeout=self.timeout,
+            )
+        except requests.exceptions.RequestException as e:
+            print(f"Error updating {len(statuses)} streetlights: {e}")
+            return False
+        finally:
+            _STATUS_SECONDS.observe(time.perf_counter() - start)
+        if response.status_code >= 500:
+            print(f"Error updating {len(statuses)} streetlights: HTTP {response.status_code}")
+            return False
+        if response.status_code >= 400:
+            # Retrying won't help, so drop them
+            print(f"Update of {len(statuses)} streetlights rejected: {response.text}")
+        else:
+            unknown = response.json().get("unknown")
+            if unknown:
+                print(f"Unknown streetlights not updated: {unknown}")
+        self.sent_statuses += len(statuses)
+        return True
+
+    def _send_logs(self, batch):
+        """
+        Send a batch of logs in one request to the bulk endpoint. Returns
+        False if it should be retried.
+        """
+        start = time.perf_counter()
+        try:
+            response = self.session.post(f"{self.api_url}/api/logs/bulk", json=batch, timeout=self.timeout)
+        except requests.exceptions.RequestException as e:
+            print(f"Error sending {len(batch)} logs: {e}")
+            return False
+        finally:
+            _LOGS_SECONDS.observe(time.perf_counter() - start)
+        # 409: another request from this outbox was stored concurrently; resend to find out what is new
+        if response.status_code >= 500 or response.status_code == 409:
+            print(f"Error sending {len(batch)} logs: HTTP {response.status_code}")
+            return False
+        if response.status_code >= 400:
+            print(f"Batch of {len(batch)} logs rejected: {response.text}")
+        else:
+            result = response.json()
+            self.sent_logs += result.get("inserted", len(batch))
+            self.duplicate_logs += result.get("duplicates", 0)
+            self.expired_logs += result.get("expired", 0)
+        return True